@@ -11,7 +11,9 @@ import streamlit as st
 from core.config import apply_custom_css
 from core.data_loader import load_sample_data
 from core.data_quality_analyzer import analyze_data_quality, data_quality_page
-from core.database import init_database, check_database_exists
+from core.database import ensure_database_initialized
+from core.password_hasher import password_hasher
+from core.maintenance import maintenance_scheduler
 
 # Imports de módulos utils
 from utils.dashboard import show_dashboard_selection
@@ -196,9 +198,12 @@ def show_current_level_banner(progress):
 def main():
     """Función principal de la aplicación - Punto de entrada principal"""
     
-    # Inicializar base de datos si no existe (necesario para despliegue en Streamlit Cloud)
-    if not check_database_exists():
-        init_database()
+    # Inicializar o actualizar el esquema si hace falta (necesario para despliegue en Streamlit Cloud)
+    ensure_database_initialized()
+    # Calibrar el costo de bcrypt una vez por proceso (no-op en reruns)
+    password_hasher.calibrate()
+    # Mantenimiento periódico de la base de datos en segundo plano (no-op si ya está activo)
+    maintenance_scheduler.start()
     
     # Configurar página para Inicio
     st.set_page_config(
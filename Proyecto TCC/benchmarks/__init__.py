@@ -0,0 +1,4 @@
+"""
+Benchmarks for the TCC Data Analysis Platform
+Run each module from the project root, e.g. ``python -m benchmarks.sqlite_profiles``
+"""
@@ -0,0 +1,29 @@
+# Nombre del Archivo: reporting.py
+# Descripción: Utilidades de reporte para benchmarks - Percentiles y resumen de latencias por operación
+# Autor: Fernando Bavera Villalba
+# Fecha: 25/10/2025
+
+from typing import Dict, List
+
+
+# Estadistica - Percentil
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of values (0.0 when empty)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# Estadistica - Resumir Latencias
+def summarize_latencies(values: List[float]) -> Dict[str, float]:
+    """Count, mean and p50/p95/p99/max of a list of latencies in milliseconds"""
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered), 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50), 3),
+        "p95_ms": round(percentile(ordered, 0.95), 3),
+        "p99_ms": round(percentile(ordered, 0.99), 3),
+        "max_ms": round(ordered[-1], 3) if ordered else 0.0,
+    }
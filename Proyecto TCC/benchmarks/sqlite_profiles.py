@@ -0,0 +1,181 @@
+"""
+Benchmark the SQLite performance profiles on the auth and progress queries
+Seeds a throwaway database once, copies it for each profile and replays the
+same mix of statements from several threads (login lookup, login writes,
+session verification, progress reads and progress updates), then prints
+throughput and p50/p95 latency per statement and profile.
+
+Usage (from the project root):
+    python -m benchmarks.sqlite_profiles --profiles safe balanced fast --threads 4
+"""
+
+import argparse
+import os
+import random
+import secrets
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+# Add parent directory to path to import core modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.database import SQLITE_PROFILES, DatabaseManager, connect_sqlite, get_sqlite_profile
+from core.statements import SQLITE, get_statement
+from benchmarks.reporting import percentile
+
+# Configuracion - Mezcla de Operaciones (peso relativo de cada una)
+OPERATION_WEIGHTS = {
+    "session.verify": 40,
+    "progress.read": 25,
+    "auth.lookup": 10,
+    "progress.update": 15,
+    "auth.login_write": 10,
+}
+DUMMY_HASH = "$2b$12$" + "x" * 53  # Nunca se verifica: el benchmark mide SQL, no bcrypt
+
+
+# Datos - Sembrar Base de Datos
+def seed_database(db_path: str, users: int) -> List[Dict]:
+    """Create the schema and `users` users with progress rows and one live session each"""
+    manager = DatabaseManager(db_path=db_path)
+    manager.init_database()
+    manager.close_connections()
+
+    conn = connect_sqlite(db_path, profile=get_sqlite_profile("fast"))
+    expires_at = (datetime.now() + timedelta(days=1)).isoformat()
+    seeded = []
+    for i in range(users):
+        cursor = conn.execute("""
+            INSERT INTO users (username, email, password_hash, first_name, last_name)
+            VALUES (?, ?, ?, ?, ?)
+        """, (f"bench_{i}", f"bench_{i}@example.com", DUMMY_HASH, "Bench", str(i)))
+        user_id = cursor.lastrowid
+        token = secrets.token_urlsafe(32)
+        conn.execute("INSERT INTO user_progress (user_id) VALUES (?)", (user_id,))
+        conn.execute("INSERT INTO user_sessions (user_id, session_token, expires_at) VALUES (?, ?, ?)",
+                     (user_id, token, expires_at))
+        seeded.append({"id": user_id, "username": f"bench_{i}", "token": token})
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return seeded
+
+
+# Operaciones - Ejecutar Operacion
+def run_operation(conn, name: str, user: Dict):
+    """Run one operation of the mix the same way the app does (one commit per write)"""
+    now = datetime.now().isoformat()
+    if name == "session.verify":
+        conn.execute(get_statement("session.verify", SQLITE), (user["token"], now)).fetchone()
+    elif name == "progress.read":
+        conn.execute(get_statement("progress.by_user", SQLITE), (user["id"],)).fetchone()
+    elif name == "auth.lookup":
+        conn.execute("SELECT * FROM users WHERE username = ? AND is_active = 1", (user["username"],)).fetchone()
+    elif name == "progress.update":
+        conn.execute("""
+            UPDATE user_progress SET total_time_spent = total_time_spent + 1, last_updated = ?
+            WHERE user_id = ?
+        """, (now, user["id"]))
+        conn.commit()
+    elif name == "auth.login_write":
+        conn.execute("""
+            UPDATE users SET failed_login_attempts = 0, locked_until = NULL, last_login = ?
+            WHERE id = ?
+        """, (now, user["id"]))
+        conn.execute("INSERT INTO user_sessions (user_id, session_token, expires_at) VALUES (?, ?, ?)",
+                     (user["id"], secrets.token_urlsafe(32), now))
+        conn.commit()
+
+
+# Benchmark - Medir un Perfil
+def bench_profile(db_path: str, profile_name: str, users: List[Dict], threads: int, ops: int, seed: int) -> Dict:
+    """Replay the operation mix from `threads` threads, `ops` operations each"""
+    profile = get_sqlite_profile(profile_name)
+    names = list(OPERATION_WEIGHTS)
+    weights = list(OPERATION_WEIGHTS.values())
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    lock = threading.Lock()
+    errors = []
+
+    def worker(index: int):
+        rng = random.Random(seed + index)
+        conn = connect_sqlite(db_path, profile=profile)
+        local: Dict[str, List[float]] = {name: [] for name in names}
+        try:
+            for _ in range(ops):
+                name = rng.choices(names, weights)[0]
+                start = time.perf_counter()
+                run_operation(conn, name, rng.choice(users))
+                local[name].append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            errors.append(str(e))
+        finally:
+            conn.close()
+        with lock:
+            for name, values in local.items():
+                latencies[name].extend(values)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(values) for values in latencies.values())
+    return {"profile": profile_name, "elapsed": elapsed, "throughput": total / elapsed,
+            "latencies": latencies, "errors": errors}
+
+
+# Reporte - Imprimir Resultados
+def print_report(results: List[Dict]):
+    print(f"\n{'profile':<10} {'ops/s':>10} {'errors':>7}")
+    for result in results:
+        print(f"{result['profile']:<10} {result['throughput']:>10.0f} {len(result['errors']):>7}")
+
+    print(f"\n{'operation':<18}" + "".join(f"{r['profile'] + ' p50/p95 ms':>26}" for r in results))
+    for name in OPERATION_WEIGHTS:
+        cells = []
+        for result in results:
+            values = result["latencies"][name]
+            cells.append(f"{percentile(values, 0.50):>12.3f} / {percentile(values, 0.95):>9.3f}")
+        print(f"{name:<18}" + "".join(f"{cell:>26}" for cell in cells))
+
+
+def main():
+    """Main benchmark function"""
+    parser = argparse.ArgumentParser(description="Compare SQLite performance profiles on auth/progress queries")
+    parser.add_argument("--profiles", nargs="+", default=list(SQLITE_PROFILES), choices=list(SQLITE_PROFILES))
+    parser.add_argument("--users", type=int, default=1000, help="seeded users")
+    parser.add_argument("--threads", type=int, default=4, help="concurrent connections")
+    parser.add_argument("--ops", type=int, default=2000, help="operations per thread")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="tcc_sqlite_bench_")
+    try:
+        template = os.path.join(workdir, "template.db")
+        users = seed_database(template, args.users)
+        results = []
+        for profile_name in args.profiles:
+            # Cada perfil parte de una copia idéntica de la base sembrada
+            db_path = os.path.join(workdir, f"{profile_name}.db")
+            shutil.copyfile(template, db_path)
+            results.append(bench_profile(db_path, profile_name, users, args.threads, args.ops, args.seed))
+            for error in results[-1]["errors"]:
+                print(f"[{profile_name}] worker error: {error}")
+        print_report(results)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
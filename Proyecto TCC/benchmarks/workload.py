@@ -0,0 +1,323 @@
+"""
+Database workload benchmark and load generator
+Seeds users, sessions, progress rows, quiz attempts with answers, surveys and
+dashboards through the real application APIs (AuthService, ProgressTracker,
+save_quiz_attempt, SurveySystem, upsert_dashboard), then replays a weighted
+mix of concurrent operations from a thread pool and reports throughput and
+p50/p95/p99 latency per operation.
+
+Usage (from the project root):
+    python -m benchmarks.workload --users 200 --threads 8 --ops 5000
+    python -m benchmarks.workload --postgres-dsn "postgresql://postgres@localhost/tcc_bench"
+    python -m benchmarks.workload --json results.json   # guardar para comparar entre releases
+
+Without --postgres-dsn the run uses a throwaway SQLite file. Against Postgres,
+the seeded users (prefixed with the run id) are deleted afterwards unless
+--keep-data is given.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+# Add parent directory to path to import core modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+import utils  # noqa: F401  (carga los módulos de utilidades antes que core.auth_service)
+from core.analytics import rebuild_aggregates
+from core.auth_service import auth_service
+from core.dashboard_repository import list_user_dashboards, upsert_dashboard
+from core.database import db_manager
+from core.password_hasher import password_hasher
+from core.progress_tracker import ProgressTracker
+from core.query_stats import query_stats
+from core.quiz_repository import quiz_attempt_writer
+from core.quiz_system import QUIZ_QUESTIONS, save_quiz_attempt
+from core.survey_system import SurveySystem
+from core.write_behind import write_behind_queue
+from benchmarks.reporting import summarize_latencies
+
+logger = logging.getLogger(__name__)
+
+# Configuracion - Mezcla de Operaciones (peso relativo, aproximando el tráfico de la aplicación)
+OPERATION_WEIGHTS = {
+    "verify_session": 30,
+    "get_user_progress": 15,
+    "has_completed_survey": 10,
+    "list_user_dashboards": 10,
+    "update_time_spent": 8,
+    "save_quiz_attempt": 7,
+    "complete_level": 5,
+    "login": 5,
+    "upsert_dashboard": 5,
+    "save_survey_response": 5,
+}
+PASSWORD = "Bench-Passw0rd!"
+LEVELS = ["nivel0", "nivel1", "nivel2", "nivel3", "nivel4"]
+
+
+# Clase - Usuario Sembrado
+class BenchUser:
+    """Datos de un usuario sembrado que las operaciones necesitan"""
+
+    def __init__(self, user_id: int, username: str, token: str):
+        self.id = user_id
+        self.username = username
+        self.token = token
+        self.dashboard_id = None
+
+
+# Clase - Carga de Trabajo
+class Workload:
+    """Siembra datos con las APIs reales y reproduce una mezcla de operaciones concurrentes"""
+
+    def __init__(self, run_id: str, seed: int = 42):
+        self.run_id = run_id
+        self.random_seed = seed
+        self.users: List[BenchUser] = []
+        self.progress = ProgressTracker()
+        self.surveys = SurveySystem()
+
+    # Datos - Respuestas de Quiz
+    @staticmethod
+    def _quiz_answers(level: str, rng: random.Random) -> List[Dict[str, Any]]:
+        answers = []
+        for question in QUIZ_QUESTIONS.get(level, [])[:5]:
+            selected = rng.randrange(len(question['options']))
+            answers.append({
+                'question': question['question'],
+                'selected': question['options'][selected],
+                'correct': question['options'][question['correct']],
+                'is_correct': selected == question['correct'],
+                'explanation': question.get('explanation', ''),
+            })
+        return answers
+
+    # Datos - Guardar Intento de Quiz
+    def _save_quiz(self, user: BenchUser, rng: random.Random) -> bool:
+        level = rng.choice(LEVELS)
+        answers = self._quiz_answers(level, rng)
+        score = sum(1 for answer in answers if answer['is_correct'])
+        percentage = round(100.0 * score / len(answers), 1) if answers else 0.0
+        return save_quiz_attempt(level, user.username, score, len(answers), percentage, percentage >= 70, answers)
+
+    # Datos - Guardar Dashboard
+    def _save_dashboard(self, user: BenchUser, rng: random.Random) -> int:
+        components = [{"type": rng.choice(["bar", "line", "table", "metric"]), "column": f"col_{i}"}
+                      for i in range(rng.randint(1, 6))]
+        user.dashboard_id = upsert_dashboard(user.id, f"Bench {user.username}", components, user.dashboard_id)
+        return user.dashboard_id
+
+    # Siembra - Sembrar un Usuario
+    def _seed_user(self, index: int) -> BenchUser:
+        rng = random.Random(self.random_seed + index)
+        username = f"bench_{self.run_id}_{index}"
+        ok, message = auth_service.register_user(username, f"{username}@bench.local", PASSWORD, "Bench", str(index))
+        if not ok:
+            raise RuntimeError(f"register_user failed for {username}: {message}")
+        ok, message, data = auth_service.authenticate_user(username, PASSWORD)
+        if not ok:
+            raise RuntimeError(f"authenticate_user failed for {username}: {message}")
+        user = BenchUser(data['user']['id'], username, data['session_token'])
+
+        self.progress.get_user_progress(user.id)
+        for level in LEVELS[:rng.randint(0, len(LEVELS))]:
+            self.progress.complete_level(user.id, level)
+        for _ in range(rng.randint(1, 3)):
+            self._save_quiz(user, rng)
+        self.surveys.save_survey_response(user.id, 'initial', {"experience": rng.randint(1, 5)})
+        self._save_dashboard(user, rng)
+        return user
+
+    # Siembra - Sembrar Usuarios
+    def seed(self, users: int, threads: int) -> float:
+        """Seed `users` users concurrently; returns the elapsed seconds"""
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="seed") as pool:
+            self.users = list(pool.map(self._seed_user, range(users)))
+        write_behind_queue.flush()
+        quiz_attempt_writer.flush()
+        return time.perf_counter() - start
+
+    # Operaciones - Tabla de Operaciones
+    def _operations(self) -> Dict[str, Callable[[BenchUser, random.Random], Any]]:
+        return {
+            "verify_session": lambda user, rng: auth_service.verify_session(user.token)[0],
+            "get_user_progress": lambda user, rng: self.progress.get_user_progress(user.id),
+            "has_completed_survey": lambda user, rng: self.surveys.has_completed_survey(
+                user.id, 'level', rng.choice(LEVELS)),
+            "list_user_dashboards": lambda user, rng: list_user_dashboards(user.id),
+            "update_time_spent": lambda user, rng: self.progress.update_time_spent(user.id, rng.randint(1, 10)),
+            "save_quiz_attempt": self._save_quiz,
+            "complete_level": lambda user, rng: self.progress.complete_level(user.id, rng.choice(LEVELS)),
+            "login": lambda user, rng: auth_service.authenticate_user(user.username, PASSWORD)[0],
+            "upsert_dashboard": self._save_dashboard,
+            "save_survey_response": lambda user, rng: self.surveys.save_survey_response(
+                user.id, 'level', {"rating": rng.randint(1, 5)}, rng.choice(LEVELS)),
+        }
+
+    # Carga - Reproducir Mezcla de Operaciones
+    def run(self, threads: int, ops: int, weights: Dict[str, int] = None) -> Dict[str, Any]:
+        """Run `ops` operations spread over `threads` workers and collect latencies"""
+        weights = weights or OPERATION_WEIGHTS
+        operations = self._operations()
+        names = [name for name in weights if weights[name] > 0]
+        name_weights = [weights[name] for name in names]
+        latencies: Dict[str, List[float]] = {name: [] for name in names}
+        failures: Dict[str, int] = {name: 0 for name in names}
+        lock = threading.Lock()
+
+        def worker(index: int, count: int):
+            rng = random.Random(self.random_seed * 1000 + index)
+            local = {name: [] for name in names}
+            local_failures = {name: 0 for name in names}
+            for _ in range(count):
+                name = rng.choices(names, name_weights)[0]
+                user = rng.choice(self.users)
+                start = time.perf_counter()
+                try:
+                    # Las operaciones de escritura devuelven False si fallan; las de lectura nunca devuelven False
+                    if operations[name](user, rng) is False and name not in ("has_completed_survey",):
+                        local_failures[name] += 1
+                except Exception as e:
+                    logger.debug(f"{name} raised: {e}")
+                    local_failures[name] += 1
+                local[name].append((time.perf_counter() - start) * 1000)
+            with lock:
+                for name in names:
+                    latencies[name].extend(local[name])
+                    failures[name] += local_failures[name]
+
+        per_worker = [ops // threads + (1 if i < ops % threads else 0) for i in range(threads)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="bench") as pool:
+            for future in [pool.submit(worker, i, count) for i, count in enumerate(per_worker)]:
+                future.result()
+        write_behind_queue.flush()
+        quiz_attempt_writer.flush()
+        elapsed = time.perf_counter() - start
+
+        total = sum(len(values) for values in latencies.values())
+        return {
+            "threads": threads,
+            "operations": total,
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_ops": round(total / elapsed, 1) if elapsed else 0.0,
+            "failures": sum(failures.values()),
+            "overall": summarize_latencies([v for values in latencies.values() for v in values]),
+            "by_operation": {
+                name: dict(summarize_latencies(latencies[name]), failures=failures[name]) for name in names
+            },
+        }
+
+    # Limpieza - Borrar Datos Sembrados
+    def cleanup(self):
+        """Delete the seeded users (dependent rows go with ON DELETE CASCADE), their rate-limit rows and their analytics"""
+        prefix = f"bench_{self.run_id}_%"
+        with db_manager.transaction() as conn:
+            conn.execute("DELETE FROM users WHERE username LIKE ?", (prefix,))
+            conn.execute("DELETE FROM rate_limiting WHERE identifier LIKE ?", (prefix,))
+            rebuild_aggregates(conn)
+
+
+# Configuracion - Seleccionar Backend
+def configure_backend(postgres_dsn: str = None, sqlite_path: str = None):
+    """Point the global db_manager at the benchmark database before anything connects"""
+    db_manager.close_connections()
+    if postgres_dsn:
+        db_manager.db_type = "supabase"
+        db_manager.connection_string = postgres_dsn
+        db_manager.read_connection_string = None
+    else:
+        db_manager.db_type = "sqlite"
+        db_manager.db_path = sqlite_path
+        db_manager.connection_string = None
+    db_manager.init_database()
+
+
+# Reporte - Imprimir Resultados
+def print_report(report: Dict[str, Any]):
+    result = report["run"]
+    print(f"\nBackend: {report['backend']}  users: {report['users']}  seed time: {report['seed_seconds']}s")
+    print(f"Threads: {result['threads']}  operations: {result['operations']}  "
+          f"elapsed: {result['elapsed_seconds']}s  throughput: {result['throughput_ops']} ops/s  "
+          f"failures: {result['failures']}")
+    print(f"\n{'operation':<22}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'fail':>6}")
+    rows = sorted(result["by_operation"].items(), key=lambda item: -item[1]["count"])
+    for name, stats in rows + [("overall", dict(result["overall"], failures=result["failures"]))]:
+        print(f"{name:<22}{stats['count']:>8}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+              f"{stats['p99_ms']:>10.2f}{stats['max_ms']:>10.2f}{stats['failures']:>6}")
+
+    if report.get("top_statements"):
+        print("\nHeaviest statements (query_stats):")
+        for statement in report["top_statements"]:
+            print(f"  {statement['total_ms']:>10.1f} ms  {statement['calls']:>6} calls  {statement['sql'][:90]}")
+
+
+def main():
+    """Main benchmark function"""
+    parser = argparse.ArgumentParser(description="Seed data through the app APIs and replay a concurrent workload")
+    parser.add_argument("--users", type=int, default=100, help="users to seed")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent workers")
+    parser.add_argument("--ops", type=int, default=5000, help="total operations to replay")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--postgres-dsn", help="run against this PostgreSQL database instead of SQLite")
+    parser.add_argument("--sqlite-path", help="SQLite file to use (default: a temporary file)")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4,
+                        help="bcrypt cost while benchmarking (keeps logins from dominating the run)")
+    parser.add_argument("--keep-data", action="store_true", help="do not delete the seeded users afterwards")
+    parser.add_argument("--json", help="write the full report to this file")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    password_hasher._rounds = args.bcrypt_rounds
+
+    workdir = None
+    if not args.postgres_dsn and not args.sqlite_path:
+        workdir = tempfile.mkdtemp(prefix="tcc_workload_")
+        args.sqlite_path = os.path.join(workdir, "bench.db")
+    configure_backend(args.postgres_dsn, args.sqlite_path)
+
+    workload = Workload(run_id=uuid.uuid4().hex[:8], seed=args.seed)
+    try:
+        seed_seconds = workload.seed(args.users, args.threads)
+        query_stats.reset()
+        result = workload.run(args.threads, args.ops)
+        report = {
+            "backend": "postgres" if args.postgres_dsn else f"sqlite ({args.sqlite_path})",
+            "users": args.users,
+            "seed_seconds": round(seed_seconds, 2),
+            "run": result,
+            "top_statements": [
+                {key: statement[key] for key in ("sql", "calls", "total_ms", "p95_ms")}
+                for statement in query_stats.summary(limit=5)
+            ] if query_stats.enabled else [],
+        }
+        print_report(report)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as handle:
+                json.dump(report, handle, indent=2)
+    finally:
+        if not args.keep_data and not workdir:
+            workload.cleanup()
+        write_behind_queue.shutdown()
+        quiz_attempt_writer.shutdown()
+        db_manager.close_connections()
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,310 @@
+# Nombre del Archivo: analytics.py
+# Descripción: Analíticas de quizzes y encuestas - Tablas de agregados (por nivel, día y pregunta) mantenidas en la misma transacción que cada escritura, y API de consulta para instructores
+# Autor: Fernando Bavera Villalba
+# Fecha: 25/10/2025
+
+import json
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from core.database import db_manager
+
+logger = logging.getLogger(__name__)
+
+# Configuracion - Agregados
+SCORE_BUCKET_WIDTH = 10  # Ancho de cada tramo de la distribución de porcentajes (0-9, 10-19, ..., 90-100)
+LIKERT_VALUES = range(1, 6)  # Respuestas numéricas que cuentan como escala Likert (sliders 1-5 de las encuestas)
+NO_LEVEL = ""  # Nivel de las encuestas sin nivel (las claves primarias no admiten NULL en PostgreSQL)
+REBUILD_FETCH_SIZE = 1000  # Filas leídas por lote al recalcular desde las tablas originales
+AGGREGATE_TABLES = ("analytics_quiz_daily", "analytics_question_stats", "analytics_survey_likert")
+
+# Sentencias - Acumular Deltas (mismo SQL en SQLite y PostgreSQL)
+_QUIZ_DAILY_UPSERT = """
+    INSERT INTO analytics_quiz_daily (level, day, bucket, attempts, passed, percentage_sum)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (level, day, bucket) DO UPDATE SET
+        attempts = analytics_quiz_daily.attempts + excluded.attempts,
+        passed = analytics_quiz_daily.passed + excluded.passed,
+        percentage_sum = analytics_quiz_daily.percentage_sum + excluded.percentage_sum
+"""
+_QUESTION_STATS_UPSERT = """
+    INSERT INTO analytics_question_stats (level, question_text, answered, correct)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (level, question_text) DO UPDATE SET
+        answered = analytics_question_stats.answered + excluded.answered,
+        correct = analytics_question_stats.correct + excluded.correct
+"""
+_SURVEY_LIKERT_UPSERT = """
+    INSERT INTO analytics_survey_likert (survey_type, level, question, value, responses)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (survey_type, level, question, value) DO UPDATE SET
+        responses = analytics_survey_likert.responses + excluded.responses
+"""
+
+
+# Calculo - Tramo de Porcentaje
+def score_bucket(percentage: Any) -> int:
+    """Lower bound of the distribution bucket of a percentage (100 falls in the last bucket)"""
+    last = 100 - SCORE_BUCKET_WIDTH
+    return min(max(int(float(percentage) // SCORE_BUCKET_WIDTH) * SCORE_BUCKET_WIDTH, 0), last)
+
+
+# Calculo - Dia de un Timestamp
+def _day(completed_at: Any) -> str:
+    """YYYY-MM-DD of a TIMESTAMP value (ISO string on SQLite, datetime on PostgreSQL)"""
+    return str(completed_at)[:10]
+
+
+# Calculo - Respuestas Likert
+def likert_items(responses: Mapping[str, Any]) -> List[Tuple[str, int]]:
+    """(question, value) pairs of the integer answers on the Likert scale"""
+    return [
+        (question, value) for question, value in responses.items()
+        if isinstance(value, int) and not isinstance(value, bool) and value in LIKERT_VALUES
+    ]
+
+
+# Conversion - Decodificar Respuestas
+def _as_responses(value: Any) -> Optional[Mapping[str, Any]]:
+    """Survey responses from a JSON column or a dict; None when unreadable"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    return value if isinstance(value, Mapping) else None
+
+
+# Clase - Acumulador de Deltas
+class _Deltas:
+    """Suma cambios por clave en memoria para escribir una fila por clave y tabla"""
+
+    def __init__(self):
+        self.quiz_daily: Dict[tuple, List[float]] = defaultdict(lambda: [0, 0, 0.0])
+        self.questions: Dict[tuple, List[int]] = defaultdict(lambda: [0, 0])
+        self.likert: Dict[tuple, int] = defaultdict(int)
+
+    def add_attempt(self, level: str, completed_at: Any, percentage: Any, passed: Any, sign: int = 1):
+        totals = self.quiz_daily[(level, _day(completed_at), score_bucket(percentage))]
+        totals[0] += sign
+        totals[1] += sign if passed else 0
+        totals[2] += sign * float(percentage)
+
+    def add_answer(self, level: str, question: str, is_correct: Any, sign: int = 1):
+        totals = self.questions[(level, question)]
+        totals[0] += sign
+        totals[1] += sign if is_correct else 0
+
+    def add_survey(self, survey_type: str, level: Optional[str], responses: Any, sign: int = 1) -> bool:
+        responses = _as_responses(responses)
+        if responses is None:
+            return False
+        for question, value in likert_items(responses):
+            self.likert[(survey_type, level or NO_LEVEL, question, value)] += sign
+        return True
+
+    # Base de Datos - Escribir Deltas
+    def apply(self, conn):
+        """Upsert every non-zero delta; keys are sorted so concurrent writers lock rows in the same order"""
+        quiz_rows = [key + tuple(totals) for key, totals in sorted(self.quiz_daily.items()) if totals[0]]
+        if quiz_rows:
+            conn.executemany(_QUIZ_DAILY_UPSERT, quiz_rows)
+        question_rows = [key + tuple(totals) for key, totals in sorted(self.questions.items()) if totals[0]]
+        if question_rows:
+            conn.executemany(_QUESTION_STATS_UPSERT, question_rows)
+        likert_rows = [key + (count,) for key, count in sorted(self.likert.items()) if count]
+        if likert_rows:
+            conn.executemany(_SURVEY_LIKERT_UPSERT, likert_rows)
+
+
+# Agregados - Registrar Intentos de Quiz
+def record_quiz_attempts(conn, attempts: Iterable[Any]):
+    """Add saved quiz attempts (and their answers) to the aggregates inside the caller's transaction"""
+    deltas = _Deltas()
+    for attempt in attempts:
+        deltas.add_attempt(attempt.level, attempt.completed_at, attempt.percentage, attempt.passed)
+        for answer in attempt.answers:
+            deltas.add_answer(attempt.level, answer['question'], answer['is_correct'])
+    deltas.apply(conn)
+
+
+# Agregados - Registrar Respuesta de Encuesta
+def record_survey_response(conn, survey_type: str, level: Optional[str], responses: Any, previous: Any = None):
+    """Add a survey response (dict or JSON) to the Likert counts, replacing ``previous`` when it was answered before"""
+    deltas = _Deltas()
+    if previous is not None:
+        deltas.add_survey(survey_type, level, previous, sign=-1)
+    deltas.add_survey(survey_type, level, responses)
+    deltas.apply(conn)
+
+
+def _iter_rows(cursor):
+    while True:
+        rows = cursor.fetchmany(REBUILD_FETCH_SIZE)
+        if not rows:
+            return
+        yield from rows
+
+
+# Agregados - Recalcular desde las Tablas Originales
+def rebuild_aggregates(conn=None) -> Dict[str, int]:
+    """Recompute every aggregate table from quiz_attempts, quiz_answers and survey_responses"""
+    deltas = _Deltas()
+    counts = {"attempts": 0, "answers": 0, "surveys": 0}
+    with db_manager.transaction(conn) as conn:
+        for table in AGGREGATE_TABLES:
+            conn.execute(f"DELETE FROM {table}")
+
+        cursor = conn.execute("SELECT level, completed_at, percentage, passed FROM quiz_attempts")
+        for row in _iter_rows(cursor):
+            deltas.add_attempt(row['level'], row['completed_at'], row['percentage'], row['passed'])
+            counts["attempts"] += 1
+
+        cursor = conn.execute("""
+            SELECT qa.level, ans.question_text, ans.is_correct
+            FROM quiz_answers ans
+            JOIN quiz_attempts qa ON qa.id = ans.quiz_attempt_id
+        """)
+        for row in _iter_rows(cursor):
+            deltas.add_answer(row['level'], row['question_text'], row['is_correct'])
+            counts["answers"] += 1
+
+        cursor = conn.execute("SELECT survey_type, level, responses FROM survey_responses")
+        for row in _iter_rows(cursor):
+            if deltas.add_survey(row['survey_type'], row['level'], row['responses']):
+                counts["surveys"] += 1
+
+        deltas.apply(conn)
+    logger.info(f"Analytics aggregates rebuilt: {counts}")
+    return counts
+
+
+def _fetch(query: str, params: Tuple = ()) -> List[Dict[str, Any]]:
+    with db_manager.get_connection(readonly=True) as conn:
+        return [dict(row) for row in conn.execute(query, params).fetchall()]
+
+
+def _level_filter(level: Optional[str], column: str = "level") -> Tuple[str, Tuple]:
+    return (f"WHERE {column} = ?", (level,)) if level else ("", ())
+
+
+# Consulta - Resumen por Nivel
+def get_level_summary() -> List[Dict[str, Any]]:
+    """Attempts, pass rate and mean percentage per quiz level"""
+    rows = _fetch("""
+        SELECT level, SUM(attempts) AS attempts, SUM(passed) AS passed, SUM(percentage_sum) AS percentage_sum
+        FROM analytics_quiz_daily
+        GROUP BY level
+        ORDER BY level
+    """)
+    return [_with_rates(row) for row in rows]
+
+
+# Consulta - Distribucion de Puntajes
+def get_score_distribution(level: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Attempts per percentage bucket (all levels, or one)"""
+    where, params = _level_filter(level)
+    rows = _fetch(f"""
+        SELECT bucket, SUM(attempts) AS attempts
+        FROM analytics_quiz_daily
+        {where}
+        GROUP BY bucket
+        ORDER BY bucket
+    """, params)
+    by_bucket = {int(row['bucket']): int(row['attempts']) for row in rows}
+    return [
+        {"bucket": f"{start}-{start + SCORE_BUCKET_WIDTH - 1 if start < 100 - SCORE_BUCKET_WIDTH else 100}",
+         "attempts": by_bucket.get(start, 0)}
+        for start in range(0, 100, SCORE_BUCKET_WIDTH)
+    ]
+
+
+# Consulta - Tasa de Aprobacion por Dia
+def get_pass_rates(level: Optional[str] = None, since: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Attempts, pass rate and mean percentage per day (YYYY-MM-DD, UTC), optionally from ``since``"""
+    conditions, params = [], []
+    if level:
+        conditions.append("level = ?")
+        params.append(level)
+    if since:
+        conditions.append("day >= ?")
+        params.append(since)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = _fetch(f"""
+        SELECT day, SUM(attempts) AS attempts, SUM(passed) AS passed, SUM(percentage_sum) AS percentage_sum
+        FROM analytics_quiz_daily
+        {where}
+        GROUP BY day
+        ORDER BY day
+    """, tuple(params))
+    return [_with_rates(row) for row in rows]
+
+
+def _with_rates(row: Dict[str, Any]) -> Dict[str, Any]:
+    attempts = int(row.pop('attempts') or 0)
+    passed = int(row.pop('passed') or 0)
+    percentage_sum = float(row.pop('percentage_sum') or 0)
+    row.update({
+        "attempts": attempts,
+        "passed": passed,
+        "pass_rate": round(100.0 * passed / attempts, 1) if attempts else 0.0,
+        "mean_percentage": round(percentage_sum / attempts, 1) if attempts else 0.0,
+    })
+    return row
+
+
+# Consulta - Dificultad por Pregunta
+def get_question_difficulty(level: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Answer count and correct rate per question, hardest first"""
+    where, params = _level_filter(level)
+    rows = _fetch(f"""
+        SELECT level, question_text, answered, correct
+        FROM analytics_question_stats
+        {where}
+    """, params)
+    for row in rows:
+        row['answered'] = int(row['answered'])
+        row['correct'] = int(row['correct'])
+        row['correct_rate'] = round(100.0 * row['correct'] / row['answered'], 1) if row['answered'] else 0.0
+    rows = [row for row in rows if row['answered'] > 0]
+    rows.sort(key=lambda row: (row['correct_rate'], -row['answered']))
+    return rows[:limit] if limit else rows
+
+
+# Consulta - Resumen Likert
+def get_likert_summary(survey_type: Optional[str] = None, level: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Per survey question: responses per value (1-5), total and mean"""
+    conditions, params = [], []
+    if survey_type:
+        conditions.append("survey_type = ?")
+        params.append(survey_type)
+    if level is not None:
+        conditions.append("level = ?")
+        params.append(level or NO_LEVEL)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = _fetch(f"""
+        SELECT survey_type, level, question, value, responses
+        FROM analytics_survey_likert
+        {where}
+        ORDER BY survey_type, level, question, value
+    """, tuple(params))
+
+    summary: Dict[tuple, Dict[str, Any]] = {}
+    for row in rows:
+        key = (row['survey_type'], row['level'], row['question'])
+        entry = summary.setdefault(key, {
+            "survey_type": row['survey_type'],
+            "level": row['level'] or None,
+            "question": row['question'],
+            **{str(value): 0 for value in LIKERT_VALUES},
+            "responses": 0,
+            "mean": 0.0,
+        })
+        count = int(row['responses'])
+        entry[str(row['value'])] = count
+        entry["responses"] += count
+        entry["mean"] += count * int(row['value'])
+    for entry in summary.values():
+        entry["mean"] = round(entry["mean"] / entry["responses"], 2) if entry["responses"] else 0.0
+    return [entry for entry in summary.values() if entry["responses"] > 0]
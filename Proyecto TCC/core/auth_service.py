@@ -9,25 +9,34 @@ Fecha: 25/10/2025
 import logging
 import secrets
 import string
+import threading
+import time
 from datetime import datetime, timedelta
 from typing import Any, Dict, Optional, Tuple
 
-import bcrypt
 import streamlit as st
 
 # Imports locales
-from core.database import db_manager, ensure_database_initialized
+from core.database import db_manager, get_database_setting, parse_timestamp
+from core.password_hasher import password_hasher
 from core.progress_tracker import progress_tracker
 from core.security import security_manager
 from core.security_features import security_features
+from core.session_tokens import (
+    REVOCATION_SYNC_INTERVAL,
+    RevocationSet,
+    SessionTokenSigner,
+    is_signed_token,
+)
+from core.user_context import UserContext, load_user_context
+from core.write_behind import write_behind_queue
 
 logger = logging.getLogger(__name__)
 
-# Ensure database is initialized when this module is imported
-try:
-    ensure_database_initialized()
-except Exception as e:
-    logger.warning(f"Could not ensure database initialization in auth_service: {e}")
+# Configuracion - Cache de Sesiones Verificadas
+SESSION_CACHE_TTL = 30.0  # Segundos que una sesión verificada se sirve sin consultar la base de datos
+SESSION_CACHE_MAX_ENTRIES = 10000
+SESSION_ACTIVITY_INTERVAL = 60.0  # Segundos mínimos entre actualizaciones de last_activity por sesión
 
 # ============================================================================
 # AUTH SERVICE CLASS
@@ -44,6 +53,28 @@ class AuthService:
     def __init__(self):
         """Inicializa el servicio de autenticación con configuración por defecto"""
         self.session_timeout = 3600  # 1 hora en segundos
+        self.session_cache_ttl = float(get_database_setting("session_cache_ttl", SESSION_CACHE_TTL))
+        self.session_activity_interval = float(
+            get_database_setting("session_activity_interval", SESSION_ACTIVITY_INTERVAL)
+        )
+        # token -> {'user': datos del usuario, 'expires_at', 'verified_at', 'activity_at'}
+        self._session_cache: Dict[str, Dict[str, Any]] = {}
+        self._session_cache_lock = threading.Lock()
+        # user_id -> (momento de carga, perfil) para sesiones firmadas
+        self._user_profiles: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+        
+        # Sesiones firmadas (opcional): verificación sin consultar user_sessions
+        self.session_signer: Optional[SessionTokenSigner] = None
+        self.revocations = RevocationSet(
+            float(get_database_setting("revocation_sync_interval", REVOCATION_SYNC_INTERVAL))
+        )
+        session_secret = get_database_setting("session_secret", None)
+        if session_secret:
+            self.session_signer = SessionTokenSigner(str(session_secret))
+        self.signed_sessions = bool(get_database_setting("signed_sessions", False))
+        if self.signed_sessions and self.session_signer is None:
+            logger.warning("signed_sessions is enabled but session_secret is not set; using database sessions")
+            self.signed_sessions = False
     
     # ============================================================================
     # USER REGISTRATION AND AUTHENTICATION
@@ -99,13 +130,11 @@ class AuthService:
             
             # Create user
             with db_manager.get_connection() as conn:
-                cursor = conn.execute("""
+                user_id = db_manager.execute_insert(conn, """
                     INSERT INTO users (username, email, password_hash, first_name, last_name)
                     VALUES (?, ?, ?, ?, ?)
                 """, (username, email, password_hash, first_name, last_name))
                 
-                user_id = cursor.lastrowid
-                
                 # Create user progress record in the same transaction to avoid nested connections
                 try:
                     conn.execute("""
@@ -132,58 +161,69 @@ class AuthService:
     
     # Autenticacion - Autenticar Usuario
     def authenticate_user(self, username: str, password: str) -> Tuple[bool, str, Optional[Dict]]:
-        """Authenticate user login"""
+        """Authenticate user login (rate limit, lockout, attempts and session in one transaction)"""
         try:
-            # Check rate limiting first
-            rate_limit_ok, rate_limit_msg = security_features.check_rate_limit(username)
-            if not rate_limit_ok:
-                return False, rate_limit_msg, None
-            
             # Sanitize inputs for database (no HTML encoding)
             username = security_features.sanitize_input_for_db(username)
+            current_time = datetime.now()
             
-            # Get user from database
             with db_manager.get_connection() as conn:
+                # Rate limit en memoria (la conexión solo se usa si el identificador no está cargado)
+                rate_limit_ok, rate_limit_msg = security_features.check_rate_limit(username, conn)
+                if not rate_limit_ok:
+                    conn.commit()  # El bloqueo recién aplicado se escribe en esta transacción
+                    return False, rate_limit_msg, None
+                
                 active_literal = db_manager.get_boolean_literal(True)
                 cursor = conn.execute(f"""
                     SELECT * FROM users 
                     WHERE username = ? AND is_active = {active_literal}
                 """, (username,))
                 user = cursor.fetchone()
-            
-            if not user:
-                # Record failed attempt
-                security_features.record_attempt(username, False)
-                return False, "Invalid username or password", None
-            
-            # Check if account is locked
-            if user['locked_until']:
-                locked_until = datetime.fromisoformat(user['locked_until'])
-                if locked_until > datetime.now():
-                    remaining_time = int((locked_until - datetime.now()).total_seconds())
+                
+                # Check if account is locked
+                locked_until = parse_timestamp(user['locked_until']) if user else None
+                if locked_until and locked_until > current_time:
+                    remaining_time = int((locked_until - current_time).total_seconds())
                     return False, f"Account is locked. Try again in {remaining_time} seconds", None
-                else:
-                    # Unlock account
-                    self.unlock_account(user['id'])
-            
-            # Verify password
-            if not self.verify_password(password, user['password_hash']):
-                # Increment failed attempts
-                self.increment_failed_attempts(user['id'])
-                # Record failed attempt
-                security_features.record_attempt(username, False)
-                return False, "Invalid username or password", None
-            
-            # Reset failed attempts on successful login
-            self.reset_failed_attempts(user['id'])
-            # Record successful attempt
-            security_features.record_attempt(username, True)
-            
-            # Update last login
-            self.update_last_login(user['id'])
-            
-            # Create session
-            session_token = self.create_session(user['id'])
+                
+                password_ok = bool(user) and self.verify_password(password, user['password_hash'])
+                
+                # Rehash al iniciar sesión si el hash guardado usa otro costo (antes de tomar el lock de escritura)
+                new_password_hash = None
+                if password_ok and password_hasher.needs_rehash(user['password_hash']):
+                    new_password_hash = self.hash_password(password)
+                
+                # Escrituras: todas en la misma transacción y un único commit
+                if not password_ok:
+                    if user:
+                        if locked_until:
+                            # Bloqueo vencido: desbloquear antes de contar el nuevo fallo
+                            self.unlock_account(user['id'], conn)
+                        self.increment_failed_attempts(user['id'], conn)
+                    # Record failed attempt
+                    security_features.record_attempt(username, False, conn)
+                    conn.commit()
+                    return False, "Invalid username or password", None
+                
+                # Reset failed attempts and update last login on successful login
+                write_behind_queue.discard(("failed_attempts", user['id']))
+                write_behind_queue.discard(("last_login", user['id']))
+                conn.execute("""
+                    UPDATE users 
+                    SET failed_login_attempts = 0, locked_until = NULL, last_login = ?
+                    WHERE id = ?
+                """, (current_time.isoformat(), user['id']))
+                if new_password_hash:
+                    conn.execute("""
+                        UPDATE users SET password_hash = ? WHERE id = ?
+                    """, (new_password_hash, user['id']))
+                # Record successful attempt
+                security_features.record_attempt(username, True, conn)
+                
+                # Create session
+                session_token = self.create_session(user['id'], conn)
+                conn.commit()
             
             # Prepare user data
             user_data = {
@@ -232,33 +272,42 @@ class AuthService:
     
     # Seguridad - Hashear Contraseña
     def hash_password(self, password: str) -> str:
-        """Hash password using bcrypt"""
-        salt = bcrypt.gensalt()
-        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+        """Hash password using bcrypt (bounded worker pool, calibrated cost)"""
+        return password_hasher.hash(password)
     
     # Seguridad - Verificar Contraseña
     def verify_password(self, password: str, password_hash: str) -> bool:
-        """Verify password against hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+        """Verify password against hash (bounded worker pool)"""
+        return password_hasher.verify(password, password_hash)
     
     # Sesion - Crear Sesion de Usuario
-    def create_session(self, user_id: int) -> str:
-        """Create a new session for user"""
+    def create_session(self, user_id: int, conn=None) -> str:
+        """Create a new session for user (a signed token when signed_sessions is enabled)"""
+        if self.signed_sessions:
+            return self.session_signer.issue(user_id, self.session_timeout)
+        
         session_token = secrets.token_urlsafe(32)
         expires_at = datetime.now() + timedelta(seconds=self.session_timeout)
         
-        with db_manager.get_connection() as conn:
+        with db_manager.transaction(conn) as conn:
             conn.execute("""
                 INSERT INTO user_sessions (user_id, session_token, expires_at)
                 VALUES (?, ?, ?)
             """, (user_id, session_token, expires_at.isoformat()))
-            conn.commit()
         
         return session_token
     
     # Sesion - Invalidar Sesion
     def invalidate_session(self, session_token: str):
         """Invalidate a session"""
+        write_behind_queue.discard(("session_activity", session_token))
+        self._evict_session(session_token)
+        if is_signed_token(session_token):
+            claims = self.session_signer.decode(session_token) if self.session_signer else None
+            if claims and claims.expires_at > datetime.now():
+                self.revocations.revoke_token(claims)
+            return
+        
         with db_manager.get_connection() as conn:
             conn.execute("""
                 DELETE FROM user_sessions WHERE session_token = ?
@@ -267,19 +316,24 @@ class AuthService:
     
     # Sesion - Actualizar Actividad de Sesion
     def update_session_activity(self, session_token: str):
-        """Update session last activity time"""
-        with db_manager.get_connection() as conn:
-            conn.execute("""
-                UPDATE user_sessions 
-                SET last_activity = ? 
-                WHERE session_token = ?
-            """, (datetime.now().isoformat(), session_token))
-            conn.commit()
+        """Update session last activity time (deferred and coalesced per session)"""
+        write_behind_queue.submit(("session_activity", session_token), """
+            UPDATE user_sessions 
+            SET last_activity = ? 
+            WHERE session_token = ?
+        """, (datetime.now().isoformat(), session_token))
     
     # Seguridad - Incrementar Intentos Fallidos
-    def increment_failed_attempts(self, user_id: int):
+    def increment_failed_attempts(self, user_id: int, conn=None):
         """Increment failed login attempts"""
-        with db_manager.get_connection() as conn:
+        if conn is None:
+            # Aplicar antes un reinicio diferido pendiente para no pisar este incremento
+            write_behind_queue.flush([("failed_attempts", user_id)])
+        else:
+            # Dentro de una transacción abierta no se puede vaciar con otra conexión
+            write_behind_queue.discard(("failed_attempts", user_id))
+        
+        with db_manager.transaction(conn) as conn:
             conn.execute("""
                 UPDATE users 
                 SET failed_login_attempts = failed_login_attempts + 1
@@ -292,41 +346,34 @@ class AuthService:
                 SET locked_until = ?
                 WHERE id = ? AND failed_login_attempts >= 5
             """, ((datetime.now() + timedelta(minutes=15)).isoformat(), user_id))
-            
-            conn.commit()
     
     # Seguridad - Reiniciar Intentos Fallidos
     def reset_failed_attempts(self, user_id: int):
-        """Reset failed login attempts"""
-        with db_manager.get_connection() as conn:
-            conn.execute("""
-                UPDATE users 
-                SET failed_login_attempts = 0, locked_until = NULL
-                WHERE id = ?
-            """, (user_id,))
-            conn.commit()
+        """Reset failed login attempts (deferred and coalesced per user)"""
+        write_behind_queue.submit(("failed_attempts", user_id), """
+            UPDATE users 
+            SET failed_login_attempts = 0, locked_until = NULL
+            WHERE id = ?
+        """, (user_id,))
     
     # Seguridad - Desbloquear Cuenta
-    def unlock_account(self, user_id: int):
+    def unlock_account(self, user_id: int, conn=None):
         """Unlock a locked account"""
-        with db_manager.get_connection() as conn:
+        with db_manager.transaction(conn) as conn:
             conn.execute("""
                 UPDATE users 
                 SET failed_login_attempts = 0, locked_until = NULL
                 WHERE id = ?
             """, (user_id,))
-            conn.commit()
     
     # Usuario - Actualizar Ultimo Login
     def update_last_login(self, user_id: int):
-        """Update user's last login time"""
-        with db_manager.get_connection() as conn:
-            conn.execute("""
-                UPDATE users 
-                SET last_login = ?
-                WHERE id = ?
-            """, (datetime.now().isoformat(), user_id))
-            conn.commit()
+        """Update user's last login time (deferred and coalesced per user)"""
+        write_behind_queue.submit(("last_login", user_id), """
+            UPDATE users 
+            SET last_login = ?
+            WHERE id = ?
+        """, (datetime.now().isoformat(), user_id))
     
     # Logging - Registrar Actividad de Usuario
     def log_activity(self, user_id: int, activity_type: str, details: Dict[str, Any]):
@@ -383,7 +430,9 @@ class AuthService:
                         locked_until = NULL
                     WHERE id = ?
                 """, (password_hash, user['id']))
+                self._revoke_signed_sessions(user['id'], conn)
                 conn.commit()
+            self._evict_user_sessions(user['id'])
             
             # Log activity
             self.log_activity(user['id'], 'password_reset', {
@@ -431,6 +480,7 @@ class AuthService:
                     UPDATE users SET email = ? WHERE id = ?
                 """, (new_email, user_id))
                 conn.commit()
+            self._evict_user_sessions(user_id)
             
             # Log activity
             self.log_activity(user_id, 'email_update', {
@@ -492,7 +542,9 @@ class AuthService:
                         locked_until = NULL
                     WHERE id = ?
                 """, (new_password_hash, user_id))
+                self._revoke_signed_sessions(user_id, conn)
                 conn.commit()
+            self._evict_user_sessions(user_id)
             
             # Log activity
             self.log_activity(user_id, 'password_update', {
@@ -505,42 +557,187 @@ class AuthService:
             logger.error(f"Password update error: {e}")
             return False, security_features.sanitize_error_message(e)
     
+    # Usuario - Desactivar Usuario
+    def deactivate_user(self, user_id: int) -> bool:
+        """Deactivate an account and end all of its sessions"""
+        try:
+            with db_manager.get_connection() as conn:
+                conn.execute(f"""
+                    UPDATE users SET is_active = {db_manager.get_boolean_literal(False)} WHERE id = ?
+                """, (user_id,))
+                conn.execute("DELETE FROM user_sessions WHERE user_id = ?", (user_id,))
+                self._revoke_signed_sessions(user_id, conn)
+                conn.commit()
+            self._evict_user_sessions(user_id)
+            
+            self.log_activity(user_id, 'deactivation', {})
+            return True
+        
+        except Exception as e:
+            logger.error(f"User deactivation error: {e}")
+            return False
+    
     # Sesion - Verificar Sesion
     def verify_session(self, session_token: str) -> Tuple[bool, Optional[Dict]]:
-        """Verify if a session is valid and return user data"""
+        """Verify if a session is valid and return user data (served from a short TTL cache)"""
+        if is_signed_token(session_token):
+            return self._verify_signed_session(session_token)
+        
+        cached_user = self._get_cached_session(session_token)
+        if cached_user is not None:
+            return True, cached_user
+        
         try:
-            with db_manager.get_connection() as conn:
-                active_literal = db_manager.get_boolean_literal(True)
-                cursor = conn.execute(f"""
-                    SELECT us.*, u.username, u.email, u.first_name, u.last_name, u.is_active
-                    FROM user_sessions us
-                    JOIN users u ON us.user_id = u.id
-                    WHERE us.session_token = ? AND us.expires_at > ? AND u.is_active = {active_literal}
-                """, (session_token, datetime.now().isoformat()))
+            with db_manager.get_connection(readonly=True) as conn:
+                cursor = db_manager.execute_statement(
+                    conn, "session.verify", (session_token, datetime.now().isoformat())
+                )
                 
                 session_data = cursor.fetchone()
-                
-                if not session_data:
-                    return False, None
-                
-                # Update session activity
-                self.update_session_activity(session_token)
-                
-                # Prepare user data
-                user_data = {
-                    'id': session_data['user_id'],
-                    'username': session_data['username'],
-                    'email': session_data['email'],
-                    'first_name': session_data['first_name'],
-                    'last_name': session_data['last_name'],
-                    'is_active': session_data['is_active']
-                }
-                
-                return True, user_data
+            
+            if not session_data and db_manager.has_read_replica:
+                # La réplica puede no tener aún una sesión recién creada: confirmar en la principal
+                with db_manager.get_connection() as conn:
+                    session_data = db_manager.execute_statement(
+                        conn, "session.verify", (session_token, datetime.now().isoformat())
+                    ).fetchone()
+            
+            if not session_data:
+                self._evict_session(session_token)
+                return False, None
+            
+            # Prepare user data
+            user_data = {
+                'id': session_data['user_id'],
+                'username': session_data['username'],
+                'email': session_data['email'],
+                'first_name': session_data['first_name'],
+                'last_name': session_data['last_name'],
+                'is_active': session_data['is_active']
+            }
+            
+            self._cache_session(session_token, user_data, session_data['expires_at'])
+            return True, dict(user_data)
                 
         except Exception as e:
             logger.error(f"Session verification error: {e}")
             return False, None
+    
+    # Sesion - Verificar Sesion Firmada
+    def _verify_signed_session(self, session_token: str) -> Tuple[bool, Optional[Dict]]:
+        """Check signature, expiry and revocations in memory; the profile comes from a per-user cache"""
+        try:
+            claims = self.session_signer.verify(session_token) if self.session_signer else None
+            if claims is None or self.revocations.is_revoked(claims):
+                return False, None
+            
+            user_data = self._get_user_profile(claims.user_id)
+            if user_data is None:
+                return False, None
+            return True, user_data
+        
+        except Exception as e:
+            logger.error(f"Signed session verification error: {e}")
+            return False, None
+    
+    # Cache - Obtener Perfil de Usuario
+    def _get_user_profile(self, user_id: int) -> Optional[Dict]:
+        """User data for signed sessions, refreshed at most every session_cache_ttl seconds"""
+        now = time.monotonic()
+        with self._session_cache_lock:
+            cached = self._user_profiles.get(user_id)
+            if cached and now - cached[0] <= self.session_cache_ttl:
+                return dict(cached[1])
+        
+        with db_manager.get_connection(readonly=True) as conn:
+            row = db_manager.execute_statement(conn, "user.profile_by_id", (user_id,)).fetchone()
+        
+        with self._session_cache_lock:
+            if row is None:
+                self._user_profiles.pop(user_id, None)
+                return None
+            user_data = {
+                'id': row['id'],
+                'username': row['username'],
+                'email': row['email'],
+                'first_name': row['first_name'],
+                'last_name': row['last_name'],
+                'is_active': row['is_active']
+            }
+            self._user_profiles[user_id] = (now, user_data)
+            return dict(user_data)
+    
+    # Cache - Sembrar Sesion desde el Contexto de Usuario
+    def prime_session(self, session_token: str, context: UserContext):
+        """Seed the verified-session cache from the login context so the first verify_session skips the database"""
+        user_data = dict(context.user)
+        if is_signed_token(session_token):
+            with self._session_cache_lock:
+                self._user_profiles[user_data['id']] = (time.monotonic(), user_data)
+        elif context.session_expires_at is not None:
+            self._cache_session(session_token, user_data, context.session_expires_at)
+    
+    # Sesion - Revocar Sesiones Firmadas de Usuario
+    def _revoke_signed_sessions(self, user_id: int, conn=None):
+        """Revoke every signed token of a user (no-op when signed sessions were never configured)"""
+        if self.session_signer is not None:
+            self.revocations.revoke_user(user_id, self.session_timeout, conn)
+    
+    # Cache - Obtener Sesion Verificada en Cache
+    def _get_cached_session(self, session_token: str) -> Optional[Dict]:
+        """Return cached user data while the entry is fresh; throttles activity updates"""
+        now = time.monotonic()
+        with self._session_cache_lock:
+            entry = self._session_cache.get(session_token)
+            if entry is None:
+                return None
+            if now - entry['verified_at'] > self.session_cache_ttl or entry['expires_at'] <= datetime.now():
+                # Entrada vencida: no se sirve, pero se conserva activity_at para que la nueva
+                # verificación respete session_activity_interval (solo logout/_evict_session la borra)
+                return None
+            touch = now - entry['activity_at'] >= self.session_activity_interval
+            if touch:
+                entry['activity_at'] = now
+            user_data = dict(entry['user'])
+        
+        if touch:
+            self.update_session_activity(session_token)
+        return user_data
+    
+    # Cache - Guardar Sesion Verificada
+    def _cache_session(self, session_token: str, user_data: Dict, expires_at: Any):
+        """Store a freshly verified session and record activity if the interval has elapsed"""
+        expires_at = parse_timestamp(expires_at)
+        now = time.monotonic()
+        with self._session_cache_lock:
+            previous = self._session_cache.get(session_token)
+            touch = previous is None or now - previous['activity_at'] >= self.session_activity_interval
+            if len(self._session_cache) >= SESSION_CACHE_MAX_ENTRIES and previous is None:
+                # Descartar la entrada más antigua (orden de inserción)
+                self._session_cache.pop(next(iter(self._session_cache)))
+            self._session_cache[session_token] = {
+                'user': dict(user_data),
+                'expires_at': expires_at,
+                'verified_at': now,
+                'activity_at': now if touch else previous['activity_at'],
+            }
+        
+        if touch:
+            self.update_session_activity(session_token)
+    
+    # Cache - Invalidar Sesion
+    def _evict_session(self, session_token: str):
+        """Forget a cached session (logout)"""
+        with self._session_cache_lock:
+            self._session_cache.pop(session_token, None)
+    
+    # Cache - Invalidar Sesiones de Usuario
+    def _evict_user_sessions(self, user_id: int):
+        """Forget every cached session of a user (password/email change, deactivation)"""
+        with self._session_cache_lock:
+            self._user_profiles.pop(user_id, None)
+            for token in [token for token, entry in self._session_cache.items() if entry['user']['id'] == user_id]:
+                del self._session_cache[token]
 
 # Global auth service instance
 auth_service = AuthService()
@@ -565,6 +762,11 @@ def login_user(username: str, password: str) -> Tuple[bool, str]:
         st.session_state.user = data['user']
         st.session_state.authenticated = True
         st.session_state.session_token = data['session_token']
+        
+        # Cache - Precargar en una consulta lo que piden las primeras páginas (sesión, progreso, encuestas, ...)
+        context = load_user_context(data['user']['id'], data['session_token'])
+        if context is not None:
+            auth_service.prime_session(data['session_token'], context)
         return True, message
     else:
         return False, message
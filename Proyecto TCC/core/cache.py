@@ -0,0 +1,301 @@
+# Nombre del Archivo: cache.py
+# Descripción: Caché compartida en memoria - LRU acotada con expiración, instantáneas inmutables e invalidación entre procesos (PRAGMA data_version en SQLite, LISTEN/NOTIFY en PostgreSQL)
+# Autor: Fernando Bavera Villalba
+# Fecha: 25/10/2025
+
+import logging
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional
+
+from core.database import POSTGRES_AVAILABLE, connect_sqlite, db_manager, get_database_setting
+
+logger = logging.getLogger(__name__)
+
+# Configuracion - Valores por Defecto
+CACHE_POLL_INTERVAL = 1.0  # Segundos mínimos entre consultas de PRAGMA data_version
+CHANGE_OVERLAP = 60  # Segundos de last_updated que se vuelven a revisar (escrituras diferidas, commits desordenados)
+LISTEN_TIMEOUT = 5.0  # Segundos que el hilo LISTEN espera notificaciones antes de revisar si debe detenerse
+LISTEN_RETRY_DELAY = 5.0  # Segundos antes de reconectar el hilo LISTEN tras un error
+
+
+# Funcion - Congelar Diccionario
+def freeze(values: Mapping[str, Any]) -> Mapping[str, Any]:
+    """Read-only snapshot of a flat mapping: one shallow copy on write, none on read"""
+    return MappingProxyType(dict(values))
+
+
+# Clase - Cache LRU con Expiracion
+class TTLCache:
+    """
+    Caché LRU acotada a ``max_size`` entradas, cada una válida ``ttl`` segundos.
+
+    Es segura entre hilos y pensada para guardar instantáneas inmutables (ver
+    ``freeze``): los lectores reciben el mismo objeto sin copiarlo. La expiración
+    acota cuánto puede durar un valor desactualizado si una invalidación se pierde.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # clave -> (expira, valor)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # Consulta - Obtener Valor
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value (marking it recently used) or default when missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    # Cache - Guardar Valor
+    def set(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entries beyond max_size"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    # Cache - Reemplazar Valor Existente
+    def update(self, key: Hashable, func: Callable[[Any], Any]) -> bool:
+        """Replace a live entry with func(value), keeping its expiry; False when not cached"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return False
+            self._entries[key] = (entry[0], func(entry[1]))
+            return True
+
+    # Cache - Invalidar Entrada
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    # Cache - Invalidar Entrada Condicionalmente
+    def invalidate_if(self, key: Hashable, predicate: Callable[[Any], bool]):
+        """Drop the entry only when predicate(value) is true (e.g. its row changed)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and predicate(entry[1]):
+                del self._entries[key]
+                self.invalidations += 1
+
+    # Cache - Vaciar
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # Consulta - Estadisticas
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# Clase - Vigilante de Cambios en SQLite
+class SQLiteChangeWatcher:
+    """
+    Invalida una TTLCache cuando otro proceso modifica la tabla (SQLite).
+
+    ``PRAGMA data_version`` en una conexión propia cambia cuando cualquier otra
+    conexión confirma una escritura en el archivo, y consultarlo no lee páginas.
+    Solo cuando cambia se buscan las filas con ``stamp_column`` reciente y se
+    descartan las entradas cuya marca ya no coincide con la de la fila.
+    Se consulta de forma perezosa desde las lecturas, como mucho cada ``poll_interval``.
+    """
+
+    def __init__(self, cache: TTLCache, table: str, key_column: str, stamp_column: str,
+                 poll_interval: float = CACHE_POLL_INTERVAL, overlap: int = CHANGE_OVERLAP):
+        self.cache = cache
+        self.table = table
+        self.key_column = key_column
+        self.stamp_column = stamp_column
+        self.poll_interval = poll_interval
+        self.overlap = overlap
+        self._conn = None
+        self._lock = threading.Lock()
+        self._last_poll: Optional[float] = None
+        self._version: Optional[int] = None
+        self._checked_at: Optional[datetime] = None
+        self.changes = 0
+
+    # Sincronizacion - Consultar si Corresponde
+    def maybe_poll(self):
+        now = time.monotonic()
+        if self._last_poll is not None and now - self._last_poll < self.poll_interval:
+            return
+        if not self._lock.acquire(blocking=False):
+            return  # Otro hilo ya está consultando
+        try:
+            self._last_poll = now
+            self.poll()
+        except Exception as e:
+            logger.warning(f"Could not check {self.table} changes: {e}")
+            self._close()
+        finally:
+            self._lock.release()
+
+    # Sincronizacion - Consultar Cambios
+    def poll(self):
+        """Invalidate entries whose rows were written by another connection since the last poll"""
+        if self._conn is None:
+            if not os.path.exists(db_manager.db_path):
+                return
+            self._conn = connect_sqlite(db_manager.db_path, check_same_thread=False, readonly=True)
+        started = datetime.now()
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if self._version is not None and version != self._version:
+            since = self._checked_at - timedelta(seconds=self.overlap)
+            rows = self._conn.execute(
+                f"SELECT {self.key_column}, {self.stamp_column} FROM {self.table} WHERE {self.stamp_column} >= ?",
+                (since.isoformat(),),
+            ).fetchall()
+            self.changes += 1
+            for row in rows:
+                stamp = row[self.stamp_column]
+                self.cache.invalidate_if(row[self.key_column], lambda value: value.get(self.stamp_column) != stamp)
+        self._version = version
+        self._checked_at = started
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+        self._conn = None
+        self._version = None
+
+    # Sincronizacion - Detener
+    def stop(self):
+        with self._lock:
+            self._close()
+
+    # Consulta - Estadisticas
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": "data_version", "data_version": self._version, "changes": self.changes}
+
+
+# Clase - Escucha de Notificaciones PostgreSQL
+class PostgresChangeListener:
+    """
+    Invalida una TTLCache con LISTEN/NOTIFY (PostgreSQL).
+
+    Un trigger de la tabla envía ``NOTIFY <tabla>_changed, '<clave>'`` al confirmar
+    cada escritura, venga de este proceso, de otra réplica o de un script. Un hilo
+    en segundo plano mantiene una conexión propia escuchando el canal; al
+    (re)conectarse vacía la caché porque pudo perder notificaciones.
+    LISTEN necesita una conexión de sesión: con pgbouncer en modo transacción,
+    ``cache_listen_connection_string`` debe apuntar directo a la base de datos.
+    """
+
+    def __init__(self, cache: TTLCache, channel: str, dsn: str, key_type: Callable[[str], Hashable] = int):
+        self.cache = cache
+        self.channel = channel
+        self.dsn = dsn
+        self.key_type = key_type
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._worker: Optional[threading.Thread] = None
+        self.connected = False
+        self.notifications = 0
+
+    # Hilo - Iniciar si Corresponde
+    def maybe_poll(self):
+        """Start the listener thread on first use (notifications arrive on their own)"""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._stopped or (self._worker is not None and self._worker.is_alive()):
+                return
+            self._worker = threading.Thread(target=self._run, name=f"listen-{self.channel}", daemon=True)
+            self._worker.start()
+
+    # Hilo - Bucle de Escucha
+    def _run(self):
+        import psycopg2
+
+        while not self._stopped:
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {self.channel}")
+                self.cache.clear()
+                self.connected = True
+                while not self._stopped:
+                    if select.select([conn], [], [], LISTEN_TIMEOUT) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self.notifications += 1
+                        try:
+                            self.cache.invalidate(self.key_type(notify.payload))
+                        except ValueError:
+                            self.cache.clear()
+            except Exception as e:
+                logger.warning(f"Cache listener on {self.channel} failed: {e}")
+                time.sleep(LISTEN_RETRY_DELAY)
+            finally:
+                self.connected = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    # Hilo - Detener
+    def stop(self):
+        self._stopped = True
+
+    # Consulta - Estadisticas
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": "listen", "connected": self.connected, "notifications": self.notifications}
+
+
+# Funcion - Crear Vigilante de Cambios
+def watch_table_changes(cache: TTLCache, table: str, key_column: str, stamp_column: str):
+    """Cross-process invalidation for the configured backend (None when disabled by cache_invalidation)"""
+    if not bool(get_database_setting("cache_invalidation", True)):
+        return None
+    if db_manager.db_type == "supabase":
+        if not POSTGRES_AVAILABLE or not db_manager.connection_string:
+            return None
+        dsn = get_database_setting("cache_listen_connection_string", None) or db_manager.connection_string
+        return PostgresChangeListener(cache, f"{table}_changed", dsn)
+    return SQLiteChangeWatcher(
+        cache, table, key_column, stamp_column,
+        poll_interval=float(get_database_setting("cache_poll_interval", CACHE_POLL_INTERVAL)),
+    )
@@ -10,6 +10,7 @@ from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 from core.database import db_manager
+from core.user_context import get_user_context, invalidate_user_context
 
 logger = logging.getLogger(__name__)
 
@@ -82,34 +83,15 @@ def upsert_dashboard(
             conn.commit()
             
             # Cache - Invalidar caché para asegurar datos frescos en la próxima llamada
+            invalidate_user_context(user_id)
             list_user_dashboards.clear()
             
             return dashboard_id
 
-        # Creacion - Crear nuevo dashboard
+        # Creacion - Crear nuevo dashboard (id devuelto en la misma sentencia)
         logger.debug("Creating new dashboard for user %s", user_id)
-        if db_manager.db_type == "supabase":
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                INSERT INTO dashboards (
-                    user_id, dashboard_name, dashboard_config, is_public,
-                    created_at, updated_at, last_accessed
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                RETURNING id
-                """,
-                (user_id, dashboard_name, dashboard_config, is_public, now, now, now),
-            )
-            record = cursor.fetchone()
-            conn.commit()
-            
-            # Cache - Invalidar caché para asegurar datos frescos en la próxima llamada
-            list_user_dashboards.clear()
-            
-            return record["id"] if record else dashboard_id or 0
-
-        cursor = conn.execute(
+        new_dashboard_id = db_manager.execute_insert(
+            conn,
             """
             INSERT INTO dashboards (
                 user_id, dashboard_name, dashboard_config, is_public,
@@ -122,9 +104,10 @@ def upsert_dashboard(
         conn.commit()
         
         # Cache - Invalidar caché para asegurar datos frescos en la próxima llamada
+        invalidate_user_context(user_id)
         list_user_dashboards.clear()
         
-        return int(cursor.lastrowid)
+        return int(new_dashboard_id) if new_dashboard_id else 0
 
 
 # Consulta - Listar Dashboards del Usuario
@@ -138,7 +121,12 @@ def list_user_dashboards(user_id: int) -> List[Dict[str, Any]]:
     if not user_id:
         return []
 
-    with db_manager.get_connection() as conn:
+    # Cache - Usar los dashboards del contexto precargado al iniciar sesión si sigue vigente
+    context = get_user_context(user_id)
+    if context is not None:
+        return _build_dashboard_list(context.dashboards)
+
+    with db_manager.get_connection(readonly=True) as conn:
         cursor = conn.execute(
             """
             SELECT id, dashboard_name, dashboard_config,
@@ -151,6 +139,12 @@ def list_user_dashboards(user_id: int) -> List[Dict[str, Any]]:
         )
         rows = cursor.fetchall()
 
+    return _build_dashboard_list(rows)
+
+
+# Conversion - Construir Lista de Dashboards
+def _build_dashboard_list(rows) -> List[Dict[str, Any]]:
+    """Convertir filas de dashboards (consulta directa o contexto de usuario) al formato de la UI."""
     dashboards: List[Dict[str, Any]] = []
     for row in rows:
         record = _row_to_dict(row)
@@ -191,5 +185,6 @@ def delete_dashboard(dashboard_id: int, user_id: int) -> None:
         conn.commit()
     
     # Cache - Invalidar Cache para Asegurar Datos Frescos
+    invalidate_user_context(user_id)
     list_user_dashboards.clear()
 
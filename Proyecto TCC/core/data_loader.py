@@ -50,13 +50,16 @@ def load_uploaded_file(uploaded_file):
                 return None
         
         # Conversion - Intentar convertir columnas de fecha
-        for col in df.columns:
-            if 'date' in col.lower() or 'time' in col.lower():
-                try:
-                    df[col] = pd.to_datetime(df[col])
-                except:
-                    # Manejo de Errores - Si falla la conversión, continuar sin convertir
-                    pass
+        date_columns = [col for col in df.columns if 'date' in str(col).lower() or 'time' in str(col).lower()]
+        if date_columns:
+            # El DataFrame de un CSV grande es el guardado en la sesión (sin copia): no modificarlo
+            df = df.copy()
+        for col in date_columns:
+            try:
+                df[col] = pd.to_datetime(df[col])
+            except:
+                # Manejo de Errores - Si falla la conversión, continuar sin convertir
+                pass
                     
         # UI - Mostrar mensaje de éxito
         st.sidebar.success(f"{get_icon("✅", 20)} Cargadas {len(df)} filas de datos")
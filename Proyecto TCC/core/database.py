@@ -9,13 +9,21 @@ Fecha: 25/10/2025
 import json
 import logging
 import os
+import random
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+from weakref import WeakKeyDictionary
 
 import bcrypt
 
+from core.query_stats import InstrumentedSQLiteConnection, query_stats
+from core.statements import POSTGRES, PREPARED_STATEMENTS, get_statement, prepared_definition, translate
+
 # Importacion - Intentar Importar Soporte PostgreSQL (Opcional - para Supabase)
 try:
     import psycopg2
@@ -32,6 +40,10 @@ except ImportError:  # pragma: no cover - Streamlit not available in all environ
 # =============================================================================
 # Wrapper - Wrappers de PostgreSQL para Emular Metodos Convenientes de SQLite
 # =============================================================================
+# Prepared statements ya creados en cada conexión física (se liberan con la conexión)
+_PREPARED_BY_CONNECTION: "WeakKeyDictionary[Any, set]" = WeakKeyDictionary()
+
+
 class PostgresConnectionWrapper:
     """Wrapper that mimics sqlite3 connection API for psycopg2 connections."""
 
@@ -40,7 +52,7 @@ class PostgresConnectionWrapper:
         self._pool = pool
 
     def _adapt_query(self, query, params):
-        adapted_query = query.replace("?", "%s") if "?" in query else query
+        adapted_query = translate(query, POSTGRES)
         adapted_params = self._adapt_params(params)
         return adapted_query, adapted_params
 
@@ -60,6 +72,25 @@ class PostgresConnectionWrapper:
         cursor.execute(query, params)
         return cursor
 
+    def executemany(self, query, seq_of_params):
+        cursor = self.cursor()
+        cursor.executemany(query, seq_of_params)
+        return cursor
+
+    def execute_prepared(self, name, params=None):
+        """Run a registered statement as a server-side prepared statement"""
+        prepared_name, definition, param_count = prepared_definition(name)
+        prepared = _PREPARED_BY_CONNECTION.setdefault(self._connection, set())
+        if prepared_name not in prepared:
+            with self._connection.cursor() as raw_cursor:
+                raw_cursor.execute(definition)
+            prepared.add(prepared_name)
+
+        placeholders = ", ".join(["%s"] * param_count)
+        cursor = self.cursor()
+        cursor.execute(f"EXECUTE {prepared_name} ({placeholders})" if param_count else f"EXECUTE {prepared_name}", params)
+        return cursor
+
     def commit(self):
         return self._connection.commit()
 
@@ -84,35 +115,54 @@ class PostgresCursorWrapper:
         self._cursor = cursor
         self._connection_wrapper = connection_wrapper
         self._lastrowid = None
+        self._lastval_pending = False
+        self._buffered_row = None
 
     def _update_lastrowid(self, adapted_query):
+        """Fill lastrowid from RETURNING; plain INSERTs defer it until lastrowid is read"""
+        self._lastrowid = None
+        self._lastval_pending = False
+        self._buffered_row = None
+
         query = adapted_query.lstrip().upper()
         if not query.startswith("INSERT"):
-            self._lastrowid = None
             return
 
-        try:
-            temp_cursor = self._connection_wrapper._connection.cursor()
-            try:
-                temp_cursor.execute("SELECT LASTVAL()")
-                result = temp_cursor.fetchone()
-                self._lastrowid = result[0] if result else None
-            finally:
-                temp_cursor.close()
-        except Exception:
-            self._lastrowid = None
+        if "RETURNING" in query:
+            # Leer la fila devuelta una sola vez y conservarla para fetchone/fetchall
+            row = self._cursor.fetchone()
+            self._buffered_row = row
+            if row is not None:
+                self._lastrowid = row.get("id") if isinstance(row, dict) else row[0]
+        else:
+            # Sin RETURNING: solo consultar LASTVAL() si alguien lee lastrowid
+            self._lastval_pending = True
 
     def execute(self, query, params=None):
         adapted_query, adapted_params = self._connection_wrapper._adapt_query(query, params)
-        if adapted_params is None:
-            self._cursor.execute(adapted_query)
-        else:
-            self._cursor.execute(adapted_query, adapted_params)
+        start = time.perf_counter()
+        try:
+            if adapted_params is None:
+                self._cursor.execute(adapted_query)
+            else:
+                self._cursor.execute(adapted_query, adapted_params)
+        except Exception:
+            self._record(query, start, error=True)
+            raise
+        self._record(query, start)
         self._update_lastrowid(adapted_query)
         return self
 
+    def _record(self, query, start, error=False):
+        """Feed the statement latency and affected/returned row count to query_stats"""
+        if query_stats.enabled:
+            rows = -1 if error else self._cursor.rowcount
+            query_stats.record(query, (time.perf_counter() - start) * 1000, rows, error=error)
+
     def executemany(self, query, seq_of_params):
         adapted_query, _ = self._connection_wrapper._adapt_query(query, None)
+        self._lastval_pending = False
+        self._buffered_row = None
         if seq_of_params is None:
             self._cursor.executemany(adapted_query, None)
             self._lastrowid = None
@@ -121,25 +171,53 @@ class PostgresCursorWrapper:
         adapted_params_list = [
             self._connection_wrapper._adapt_params(params) for params in seq_of_params
         ]
-        self._cursor.executemany(adapted_query, adapted_params_list)
+        start = time.perf_counter()
+        try:
+            self._cursor.executemany(adapted_query, adapted_params_list)
+        except Exception:
+            self._record(query, start, error=True)
+            raise
+        self._record(query, start)
         self._lastrowid = None
         return self
 
     @property
     def lastrowid(self):
+        if self._lastval_pending:
+            self._lastval_pending = False
+            try:
+                temp_cursor = self._connection_wrapper._connection.cursor()
+                try:
+                    temp_cursor.execute("SELECT LASTVAL()")
+                    result = temp_cursor.fetchone()
+                    self._lastrowid = result[0] if result else None
+                finally:
+                    temp_cursor.close()
+            except Exception:
+                self._lastrowid = None
         return self._lastrowid
 
     def fetchone(self):
+        if self._buffered_row is not None:
+            row, self._buffered_row = self._buffered_row, None
+            return row
         return self._cursor.fetchone()
 
     def fetchall(self):
-        return self._cursor.fetchall()
+        rows = self._cursor.fetchall()
+        if self._buffered_row is not None:
+            rows = [self._buffered_row] + list(rows)
+            self._buffered_row = None
+        return rows
 
     def close(self):
         return self._cursor.close()
 
     def __iter__(self):
-        return iter(self._cursor)
+        if self._buffered_row is not None:
+            row, self._buffered_row = self._buffered_row, None
+            yield row
+        yield from self._cursor
 
     def __enter__(self):
         return self
@@ -157,21 +235,452 @@ logger = logging.getLogger(__name__)
 # Configuracion - Configuracion de Base de Datos
 DB_PATH = 'tcc_database.db'
 MIGRATIONS_DIR = 'migrations'
+SCHEMA_VERSION = 7  # Última versión de DatabaseManager._schema_migrations
+SCHEMA_LOCK_ID = 712001  # Advisory lock de PostgreSQL para inicializar el esquema
+SQLITE_TIMEOUT = 5.0  # Segundos de espera ante bloqueos concurrentes
+SQLITE_POOL_SIZE = 5  # Conexiones inactivas retenidas por archivo de base de datos
+
+# Configuracion - Perfiles de Rendimiento SQLite (seleccionables con sqlite_profile o TCC_SQLITE_PROFILE)
+SQLITE_PROFILE_ENV = "TCC_SQLITE_PROFILE"
+SQLITE_DEFAULT_PROFILE = "balanced"
+SQLITE_PROFILES: Dict[str, Dict[str, Any]] = {
+    # PRAGMAs anteriores: fsync en cada commit, caché y archivos temporales por defecto de SQLite
+    "safe": {"synchronous": "FULL", "cache_size": -2000, "mmap_size": 0, "temp_store": "DEFAULT",
+             "busy_retries": 3, "busy_backoff_ms": 25.0},
+    # Con WAL, NORMAL no arriesga la integridad: ante un corte de energía solo puede perder los últimos commits
+    "balanced": {"synchronous": "NORMAL", "cache_size": -16000, "mmap_size": 64 * 1024 * 1024,
+                 "temp_store": "MEMORY", "busy_retries": 5, "busy_backoff_ms": 25.0},
+    "fast": {"synchronous": "NORMAL", "cache_size": -64000, "mmap_size": 256 * 1024 * 1024,
+             "temp_store": "MEMORY", "busy_retries": 8, "busy_backoff_ms": 10.0},
+}
+_SQLITE_PRAGMA_VALUES = {
+    "synchronous": ("OFF", "NORMAL", "FULL", "EXTRA"),
+    "temp_store": ("DEFAULT", "FILE", "MEMORY"),
+}
+_SQLITE_WRITE_KEYWORDS = ("INSERT", "UPDATE", "DELETE", "REPLACE", "BEGIN")
+_ACTIVE_SQLITE_PROFILE: Optional[Dict[str, Any]] = None
+
+# Configuracion - Resolver Perfil SQLite
+def get_sqlite_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """Resolve a SQLite profile by name (env > secrets > default), applying per-knob overrides.
+
+    Each knob can be overridden with ``sqlite_<knob>`` in secrets or
+    ``TCC_SQLITE_<KNOB>`` in the environment, e.g. ``sqlite_mmap_size = 0``.
+    """
+    name = str(name or os.environ.get(SQLITE_PROFILE_ENV)
+               or get_database_setting("sqlite_profile", SQLITE_DEFAULT_PROFILE)).lower()
+    if name not in SQLITE_PROFILES:
+        logger.warning(f"Unknown SQLite profile '{name}', using '{SQLITE_DEFAULT_PROFILE}'")
+        name = SQLITE_DEFAULT_PROFILE
+
+    profile = dict(SQLITE_PROFILES[name])
+    for knob, default in SQLITE_PROFILES[name].items():
+        value = os.environ.get(f"TCC_SQLITE_{knob.upper()}", get_database_setting(f"sqlite_{knob}"))
+        if value is None:
+            continue
+        value = type(default)(value) if not isinstance(default, str) else str(value).upper()
+        if knob in _SQLITE_PRAGMA_VALUES and value not in _SQLITE_PRAGMA_VALUES[knob]:
+            logger.warning(f"Ignoring invalid sqlite_{knob} = {value}")
+            continue
+        profile[knob] = value
+    profile["name"] = name
+    return profile
+
+# Configuracion - Perfil SQLite Activo
+def active_sqlite_profile() -> Dict[str, Any]:
+    """Profile used by every SQLite connection of this process (resolved once)"""
+    global _ACTIVE_SQLITE_PROFILE
+    if _ACTIVE_SQLITE_PROFILE is None:
+        _ACTIVE_SQLITE_PROFILE = get_sqlite_profile()
+        logger.info(f"SQLite profile: {_ACTIVE_SQLITE_PROFILE}")
+    return _ACTIVE_SQLITE_PROFILE
+
+# Reintento - Ejecutar con Reintento ante SQLITE_BUSY
+def _retry_on_busy(conn: "SQLiteConnection", sql: str, func, *args):
+    """Retry a write with exponential backoff when SQLite reports the database as locked/busy.
+
+    Only statements that start their own transaction are retried: inside an
+    explicit transaction the caller's earlier reads may be stale, so the
+    error is raised and the whole unit of work has to be repeated.
+    """
+    if conn.busy_retries <= 0 or conn.in_transaction or not sql.lstrip()[:7].upper().startswith(_SQLITE_WRITE_KEYWORDS):
+        return func(*args)
+
+    attempt = 0
+    while True:
+        try:
+            return func(*args)
+        except sqlite3.OperationalError as e:
+            message = str(e).lower()
+            if attempt >= conn.busy_retries or ("locked" not in message and "busy" not in message):
+                raise
+            if conn.in_transaction:
+                conn.rollback()  # Solo el BEGIN implícito de esta misma sentencia, sin cambios
+            delay = conn.busy_backoff_ms * (2 ** attempt) * random.uniform(0.5, 1.5) / 1000
+            logger.debug(f"SQLite busy, retry {attempt + 1}/{conn.busy_retries} in {delay * 1000:.0f} ms")
+            time.sleep(delay)
+            attempt += 1
+
+
+class SQLiteCursor(sqlite3.Cursor):
+    """sqlite3.Cursor whose writes are retried on SQLITE_BUSY"""
+
+    def execute(self, sql, parameters=()):
+        return _retry_on_busy(self.connection, sql, super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        # Materializar los parámetros: un iterador consumido no se puede reintentar
+        seq_of_parameters = list(seq_of_parameters)
+        return _retry_on_busy(self.connection, sql, super().executemany, sql, seq_of_parameters)
+
+
+class SQLiteConnection(sqlite3.Connection):
+    """sqlite3.Connection that hands out SQLiteCursor (busy retry settings come from the profile)"""
+    busy_retries = 0
+    busy_backoff_ms = 25.0
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or SQLiteCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+# Conexion - Abrir Conexion SQLite Configurada
+def connect_sqlite(db_path: str, timeout: float = SQLITE_TIMEOUT, check_same_thread: bool = True,
+                   profile: Optional[Dict[str, Any]] = None, readonly: bool = False) -> sqlite3.Connection:
+    """Open a sqlite3 connection with the project PRAGMAs and the performance profile applied"""
+    profile = profile or active_sqlite_profile()
+    if readonly:
+        return _connect_sqlite_readonly(db_path, timeout, check_same_thread, profile)
+    conn = sqlite3.connect(db_path, timeout=timeout, check_same_thread=check_same_thread, factory=SQLiteConnection)
+    conn.row_factory = sqlite3.Row  # Enable dict-like access
+    conn.busy_retries = int(profile["busy_retries"])
+    conn.busy_backoff_ms = float(profile["busy_backoff_ms"])
+    conn.execute("PRAGMA foreign_keys = ON")  # Enable foreign key constraints
+    # Enable WAL mode for better concurrent access
+    journal_mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+    synchronous = profile["synchronous"]
+    if str(journal_mode).lower() != "wal" and synchronous in ("OFF", "NORMAL"):
+        synchronous = "FULL"  # Sin WAL, NORMAL puede corromper la base ante un corte de energía
+    conn.execute(f"PRAGMA synchronous = {synchronous}")
+    conn.execute(f"PRAGMA cache_size = {int(profile['cache_size'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(profile['mmap_size'])}")
+    conn.execute(f"PRAGMA temp_store = {profile['temp_store']}")
+    return conn
+
+# Conexion - Abrir Conexion SQLite de Solo Lectura
+def _connect_sqlite_readonly(db_path: str, timeout: float, check_same_thread: bool,
+                             profile: Dict[str, Any]) -> sqlite3.Connection:
+    """Open db_path with mode=ro (falls back to mode=rw with query_only when ro is not possible; never creates the file)"""
+    if not os.path.exists(db_path):
+        raise sqlite3.OperationalError(f"unable to open database file: {db_path} does not exist")
+    uri = Path(os.path.abspath(db_path)).as_uri()
+    try:
+        conn = sqlite3.connect(f"{uri}?mode=ro", uri=True, timeout=timeout, check_same_thread=check_same_thread)
+        conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone()
+    except sqlite3.OperationalError as e:
+        # WAL sin -shm accesible en solo lectura: mode=rw no crea el archivo y query_only impide escrituras
+        logger.debug(f"SQLite mode=ro unavailable for {db_path} ({e}); using mode=rw with query_only")
+        conn = sqlite3.connect(f"{uri}?mode=rw", uri=True, timeout=timeout, check_same_thread=check_same_thread)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only = ON")
+    conn.execute(f"PRAGMA cache_size = {int(profile['cache_size'])}")
+    conn.execute(f"PRAGMA mmap_size = {int(profile['mmap_size'])}")
+    conn.execute(f"PRAGMA temp_store = {profile['temp_store']}")
+    return conn
+
+# =============================================================================
+# Pool - Pool de Conexiones SQLite Reutilizables
+# =============================================================================
+class SQLiteConnectionPool:
+    """
+    Pool acotado de conexiones sqlite3 configuradas una sola vez.
+
+    Las conexiones se crean con los PRAGMA necesarios al abrirse, se validan
+    al entregarse y se devuelven al pool al salir del contexto. Si todas las
+    conexiones están en uso se abre una adicional, que se cierra al devolverse
+    cuando el pool ya retiene ``max_size`` conexiones inactivas.
+    """
+
+    def __init__(self, db_path: str, max_size: int = SQLITE_POOL_SIZE, timeout: float = SQLITE_TIMEOUT,
+                 readonly: bool = False):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.readonly = readonly
+        self._idle: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    # Conexion - Crear Conexion Configurada
+    def _create_connection(self) -> sqlite3.Connection:
+        """Open a new pooled connection (usable from any thread, one user at a time)"""
+        return connect_sqlite(self.db_path, timeout=self.timeout, check_same_thread=False, readonly=self.readonly)
+
+    # Validacion - Verificar Salud de Conexion
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        """Check that a pooled connection is still usable"""
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    # Conexion - Cerrar Conexion Descartada
+    def _discard(self, conn: sqlite3.Connection):
+        """Close a connection that will not return to the pool"""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    # Conexion - Obtener Conexion del Pool
+    def getconn(self) -> sqlite3.Connection:
+        """Take an idle, healthy connection from the pool or open a new one"""
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._create_connection()
+            if self._is_healthy(conn):
+                return conn
+            self._discard(conn)
+
+    # Conexion - Devolver Conexion al Pool
+    def putconn(self, conn: sqlite3.Connection, discard: bool = False):
+        """Return a connection to the pool, discarding uncommitted work"""
+        if not discard:
+            try:
+                # Same semantics as closing: pending changes are never carried over
+                if conn.in_transaction:
+                    conn.rollback()
+            except sqlite3.Error:
+                discard = True
+
+        if not discard:
+            with self._lock:
+                if len(self._idle) < self.max_size:
+                    self._idle.append(conn)
+                    return
+        self._discard(conn)
+
+    # Conexion - Cerrar Todas las Conexiones
+    def closeall(self):
+        """Close every idle connection (e.g. before deleting the database file)"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+
+_SQLITE_POOLS: Dict[Tuple[str, bool], SQLiteConnectionPool] = {}
+_SQLITE_POOLS_LOCK = threading.Lock()
+
+# Inicializacion - Esquemas ya verificados en este proceso (ruta SQLite o DSN PostgreSQL)
+_SCHEMA_READY: Set[str] = set()
+_SCHEMA_INIT_LOCK = threading.RLock()
+
+# Conexion - Obtener Pool SQLite Compartido
+def get_sqlite_pool(db_path: str, readonly: bool = False) -> SQLiteConnectionPool:
+    """Return the process-wide pool for a SQLite file (one per absolute path and access mode)"""
+    key = (os.path.abspath(db_path), readonly)
+    with _SQLITE_POOLS_LOCK:
+        pool = _SQLITE_POOLS.get(key)
+        if pool is None:
+            pool_size = int(get_database_setting("sqlite_pool_size", SQLITE_POOL_SIZE))
+            pool = SQLiteConnectionPool(db_path, max_size=pool_size, readonly=readonly)
+            _SQLITE_POOLS[key] = pool
+        return pool
+
+# =============================================================================
+# Pool - Pool de Conexiones PostgreSQL Thread-Safe e Instrumentado
+# =============================================================================
+class PostgresConnectionPool:
+    """
+    Pool de conexiones psycopg2 seguro entre hilos.
+
+    A diferencia de SimpleConnectionPool, espera hasta ``timeout`` segundos
+    cuando todas las conexiones están en uso, valida las conexiones antes de
+    entregarlas, recicla las que superan ``max_lifetime`` y lleva contadores
+    de uso consultables con ``stats()``.
+    """
+
+    def __init__(self, dsn: str, minconn: int = 1, maxconn: int = 10, timeout: float = 10.0,
+                 max_lifetime: float = 1800.0, validate_after: float = 30.0):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.validate_after = validate_after
+        self._idle: List[Any] = []
+        self._created_at: Dict[int, float] = {}
+        self._returned_at: Dict[int, float] = {}
+        self._size = 0
+        self._condition = threading.Condition()
+        self._counters = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "failures": 0,
+            "recycled": 0,
+        }
+        for _ in range(minconn):
+            with self._condition:
+                self._size += 1
+            self._idle.append(self._connect())
+
+    # Conexion - Abrir Conexion Nueva
+    def _connect(self):
+        """Open a new psycopg2 connection; the caller has already reserved a slot"""
+        try:
+            conn = psycopg2.connect(self.dsn)
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._counters["failures"] += 1
+                self._condition.notify()
+            raise
+        now = time.monotonic()
+        self._created_at[id(conn)] = now
+        self._returned_at[id(conn)] = now
+        return conn
+
+    # Conexion - Descartar Conexion
+    def _discard(self, conn):
+        """Close a connection and free its slot in the pool"""
+        self._created_at.pop(id(conn), None)
+        self._returned_at.pop(id(conn), None)
+        try:
+            if not conn.closed:
+                conn.close()
+        except Exception:
+            pass
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    # Validacion - Verificar Conexion Utilizable
+    def _is_usable(self, conn) -> bool:
+        """Check that an idle connection is open, fresh and responsive"""
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        if now - self._created_at.get(id(conn), now) > self.max_lifetime:
+            with self._condition:
+                self._counters["recycled"] += 1
+            return False
+        if now - self._returned_at.get(id(conn), now) > self.validate_after:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                conn.rollback()
+            except Exception:
+                return False
+        return True
+
+    # Conexion - Obtener Conexion del Pool
+    def getconn(self):
+        """Check out a connection, waiting up to ``timeout`` seconds if the pool is exhausted"""
+        from psycopg2.pool import PoolError
+
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = None
+            with self._condition:
+                waited = False
+                while not self._idle and self._size >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters["timeouts"] += 1
+                        raise PoolError(f"Connection pool exhausted after waiting {self.timeout}s")
+                    if not waited:
+                        self._counters["waits"] += 1
+                        waited = True
+                    self._condition.wait(remaining)
+                if self._idle:
+                    conn = self._idle.pop()
+                else:
+                    self._size += 1
+                self._counters["checkouts"] += 1
+
+            if conn is None:
+                return self._connect()
+            if self._is_usable(conn):
+                return conn
+            self._discard(conn)
+            with self._condition:
+                self._counters["checkouts"] -= 1
+
+    # Conexion - Devolver Conexion al Pool
+    def putconn(self, conn, close: bool = False):
+        """Return a connection to the pool, rolling back any open transaction"""
+        if not close and not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                close = True
+        if close or conn.closed:
+            with self._condition:
+                self._counters["failures"] += 1
+            self._discard(conn)
+            return
+
+        self._returned_at[id(conn)] = time.monotonic()
+        with self._condition:
+            self._idle.append(conn)
+            self._condition.notify()
+
+    # Conexion - Cerrar Todas las Conexiones
+    def closeall(self):
+        """Close every idle connection"""
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+    # Estadisticas - Obtener Contadores del Pool
+    def stats(self) -> Dict[str, Any]:
+        """Return pool counters and current occupancy"""
+        with self._condition:
+            return {
+                **self._counters,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "minconn": self.minconn,
+                "maxconn": self.maxconn,
+            }
+
+
+# Conexion - Crear Pool PostgreSQL con Configuracion de Secrets
+def _create_postgres_pool(connection_string: str) -> PostgresConnectionPool:
+    """Build a Postgres pool sized from the [database] secrets section"""
+    return PostgresConnectionPool(
+        connection_string,
+        minconn=int(get_database_setting("pg_pool_min", 1)),
+        maxconn=int(get_database_setting("pg_pool_max", 10)),
+        timeout=float(get_database_setting("pg_pool_timeout", 10.0)),
+        max_lifetime=float(get_database_setting("pg_pool_max_lifetime", 1800.0)),
+    )
 
 if POSTGRES_AVAILABLE:
     if st is not None:
         @st.cache_resource(show_spinner=False)
         def get_connection_pool(connection_string: str):
-            from psycopg2.pool import SimpleConnectionPool
-            return SimpleConnectionPool(minconn=1, maxconn=5, dsn=connection_string)
+            return _create_postgres_pool(connection_string)
     else:
         _POOL_CACHE: Dict[str, Any] = {}
+        _POOL_CACHE_LOCK = threading.Lock()
 
         def get_connection_pool(connection_string: str):
-            from psycopg2.pool import SimpleConnectionPool
-            if connection_string not in _POOL_CACHE:
-                _POOL_CACHE[connection_string] = SimpleConnectionPool(minconn=1, maxconn=5, dsn=connection_string)
-            return _POOL_CACHE[connection_string]
+            with _POOL_CACHE_LOCK:
+                if connection_string not in _POOL_CACHE:
+                    _POOL_CACHE[connection_string] = _create_postgres_pool(connection_string)
+                return _POOL_CACHE[connection_string]
 
 # Consulta - Obtener Tipo de Base de Datos desde Secrets
 def get_db_type():
@@ -183,6 +692,26 @@ def get_db_type():
     except:
         return "sqlite"  # Default a SQLite
 
+# Consulta - Obtener Parametro Opcional de Base de Datos
+def get_database_setting(key: str, default: Any = None) -> Any:
+    """Lee un parámetro opcional de la sección [database] de secrets"""
+    try:
+        import streamlit as st
+        return st.secrets.get("database", {}).get(key, default)
+    except Exception:
+        return default
+
+# Configuracion - Instrumentacion de Consultas
+query_stats.enabled = bool(get_database_setting("query_stats", True))
+query_stats.slow_query_ms = float(get_database_setting("slow_query_ms", query_stats.slow_query_ms))
+
+# Conversion - Normalizar Marca de Tiempo
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """TIMESTAMP columns come back as ISO strings from SQLite and as datetime from PostgreSQL"""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
 # Consulta - Obtener Connection String de Supabase
 def get_supabase_connection_string():
     """Obtiene el connection string de Supabase desde secrets"""
@@ -192,6 +721,15 @@ def get_supabase_connection_string():
     except:
         return ""
 
+# Consulta - Obtener Connection String de Lectura de Supabase
+def get_supabase_read_connection_string():
+    """Obtiene el connection string opcional para lecturas (réplica) desde secrets"""
+    try:
+        import streamlit as st
+        return st.secrets.get("supabase", {}).get("read_connection_string", "")
+    except Exception:
+        return ""
+
 # ============================================================================
 # DATABASE MANAGER CLASS
 # ============================================================================
@@ -210,6 +748,11 @@ class DatabaseManager:
         self.db_path = db_path
         self.db_type = get_db_type()
         self.connection_string = get_supabase_connection_string() if self.db_type == "supabase" else None
+        # Réplica de lectura opcional para get_connection(readonly=True); sin ella se usa la principal en modo READ ONLY
+        self.read_connection_string = (get_supabase_read_connection_string() or None) if self.db_type == "supabase" else None
+        self.sqlite_pooling = bool(get_database_setting("sqlite_pooling", True))
+        # Prepared statements del servidor: desactivados por defecto (incompatibles con pgbouncer en modo transacción)
+        self.prepared_statements = bool(get_database_setting("pg_prepared_statements", False))
         self.ensure_migrations_dir()
         
         # Verificar disponibilidad de PostgreSQL si se requiere
@@ -235,6 +778,33 @@ class DatabaseManager:
         else:
             return conn.execute(sql)
     
+    # Base de Datos - Ejecutar Sentencia Registrada
+    def execute_statement(self, conn, name: str, params=None):
+        """Execute a statement from core.statements translated (once, cached) for the current backend.
+
+        Hot statements listed in PREPARED_STATEMENTS run as server-side prepared
+        statements on PostgreSQL when ``pg_prepared_statements`` is enabled.
+        """
+        if self.db_type == "supabase":
+            if self.prepared_statements and name in PREPARED_STATEMENTS:
+                return conn.execute_prepared(name, params)
+            return conn.execute(get_statement(name, self.db_type), params)
+        return conn.execute(get_statement(name, self.db_type), params if params is not None else ())
+
+    # Base de Datos - Insertar y Obtener ID Generado
+    def execute_insert(self, conn, query: str, params=None) -> Optional[int]:
+        """Run an INSERT and return the generated id without an extra round trip.
+
+        On PostgreSQL the statement gets ``RETURNING id`` appended, so the id comes
+        back with the INSERT itself; on SQLite it is read from ``cursor.lastrowid``.
+        INSERTs whose id is not needed should keep using ``conn.execute``.
+        """
+        if self.db_type == "supabase":
+            cursor = conn.execute(f"{query.rstrip().rstrip(';')} RETURNING id", params)
+        else:
+            cursor = conn.execute(query, params if params is not None else ())
+        return cursor.lastrowid
+
     # Base de Datos - Obtener Literal Booleano
     def get_boolean_literal(self, value: bool) -> str:
         """Return boolean literal suitable for current database backend"""
@@ -244,16 +814,39 @@ class DatabaseManager:
     
     # Conexion - Obtener Conexion a Base de Datos
     @contextmanager
-    def get_connection(self):
+    def get_connection(self, readonly: bool = False):
+        """Get database connection; the schema is verified lazily on the first use in this process.
+
+        ``readonly=True`` returns a connection that cannot write: SQLite opens the
+        file with ``mode=ro``/``query_only`` from a separate pool, so reads never
+        wait for a writer's connection; PostgreSQL uses ``read_connection_string``
+        when configured and always runs the transaction as READ ONLY.
+        """
+        if self._schema_key() not in _SCHEMA_READY:
+            self._ensure_schema_on_first_use()
+        with self._connect(readonly) as conn:
+            yield conn
+    
+    # Conexion - Verificar Replica de Lectura
+    @property
+    def has_read_replica(self) -> bool:
+        """True when readonly connections may lag behind writes (separate PostgreSQL read DSN)"""
+        return bool(self.read_connection_string) and self.read_connection_string != self.connection_string
+    
+    # Conexion - Abrir Conexion sin Verificar Esquema
+    @contextmanager
+    def _connect(self, readonly: bool = False):
         """Get database connection with proper configuration (SQLite or PostgreSQL)"""
         if self.db_type == "supabase" and POSTGRES_AVAILABLE and self.connection_string:
             # PostgreSQL/Supabase connection (with optional pooling)
-            pool = get_connection_pool(self.connection_string) if 'get_connection_pool' in globals() else None
+            dsn = self.read_connection_string if readonly and self.read_connection_string else self.connection_string
+            pool = get_connection_pool(dsn) if 'get_connection_pool' in globals() else None
             raw_conn = None
             wrapper = None
             try:
-                raw_conn = pool.getconn() if pool else psycopg2.connect(self.connection_string)
+                raw_conn = pool.getconn() if pool else psycopg2.connect(dsn)
                 raw_conn.autocommit = False  # Use transactions
+                raw_conn.readonly = True if readonly else None  # BEGIN READ ONLY; se restablece en cada préstamo del pool
                 wrapper = PostgresConnectionWrapper(raw_conn, pool if pool else None)
                 yield wrapper
             except Exception as e:
@@ -270,39 +863,168 @@ class DatabaseManager:
                 elif raw_conn:
                     raw_conn.close()
         else:
-            # SQLite connection (default)
-            # Add timeout to handle concurrent access (5 seconds)
-            conn = sqlite3.connect(self.db_path, timeout=5.0)
-            conn.row_factory = sqlite3.Row  # Enable dict-like access
-            conn.execute("PRAGMA foreign_keys = ON")  # Enable foreign key constraints
-            # Enable WAL mode for better concurrent access
-            conn.execute("PRAGMA journal_mode = WAL")
+            # SQLite connection (default), reused from the shared pool when enabled
+            pool = get_sqlite_pool(self.db_path, readonly) if self.sqlite_pooling else None
+            conn = pool.getconn() if pool else connect_sqlite(self.db_path, readonly=readonly)
+            broken = False
             
             try:
-                yield conn
+                # Proxy de instrumentación: mide cada sentencia sin tocar la conexión del pool
+                yield InstrumentedSQLiteConnection(conn, query_stats) if query_stats.enabled else conn
             except Exception as e:
                 logger.error(f"Database error: {e}")
-                conn.rollback()
+                try:
+                    conn.rollback()
+                except sqlite3.Error:
+                    broken = True
                 raise
             finally:
-                conn.close()
+                if pool:
+                    pool.putconn(conn, discard=broken)
+                else:
+                    conn.close()
+    
+    # Conexion - Cerrar Conexiones Reutilizables
+    def close_connections(self):
+        """Close pooled SQLite connections (required before deleting the database file)"""
+        if self.db_type != "supabase":
+            get_sqlite_pool(self.db_path).closeall()
+            get_sqlite_pool(self.db_path, readonly=True).closeall()
+        _SCHEMA_READY.discard(self._schema_key())
+    
+    # Inicializacion - Clave del Esquema Verificado
+    def _schema_key(self) -> str:
+        """Identify the database this manager points to (shared by all instances in the process)"""
+        if self.db_type == "supabase":
+            return self.connection_string or ""
+        return os.path.abspath(self.db_path)
+    
+    # Inicializacion - Inicializar Esquema en el Primer Uso
+    def _ensure_schema_on_first_use(self):
+        """Lazy counterpart of ensure_database_initialized: failures are logged, not raised"""
+        try:
+            self.ensure_database_initialized()
+        except Exception as e:
+            # Let the caller's own query surface the real error
+            logger.warning(f"Could not initialize database on first use: {e}")
+    
+    # Conexion - Reutilizar Transaccion del Llamador
+    @contextmanager
+    def transaction(self, conn=None):
+        """Reuse the caller's transaction when given one; otherwise open and commit a connection"""
+        if conn is not None:
+            yield conn
+            return
+        with (self.get_connection() if self._schema_key() in _SCHEMA_READY else self._connect()) as own_conn:
+            yield own_conn
+            own_conn.commit()
+    
+    # Consulta - Verificar Existencia de Tabla
+    def _table_exists(self, conn, table: str) -> bool:
+        """Check whether a table exists without raising (safe inside a transaction)"""
+        if self.db_type == "supabase":
+            cursor = conn.execute("""
+                SELECT EXISTS (
+                    SELECT FROM information_schema.tables
+                    WHERE table_schema = 'public' AND table_name = ?
+                ) AS present
+            """, (table,))
+            return bool(cursor.fetchone()['present'])
+        cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name = ?", (table,))
+        return cursor.fetchone() is not None
+    
+    # Consulta - Obtener Version de Esquema
+    def get_schema_version(self, conn=None) -> int:
+        """Return the applied schema version (0 when the schema has never been versioned)"""
+        if conn is not None:
+            if not self._table_exists(conn, "schema_version"):
+                return 0
+            row = conn.execute("SELECT MAX(version) AS version FROM schema_version").fetchone()
+            return int(row['version'] or 0) if row else 0
+        
+        # Ruta rápida de arranque: una sola lectura; si la tabla no existe, la versión es 0
+        if self.db_type != "supabase" and not os.path.exists(self.db_path):
+            return 0
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT MAX(version) AS version FROM schema_version").fetchone()
+                return int(row['version'] or 0) if row else 0
+        except Exception:
+            return 0
     
     # Inicializacion - Inicializar Base de Datos
     def init_database(self):
-        """Initialize database with essential tables including file uploads"""
+        """Create or upgrade the schema to SCHEMA_VERSION in a single transaction"""
         logger.info("Initializing database with essential tables...")
         
-        # Create essential tables
-        self.create_users_table()
-        self.create_user_sessions_table()
-        self.create_user_progress_table()
-        self.create_quiz_attempts_table()
-        self.create_quiz_answers_table()
-        self.create_rate_limiting_table()
-        self.create_survey_responses_table()
+        with self._connect() as conn:
+            # Serializar inicializaciones concurrentes (otros procesos o réplicas)
+            if self.db_type == "supabase":
+                conn.execute("SELECT pg_advisory_xact_lock(?)", (SCHEMA_LOCK_ID,))
+            else:
+                conn.execute("BEGIN IMMEDIATE")
+            
+            current_version = self.get_schema_version(conn)
+            if current_version >= SCHEMA_VERSION:
+                conn.rollback()
+                _SCHEMA_READY.add(self._schema_key())
+                logger.info(f"Database schema already at version {current_version}")
+                return
+            
+            self._execute_sql(conn, """
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description VARCHAR(255),
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            for version, description, apply in self._schema_migrations():
+                if version <= current_version:
+                    continue
+                apply(conn)
+                conn.execute(
+                    "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                    (version, description, datetime.now().isoformat()),
+                )
+                logger.info(f"Applied schema version {version}: {description}")
+            
+            conn.commit()
+        
+        _SCHEMA_READY.add(self._schema_key())
+        logger.info("Database initialization completed with essential tables")
+    
+    # Migracion - Lista de Versiones de Esquema
+    def _schema_migrations(self):
+        """Ordered (version, description, apply(conn)) steps; append new versions at the end"""
+        return [
+            (1, "Essential tables and indexes", self._create_base_schema),
+            (2, "user_progress.nivel0_completed (migrations/add_nivel0_column.py)",
+             lambda conn: self._add_column_if_missing(conn, "user_progress", "nivel0_completed", "BOOLEAN", False)),
+            (3, "users.onboarding_completed (migrations/add_onboarding_column.py)",
+             lambda conn: self._add_column_if_missing(conn, "users", "onboarding_completed", "BOOLEAN", False)),
+            (4, "Unique rate_limiting.identifier (one row per identifier, upserted)",
+             self._unique_rate_limiting_identifier),
+            (5, "session_revocations for signed session tokens", self.create_session_revocations_table),
+            (6, "user_progress change tracking for cross-process cache invalidation (core/cache.py)",
+             self._user_progress_change_tracking),
+            (7, "Analytics aggregate tables, backfilled from quiz and survey history (core/analytics.py)",
+             self._analytics_aggregates),
+        ]
+    
+    # Migracion - Crear Esquema Base
+    def _create_base_schema(self, conn):
+        """Create the essential tables and indexes inside the caller's transaction"""
+        self.create_users_table(conn)
+        self.create_user_sessions_table(conn)
+        self.create_user_progress_table(conn)
+        self.create_quiz_attempts_table(conn)
+        self.create_quiz_answers_table(conn)
+        self.create_rate_limiting_table(conn)
+        self.create_survey_responses_table(conn)
         
         # Dashboard table (used - stores dashboard configs with components as JSON)
-        self.create_dashboards_table()
+        self.create_dashboards_table(conn)
         
         # Unused tables removed (see docs/TABLE_USAGE_ANALYSIS.md):
         # - uploaded_files (files handled in session_state, not persisted)
@@ -311,14 +1033,68 @@ class DatabaseManager:
         # - user_activity_log (logging not implemented in database)
         
         # Create indexes
-        self.create_indexes()
+        self.create_indexes(conn)
+    
+    # Migracion - Identificador Unico en Rate Limiting
+    def _unique_rate_limiting_identifier(self, conn):
+        """Keep the newest row per identifier and replace the plain index with a unique one"""
+        conn.execute("""
+            DELETE FROM rate_limiting
+            WHERE id NOT IN (SELECT MAX(id) FROM rate_limiting GROUP BY identifier)
+        """)
+        conn.execute("DROP INDEX IF EXISTS idx_rate_limiting_identifier")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_rate_limiting_identifier_unique ON rate_limiting(identifier)")
+    
+    # Migracion - Seguimiento de Cambios en Progreso
+    def _user_progress_change_tracking(self, conn):
+        """Index last_updated (SQLite change polling) and NOTIFY user_progress_changed on every write (PostgreSQL)"""
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_progress_last_updated ON user_progress(last_updated)")
+        if self.db_type != "supabase":
+            return
+        self._execute_sql(conn, """
+            CREATE OR REPLACE FUNCTION notify_row_change() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    PERFORM pg_notify(TG_TABLE_NAME || '_changed', row_to_json(OLD) ->> TG_ARGV[0]);
+                ELSE
+                    PERFORM pg_notify(TG_TABLE_NAME || '_changed', row_to_json(NEW) ->> TG_ARGV[0]);
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        self._execute_sql(conn, "DROP TRIGGER IF EXISTS user_progress_changed ON user_progress")
+        self._execute_sql(conn, """
+            CREATE TRIGGER user_progress_changed
+            AFTER INSERT OR UPDATE OR DELETE ON user_progress
+            FOR EACH ROW EXECUTE PROCEDURE notify_row_change('user_id')
+        """)
+    
+    # Migracion - Tablas de Analiticas
+    def _analytics_aggregates(self, conn):
+        """Create the aggregate tables and fill them from the existing attempts and surveys"""
+        from core.analytics import rebuild_aggregates
+
+        self.create_analytics_tables(conn)
+        rebuild_aggregates(conn)
+    
+    # Migracion - Agregar Columna si No Existe
+    def _add_column_if_missing(self, conn, table: str, column: str, column_type: str, default: Any):
+        """Add a column to an existing table (no-op when it is already there)"""
+        if isinstance(default, bool):
+            default = self.get_boolean_literal(default)
+        if self.db_type == "supabase":
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {column_type} DEFAULT {default}")
+            return
         
-        logger.info("Database initialization completed with essential tables")
+        columns = [row['name'] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+        if column not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type} DEFAULT {default}")
     
     # Tabla - Crear Tabla de Usuarios
-    def create_users_table(self):
+    def create_users_table(self, conn=None):
         """Create users table"""
-        with self.get_connection() as conn:
+        with self.transaction(conn) as conn:
             cursor = conn.cursor()
             
             # SQL syntax differs slightly between SQLite and PostgreSQL
@@ -364,12 +1140,11 @@ class DatabaseManager:
                         onboarding_completed BOOLEAN DEFAULT 0
                     )
                 """)
-            conn.commit()
     
     # Tabla - Crear Tabla de Sesiones
-    def create_user_sessions_table(self):
+    def create_user_sessions_table(self, conn=None):
         """Create user sessions table"""
-        with self.get_connection() as conn:
+        with self.transaction(conn) as conn:
             cursor = conn.cursor()
             
             if self.db_type == "supabase":
@@ -400,12 +1175,11 @@ class DatabaseManager:
                         FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
                     )
                 """)
-            conn.commit()
     
     # Tabla - Crear Tabla de Progreso
-    def create_user_progress_table(self):
+    def create_user_progress_table(self, conn=None):
         """Create user progress table"""
-        with self.get_connection() as conn:
+        with self.transaction(conn) as conn:
             cursor = conn.cursor()
             
             if self.db_type == "supabase":
@@ -440,12 +1214,11 @@ class DatabaseManager:
                         FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
                     )
                 """)
-            conn.commit()
     
     # Tabla - Crear Tabla de Intentos de Quiz
-    def create_quiz_attempts_table(self):
+    def create_quiz_attempts_table(self, conn=None):
         """Create quiz attempts table"""
-        with self.get_connection() as conn:
+        with self.transaction(conn) as conn:
             cursor = conn.cursor()
             
             if self.db_type == "supabase":
@@ -478,12 +1251,11 @@ class DatabaseManager:
                         FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
                     )
                 """)
-            conn.commit()
     
     # Tabla - Crear Tabla de Respuestas de Quiz
-    def create_quiz_answers_table(self):
+    def create_quiz_answers_table(self, conn=None):
         """Create quiz answers table"""
-        with self.get_connection() as conn:
+        with self.transaction(conn) as conn:
             cursor = conn.cursor()
             
             if self.db_type == "supabase":
@@ -512,12 +1284,11 @@ class DatabaseManager:
                         FOREIGN KEY (quiz_attempt_id) REFERENCES quiz_attempts(id) ON DELETE CASCADE
                     )
                 """)
-            conn.commit()
     
     # Tabla - Crear Tabla de Logros
-    def create_achievements_table(self):
+    def create_achievements_table(self, conn=None):
         """Create achievements table (optional - for future gamification)"""
-        with self.get_connection() as conn:
+        with self.transaction(conn) as conn:
             cursor = conn.cursor()
             
             if self.db_type == "supabase":
@@ -544,12 +1315,11 @@ class DatabaseManager:
                         FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
                     )
                 """)
-            conn.commit()
     
     # Tabla - Crear Tabla de Archivos Subidos
-    def create_uploaded_files_table(self):
+    def create_uploaded_files_table(self, conn=None):
         """Create uploaded files table"""
-        with self.get_connection() as conn:
+        with self.transaction(conn) as conn:
             cursor = conn.cursor()
             
             if self.db_type == "supabase":
@@ -584,12 +1354,11 @@ class DatabaseManager:
                         FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
                     )
                 """)
-            conn.commit()
     
     # Tabla - Crear Tabla de Sesiones de Analisis
-    def create_file_analysis_sessions_table(self):
+    def create_file_analysis_sessions_table(self, conn=None):
         """Create file analysis sessions table"""
-        with self.get_connection() as conn:
+        with self.transaction(conn) as conn:
             cursor = conn.cursor()
             
             if self.db_type == "supabase":
@@ -622,12 +1391,11 @@ class DatabaseManager:
                         FOREIGN KEY (file_id) REFERENCES uploaded_files(id) ON DELETE CASCADE
                     )
                 """)
-            conn.commit()
     
     # Tabla - Crear Tabla de Dashboards
-    def create_dashboards_table(self):
+    def create_dashboards_table(self, conn=None):
         """Create dashboards table"""
-        with self.get_connection() as conn:
+        with self.transaction(conn) as conn:
             cursor = conn.cursor()
             
             if self.db_type == "supabase":
@@ -658,12 +1426,11 @@ class DatabaseManager:
                         FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
                     )
                 """)
-            conn.commit()
     
     # Tabla - Crear Tabla de Componentes de Dashboard
-    def create_dashboard_components_table(self):
+    def create_dashboard_components_table(self, conn=None):
         """Create dashboard components table"""
-        with self.get_connection() as conn:
+        with self.transaction(conn) as conn:
             cursor = conn.cursor()
             
             if self.db_type == "supabase":
@@ -696,12 +1463,11 @@ class DatabaseManager:
                         FOREIGN KEY (dashboard_id) REFERENCES dashboards(id) ON DELETE CASCADE
                     )
                 """)
-            conn.commit()
     
     # Tabla - Crear Tabla de Log de Actividad
-    def create_user_activity_log_table(self):
+    def create_user_activity_log_table(self, conn=None):
         """Create user activity log table (optional - for security auditing)"""
-        with self.get_connection() as conn:
+        with self.transaction(conn) as conn:
             cursor = conn.cursor()
             
             if self.db_type == "supabase":
@@ -730,12 +1496,11 @@ class DatabaseManager:
                         FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
                     )
                 """)
-            conn.commit()
     
     # Tabla - Crear Tabla de Metricas del Sistema
-    def create_system_metrics_table(self):
+    def create_system_metrics_table(self, conn=None):
         """Create system metrics table"""
-        with self.get_connection() as conn:
+        with self.transaction(conn) as conn:
             cursor = conn.cursor()
             
             if self.db_type == "supabase":
@@ -760,12 +1525,11 @@ class DatabaseManager:
                         additional_data TEXT
                     )
                 """)
-            conn.commit()
     
     # Tabla - Crear Tabla de Rate Limiting
-    def create_rate_limiting_table(self):
+    def create_rate_limiting_table(self, conn=None):
         """Create rate limiting table"""
-        with self.get_connection() as conn:
+        with self.transaction(conn) as conn:
             cursor = conn.cursor()
             
             if self.db_type == "supabase":
@@ -788,12 +1552,11 @@ class DatabaseManager:
                         locked_until TIMESTAMP
                     )
                 """)
-            conn.commit()
     
     # Tabla - Crear Tabla de Respuestas de Encuestas
-    def create_survey_responses_table(self):
+    def create_survey_responses_table(self, conn=None):
         """Create survey responses table for all survey types"""
-        with self.get_connection() as conn:
+        with self.transaction(conn) as conn:
             cursor = conn.cursor()
             
             if self.db_type == "supabase":
@@ -822,12 +1585,78 @@ class DatabaseManager:
                         UNIQUE(user_id, survey_type, level)
                     )
                 """)
-            conn.commit()
+    
+    # Tabla - Crear Tabla de Revocaciones de Sesion
+    def create_session_revocations_table(self, conn=None):
+        """Create revocations table for signed session tokens (see core/session_tokens.py)"""
+        with self.transaction(conn) as conn:
+            cursor = conn.cursor()
+            
+            if self.db_type == "supabase":
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS session_revocations (
+                        id SERIAL PRIMARY KEY,
+                        token_id VARCHAR(64),
+                        user_id INTEGER,
+                        revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        expires_at TIMESTAMP NOT NULL
+                    )
+                """)
+            else:
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS session_revocations (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        token_id VARCHAR(64),
+                        user_id INTEGER,
+                        revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        expires_at TIMESTAMP NOT NULL
+                    )
+                """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_session_revocations_revoked ON session_revocations(revoked_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_session_revocations_expires ON session_revocations(expires_at)")
+    
+    # Tabla - Crear Tablas de Analiticas
+    def create_analytics_tables(self, conn=None):
+        """Create the aggregate tables kept up to date by core/analytics.py (same DDL on both backends)"""
+        with self.transaction(conn) as conn:
+            # Intentos por nivel, día (UTC) y tramo de porcentaje: distribución y tasa de aprobación
+            self._execute_sql(conn, """
+                CREATE TABLE IF NOT EXISTS analytics_quiz_daily (
+                    level VARCHAR(20) NOT NULL,
+                    day VARCHAR(10) NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    passed INTEGER NOT NULL DEFAULT 0,
+                    percentage_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                    PRIMARY KEY (level, day, bucket)
+                )
+            """)
+            # Respuestas y aciertos por pregunta: dificultad
+            self._execute_sql(conn, """
+                CREATE TABLE IF NOT EXISTS analytics_question_stats (
+                    level VARCHAR(20) NOT NULL,
+                    question_text TEXT NOT NULL,
+                    answered INTEGER NOT NULL DEFAULT 0,
+                    correct INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (level, question_text)
+                )
+            """)
+            # Conteo de cada valor Likert por encuesta, nivel ('' sin nivel) y pregunta
+            self._execute_sql(conn, """
+                CREATE TABLE IF NOT EXISTS analytics_survey_likert (
+                    survey_type VARCHAR(50) NOT NULL,
+                    level VARCHAR(20) NOT NULL,
+                    question VARCHAR(100) NOT NULL,
+                    value INTEGER NOT NULL,
+                    responses INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (survey_type, level, question, value)
+                )
+            """)
     
     # Indice - Crear Indices de Base de Datos
-    def create_indexes(self):
+    def create_indexes(self, conn=None):
         """Create database indexes for performance"""
-        with self.get_connection() as conn:
+        with self.transaction(conn) as conn:
             # User authentication indexes
             conn.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)")
@@ -854,59 +1683,41 @@ class DatabaseManager:
             # - user_activity_log indexes (table not used)
             
             # Rate limiting indexes
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_rate_limiting_identifier ON rate_limiting(identifier)")
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_rate_limiting_identifier_unique ON rate_limiting(identifier)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_rate_limiting_last_attempt ON rate_limiting(last_attempt)")
             
             # Survey indexes
             conn.execute("CREATE INDEX IF NOT EXISTS idx_survey_user_type ON survey_responses(user_id, survey_type)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_survey_completed ON survey_responses(completed_at)")
             
-            conn.commit()
     
     # Consulta - Verificar Existencia de Base de Datos
     def check_database_exists(self) -> bool:
         """Check if database exists (SQLite file or PostgreSQL connection)"""
-        if self.db_type == "supabase":
-            # For PostgreSQL, check if we can connect and if tables exist
-            try:
-                with self.get_connection() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        SELECT EXISTS (
-                            SELECT FROM information_schema.tables 
-                            WHERE table_schema = 'public' 
-                            AND table_name = 'users'
-                        )
-                    """)
-                    return cursor.fetchone()[0]
-            except:
-                return False
-        else:
-            # SQLite - check if file exists AND if tables are created
-            if not os.path.exists(self.db_path):
-                return False
-            
-            # Also verify that essential tables exist
-            try:
-                with self.get_connection() as conn:
-                    cursor = conn.cursor()
-                    # Check for essential tables
-                    cursor.execute("""
-                        SELECT name FROM sqlite_master 
-                        WHERE type='table' AND name='users'
-                    """)
-                    if not cursor.fetchone():
-                        return False  # Database file exists but tables not created
-                    return True
-            except:
-                # If we can't connect, database might be corrupted or locked
-                return False
+        if self.db_type != "supabase" and not os.path.exists(self.db_path):
+            return False
+        try:
+            with self._connect() as conn:
+                return self._table_exists(conn, "users")
+        except Exception:
+            # If we can't connect, database might be corrupted or locked
+            return False
     
     # Inicializacion - Asegurar Inicializacion de Base de Datos
     def ensure_database_initialized(self):
-        """Ensure database is initialized - creates it if it doesn't exist or is incomplete"""
-        if not self.check_database_exists():
-            logger.info("Database not found or incomplete, initializing...")
+        """Ensure database is initialized - one version read per process, full bootstrap only when behind"""
+        key = self._schema_key()
+        if key in _SCHEMA_READY:
+            return
+        
+        # Serializar el primer uso: las peticiones concurrentes esperan a la misma inicialización
+        with _SCHEMA_INIT_LOCK:
+            if key in _SCHEMA_READY:
+                return
+            if self.get_schema_version() >= SCHEMA_VERSION:
+                _SCHEMA_READY.add(key)
+                return
+            logger.info("Database schema missing or outdated, initializing...")
             try:
                 self.init_database()
                 logger.info("Database initialized successfully")
@@ -941,7 +1752,8 @@ class DatabaseManager:
                     "tables": tables,
                     "user_count": user_count,
                     "file_size_bytes": 0,  # Not applicable for PostgreSQL
-                    "file_size_mb": 0
+                    "file_size_mb": 0,
+                    "pool": get_connection_pool(self.connection_string).stats()
                 }
             else:
                 # SQLite query
@@ -965,32 +1777,10 @@ class DatabaseManager:
 # Global database manager instance
 db_manager = DatabaseManager()
 
-# Inicializacion - Auto Inicializar Base de Datos al Importar Modulo
-# Esto asegura que la base de datos siempre este lista cuando cualquier modulo la importe
-# Usando una bandera a nivel de modulo para prevenir multiples inicializaciones
-_db_initialized = False
-
-# Inicializacion - Auto Inicializar Base de Datos
-def _auto_init_database():
-    """Auto-initialize database when module is imported"""
-    global _db_initialized
-    if _db_initialized:
-        return
-    
-    try:
-        if not db_manager.check_database_exists():
-            logger.info("Auto-initializing database on module import...")
-            db_manager.init_database()
-            logger.info("Database auto-initialized successfully")
-        _db_initialized = True
-    except Exception as e:
-        # Don't fail on import if there's an error - let it fail later when actually used
-        logger.warning(f"Could not auto-initialize database on import: {e}")
-        # Still mark as attempted to avoid repeated tries
-        _db_initialized = True
-
-# Inicializacion - Ejecutar Auto Inicializacion (Solo una Vez)
-_auto_init_database()
+# Inicializacion - Inicializacion Perezosa
+# Importar este modulo no abre conexiones: el esquema se verifica en la primera llamada a
+# get_connection() (protegida por un lock). Los puntos de arranque pueden adelantarlo
+# llamando a ensure_database_initialized(), como hace Inicio.py.
 
 # Conexion - Obtener Conexion (Compatibilidad)
 def get_db_connection():
@@ -1009,7 +1799,7 @@ def check_database_exists():
 
 # Inicializacion - Asegurar Inicializacion (Compatibilidad)
 def ensure_database_initialized():
-    """Ensure database is initialized - creates it if it doesn't exist or is incomplete"""
+    """Pre-initialize the database from a startup hook (creates or upgrades the schema if needed)"""
     return db_manager.ensure_database_initialized()
 
 # Consulta - Obtener Informacion (Compatibilidad)
@@ -0,0 +1,188 @@
+# Nombre del Archivo: maintenance.py
+# Descripción: Mantenimiento programado de la base de datos - Purga por lotes de sesiones y rate limits expirados, ANALYZE, checkpoint WAL y VACUUM incremental en SQLite
+# Autor: Fernando Bavera Villalba
+# Fecha: 25/10/2025
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from core.database import db_manager, get_database_setting
+from core.security_features import security_features
+
+logger = logging.getLogger(__name__)
+
+# Configuracion - Valores por Defecto
+MAINTENANCE_INTERVAL = 3600  # Segundos entre ejecuciones en segundo plano (0 = desactivado)
+MAINTENANCE_BATCH_SIZE = 500  # Filas borradas por transacción
+VACUUM_FREELIST_RATIO = 0.2  # Fracción de páginas libres que justifica compactar un archivo sin auto_vacuum
+INCREMENTAL_VACUUM_PAGES = 2000  # Páginas liberadas por ejecución con auto_vacuum=INCREMENTAL
+
+
+# Limpieza - Borrar por Lotes
+def _delete_in_batches(table: str, where: str, params: tuple, batch_size: int) -> int:
+    """Delete matching rows batch_size at a time, committing each batch so writers are never blocked for long"""
+    total = 0
+    while True:
+        with db_manager.get_connection() as conn:
+            cursor = conn.execute(f"""
+                DELETE FROM {table}
+                WHERE id IN (SELECT id FROM {table} WHERE {where} LIMIT ?)
+            """, params + (batch_size,))
+            deleted = cursor.rowcount or 0
+            conn.commit()
+        total += deleted
+        if deleted < batch_size:
+            return total
+
+
+# Limpieza - Purgar Filas Expiradas
+def purge_expired_rows(batch_size: int = MAINTENANCE_BATCH_SIZE) -> Dict[str, int]:
+    """Purge expired sessions, stale rate-limit rows and expired revocations"""
+    now = datetime.now()
+    window_start = now - timedelta(minutes=security_features.rate_limit_window)
+    return {
+        "user_sessions": _delete_in_batches(
+            "user_sessions", "expires_at < ?", (now.isoformat(),), batch_size
+        ),
+        "rate_limiting": _delete_in_batches(
+            "rate_limiting", "last_attempt < ? AND (locked_until IS NULL OR locked_until < ?)",
+            (window_start.isoformat(), now.isoformat()), batch_size
+        ),
+        "session_revocations": _delete_in_batches(
+            "session_revocations", "expires_at < ?", (now.isoformat(), ), batch_size
+        ),
+    }
+
+
+# Archivo - Tamaño de Base de Datos SQLite
+def _sqlite_file_size(db_path: str) -> int:
+    """Database file plus WAL size in bytes"""
+    return sum(os.path.getsize(path) for path in (db_path, f"{db_path}-wal") if os.path.exists(path))
+
+
+# Compactacion - Compactar SQLite
+def compact_sqlite(vacuum: bool = True) -> Dict[str, Any]:
+    """ANALYZE, give free pages back to the filesystem and checkpoint the WAL"""
+    result: Dict[str, Any] = {}
+    with db_manager.get_connection() as conn:
+        conn.execute("ANALYZE")
+        conn.commit()
+        result["analyzed"] = True
+
+        if vacuum:
+            result.update(_vacuum_sqlite(conn))
+
+        # Checkpoint al final: el VACUUM también escribe en el WAL
+        checkpoint = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        result["wal_checkpoint"] = {"busy": checkpoint[0], "log_pages": checkpoint[1], "checkpointed": checkpoint[2]}
+    return result
+
+
+# Compactacion - VACUUM de SQLite
+def _vacuum_sqlite(conn) -> Dict[str, Any]:
+    """Incremental VACUUM, or a one-off full VACUUM that switches the file to incremental auto_vacuum"""
+    result: Dict[str, Any] = {}
+    auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    result["free_pages_before"] = freelist
+
+    if auto_vacuum == 2:
+        # INCREMENTAL: liberar páginas sin reescribir el archivo completo
+        # executescript ejecuta el pragma hasta el final (execute solo libera una página por paso)
+        conn.executescript(f"PRAGMA incremental_vacuum({INCREMENTAL_VACUUM_PAGES});")
+        result["vacuum"] = "incremental"
+    elif page_count and freelist / page_count >= VACUUM_FREELIST_RATIO:
+        # Archivo sin auto_vacuum incremental: un VACUUM completo lo convierte, los siguientes son incrementales
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        result["vacuum"] = "full (converted to incremental auto_vacuum)"
+    else:
+        result["vacuum"] = "skipped"
+    result["free_pages_after"] = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return result
+
+
+# Compactacion - Analizar PostgreSQL
+def analyze_postgres() -> Dict[str, Any]:
+    """Refresh planner statistics of the purged tables (VACUUM is left to autovacuum)"""
+    with db_manager.get_connection() as conn:
+        for table in ("user_sessions", "rate_limiting", "session_revocations"):
+            conn.execute(f"ANALYZE {table}")
+        conn.commit()
+    return {"analyzed": True}
+
+
+# Mantenimiento - Ejecutar Mantenimiento Completo
+def run_maintenance(batch_size: int = MAINTENANCE_BATCH_SIZE, vacuum: bool = True) -> Dict[str, Any]:
+    """Run every maintenance step and return a report of what was reclaimed"""
+    start = time.perf_counter()
+    report: Dict[str, Any] = {"started_at": datetime.now().isoformat(), "db_type": db_manager.db_type}
+
+    sqlite_path = db_manager.db_path if db_manager.db_type != "supabase" else None
+    if sqlite_path:
+        report["size_before_bytes"] = _sqlite_file_size(sqlite_path)
+
+    report["deleted_rows"] = purge_expired_rows(batch_size)
+    report.update(compact_sqlite(vacuum) if sqlite_path else analyze_postgres())
+
+    if sqlite_path:
+        report["size_after_bytes"] = _sqlite_file_size(sqlite_path)
+        report["reclaimed_bytes"] = report["size_before_bytes"] - report["size_after_bytes"]
+    report["duration_seconds"] = round(time.perf_counter() - start, 3)
+
+    logger.info(f"Maintenance finished: deleted {report['deleted_rows']}, "
+                f"reclaimed {report.get('reclaimed_bytes', 0)} bytes in {report['duration_seconds']}s")
+    return report
+
+
+# Clase - Programador de Mantenimiento
+class MaintenanceScheduler:
+    """Ejecuta run_maintenance cada ``interval`` segundos en un hilo en segundo plano"""
+
+    def __init__(self, interval: float = MAINTENANCE_INTERVAL, batch_size: int = MAINTENANCE_BATCH_SIZE):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.last_report: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    # Hilo - Iniciar Programador
+    def start(self) -> bool:
+        """Start the background thread (no-op when disabled or already running)"""
+        if self.interval <= 0:
+            return False
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return True
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="db-maintenance", daemon=True)
+            self._thread.start()
+        return True
+
+    # Hilo - Detener Programador
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        # Esperar un intervalo antes de la primera ejecución para no competir con el arranque
+        while not self._stop.wait(self.interval):
+            try:
+                self.last_report = run_maintenance(self.batch_size)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Scheduled maintenance failed: {e}")
+
+
+# Instancia global del programador de mantenimiento
+maintenance_scheduler = MaintenanceScheduler(
+    interval=float(get_database_setting("maintenance_interval", MAINTENANCE_INTERVAL)),
+    batch_size=int(get_database_setting("maintenance_batch_size", MAINTENANCE_BATCH_SIZE)),
+)
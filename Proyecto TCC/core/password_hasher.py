@@ -0,0 +1,131 @@
+# Nombre del Archivo: password_hasher.py
+# Descripción: Hash de contraseñas con bcrypt - Pool acotado de hilos, calibración del costo al arrancar y detección de hashes a regenerar
+# Autor: Fernando Bavera Villalba
+# Fecha: 25/10/2025
+
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import bcrypt
+
+from core.database import get_database_setting
+
+logger = logging.getLogger(__name__)
+
+# Configuracion - Valores por Defecto
+BCRYPT_TARGET_MS = 250.0  # Latencia objetivo de un hash al calibrar
+BCRYPT_DEFAULT_ROUNDS = 12  # Costo por defecto de bcrypt.gensalt()
+BCRYPT_MIN_ROUNDS = BCRYPT_DEFAULT_ROUNDS  # La calibración solo sube el costo: nunca por debajo del de bcrypt
+BCRYPT_MAX_ROUNDS = 14
+BCRYPT_MEASURE_ROUNDS = 10  # Costo medido al calibrar (barato) y extrapolado
+BCRYPT_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+
+# Clase - Hasheador de Contraseñas
+class PasswordHasher:
+    """
+    Ejecuta bcrypt en un pool acotado de hilos.
+
+    bcrypt libera el GIL mientras calcula, así que los hashes corren en paralelo
+    hasta ``workers`` a la vez sin bloquear los hilos de otras sesiones; las
+    peticiones que exceden el límite esperan su turno en el pool. El costo se
+    calibra una vez por proceso para acercarse a ``target_ms`` por hash, sin bajar
+    nunca de BCRYPT_DEFAULT_ROUNDS (un host lento no debilita los hashes nuevos).
+    """
+
+    def __init__(self, workers: int = BCRYPT_WORKERS, target_ms: float = BCRYPT_TARGET_MS,
+                 min_rounds: int = BCRYPT_MIN_ROUNDS, max_rounds: int = BCRYPT_MAX_ROUNDS,
+                 rounds: Optional[int] = None):
+        self.workers = workers
+        self.target_ms = target_ms
+        self.min_rounds = max(min_rounds, BCRYPT_DEFAULT_ROUNDS)
+        self.max_rounds = max_rounds
+        self._rounds = rounds  # Costo fijo por configuración: se omite la calibración
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    # Pool - Ejecutar en el Pool
+    def _run(self, func: Callable, *args):
+        """Run a bcrypt call on the bounded pool and wait for the result"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor.submit(func, *args).result()
+
+    # Calibracion - Costo Actual
+    @property
+    def rounds(self) -> int:
+        """Cost factor used for new hashes (calibrated on first use)"""
+        if self._rounds is None:
+            self.calibrate()
+        return self._rounds
+
+    # Calibracion - Calibrar Costo
+    def calibrate(self) -> int:
+        """Pick the highest cost (at least min_rounds) whose hash time stays within target_ms; runs once per process"""
+        with self._lock:
+            if self._rounds is not None:
+                return self._rounds
+
+            try:
+                # Medir a un costo barato (mediana de 3) y extrapolar: cada ronda duplica el tiempo
+                samples = []
+                for _ in range(3):
+                    start = time.perf_counter()
+                    bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds=BCRYPT_MEASURE_ROUNDS))
+                    samples.append((time.perf_counter() - start) * 1000)
+                elapsed_ms = sorted(samples)[1]
+                extra = math.floor(math.log2(self.target_ms / elapsed_ms)) if elapsed_ms > 0 else 0
+                # Solo hacia arriba: un host lento o cargado se queda en min_rounds
+                self._rounds = max(self.min_rounds, min(self.max_rounds, BCRYPT_MEASURE_ROUNDS + extra))
+                logger.info(f"bcrypt cost calibrated to {self._rounds} ({elapsed_ms:.0f} ms at cost {BCRYPT_MEASURE_ROUNDS})")
+            except Exception as e:
+                logger.warning(f"bcrypt calibration failed, using cost {self.min_rounds}: {e}")
+                self._rounds = self.min_rounds
+            return self._rounds
+
+    # Hash - Hashear Contraseña
+    def hash(self, password: str) -> str:
+        """Hash a password with the calibrated cost"""
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return self._run(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+    # Hash - Verificar Contraseña
+    def verify(self, password: str, password_hash: str) -> bool:
+        """Check a password against a stored hash"""
+        return self._run(bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+
+    # Hash - Verificar si Requiere Regenerarse
+    def needs_rehash(self, password_hash: str) -> bool:
+        """True when the stored hash was made with a lower cost than the current one (never downgrades)"""
+        try:
+            # Formato: $2b$<costo>$<salt+hash>
+            return int(password_hash.split('$')[2]) < self.rounds
+        except (IndexError, ValueError):
+            return False
+
+    # Pool - Cerrar Pool
+    def shutdown(self):
+        """Stop the worker threads"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+# Configuracion - Costo Fijo Opcional
+_configured_rounds = get_database_setting("bcrypt_rounds", None)
+
+# Instancia global del hasheador de contraseñas
+password_hasher = PasswordHasher(
+    workers=int(get_database_setting("bcrypt_workers", BCRYPT_WORKERS)),
+    target_ms=float(get_database_setting("bcrypt_target_ms", BCRYPT_TARGET_MS)),
+    min_rounds=int(get_database_setting("bcrypt_min_rounds", BCRYPT_MIN_ROUNDS)),
+    rounds=int(_configured_rounds) if _configured_rounds else None,
+)
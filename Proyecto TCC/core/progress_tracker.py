@@ -7,61 +7,113 @@ from utils.ui.icon_system import get_icon, replace_emojis
 
 import streamlit as st
 import logging
-import copy
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, Tuple
-from core.database import db_manager
+from typing import Dict, Any, Mapping, Optional, Tuple
+from core.cache import TTLCache, freeze, watch_table_changes
+from core.database import db_manager, get_database_setting
+from core.write_behind import merge_increment, write_behind_queue
 
 logger = logging.getLogger(__name__)
 
+# Configuracion - Valores por Defecto
+PROGRESS_CACHE_SIZE = 2048  # Usuarios con progreso en caché por proceso
+PROGRESS_CACHE_TTL = 300.0  # Segundos máximos de un progreso en caché si se pierde una invalidación
+PROGRESS_PRIMARY_READ_WINDOW = 10.0  # Segundos tras una escritura propia en que se lee de la principal y no de la réplica
+
 # Clase - Rastreador de Progreso
 class ProgressTracker:
     """Maneja el seguimiento del progreso de aprendizaje del usuario"""
     
     def __init__(self):
         self.levels = ['nivel0', 'nivel1', 'nivel2', 'nivel3', 'nivel4']
-        self._cache: Dict[int, Dict[str, Any]] = {}
+        # Cache - Instantáneas inmutables por usuario; otros procesos la invalidan vía last_updated/NOTIFY
+        self._cache = TTLCache(
+            max_size=int(get_database_setting("progress_cache_size", PROGRESS_CACHE_SIZE)),
+            ttl=float(get_database_setting("progress_cache_ttl", PROGRESS_CACHE_TTL)),
+        )
+        self._watcher = watch_table_changes(self._cache, "user_progress", "user_id", "last_updated")
+        # Usuarios escritos hace poco: la réplica de lectura puede no tener aún su fila nueva
+        self._recent_writes = TTLCache(
+            max_size=int(get_database_setting("progress_cache_size", PROGRESS_CACHE_SIZE)),
+            ttl=float(get_database_setting("progress_primary_read_window", PROGRESS_PRIMARY_READ_WINDOW)),
+        )
     
     # Cache - Invalidar Cache de Progreso
     def _invalidate_cache(self, user_id: int):
         """Remover progreso en caché para un usuario."""
-        self._cache.pop(user_id, None)
+        self._cache.invalidate(user_id)
+    
+    # Cache - Escribir Progreso Actualizado en Cache
+    def _refresh_cache(self, conn, user_id: int):
+        """Re-read the row on the write connection and cache it (a lagging read replica would re-cache the old row)"""
+        # LISTEN/NOTIFY invalida también las escrituras propias: los fallos siguientes leen de la principal
+        self._recent_writes.set(user_id, True)
+        try:
+            row = db_manager.execute_statement(conn, "progress.by_user", (user_id,)).fetchone()
+        except Exception as e:
+            logger.warning(f"Error refreshing cached progress for user {user_id}: {e}")
+            row = None
+        if row:
+            self.prime_user_progress(user_id, row)
+        else:
+            self._invalidate_cache(user_id)
+    
+    # Cache - Estadisticas de Cache
+    def cache_stats(self) -> Dict[str, Any]:
+        stats = self._cache.stats()
+        if self._watcher is not None:
+            stats.update(self._watcher.stats())
+        return stats
     
     # Consulta - Obtener Progreso de Usuario
-    def get_user_progress(self, user_id: int) -> Dict[str, Any]:
-        """Obtener información completa del progreso del usuario"""
+    def get_user_progress(self, user_id: int) -> Mapping[str, Any]:
+        """Obtener información completa del progreso del usuario (instantánea de solo lectura)"""
         try:
-            if user_id in self._cache:
-                return copy.deepcopy(self._cache[user_id])
+            if self._watcher is not None:
+                self._watcher.maybe_poll()
+            cached = self._cache.get(user_id)
+            if cached is not None:
+                return cached
             
-            with db_manager.get_connection() as conn:
-                cursor = conn.execute("""
-                    SELECT * FROM user_progress WHERE user_id = ?
-                """, (user_id,))
+            # Base de Datos - Réplica salvo justo después de una escritura propia (leería la fila anterior)
+            readonly = self._recent_writes.get(user_id) is None
+            with db_manager.get_connection(readonly=readonly) as conn:
+                cursor = db_manager.execute_statement(conn, "progress.by_user", (user_id,))
                 progress = cursor.fetchone()
-                
-                if not progress:
-                    # Base de Datos - Crear registro de progreso si no existe
-                    self.create_user_progress(user_id)
-                    return self.get_user_progress(user_id)
-                
-                # Conversion - Convertir a diccionario
-                progress_dict = dict(progress)
-                
-                # Calculo - Agregar campos calculados
-                progress_dict['total_progress'] = self.calculate_total_progress(progress_dict)
-                progress_dict['completed_count'] = self.count_completed_levels(progress_dict)
-                progress_dict['current_level'] = self.get_current_level(progress_dict)
-                
-                self._cache[user_id] = copy.deepcopy(progress_dict)
-                return copy.deepcopy(progress_dict)
+            
+            if not progress and readonly and db_manager.has_read_replica:
+                # Base de Datos - Confirmar en la conexión de escritura (la réplica puede ir atrasada)
+                with db_manager.get_connection() as conn:
+                    progress = db_manager.execute_statement(conn, "progress.by_user", (user_id,)).fetchone()
+            
+            if not progress:
+                # Base de Datos - Crear registro de progreso si no existe
+                self.create_user_progress(user_id)
+                return self.get_user_progress(user_id)
+            
+            return self.prime_user_progress(user_id, progress)
                 
         except Exception as e:
             logger.error(f"Error getting user progress: {e}")
-            default_progress = self.get_default_progress()
-            self._cache[user_id] = copy.deepcopy(default_progress)
+            default_progress = freeze(self.get_default_progress())
+            self._cache.set(user_id, default_progress)
             return default_progress
     
+    # Cache - Sembrar Progreso de Usuario
+    def prime_user_progress(self, user_id: int, row: Mapping[str, Any]) -> Mapping[str, Any]:
+        """Cache a user_progress row fetched elsewhere (e.g. the login context) and return its snapshot"""
+        # Conversion - Convertir a diccionario
+        progress_dict = dict(row)
+        
+        # Calculo - Agregar campos calculados
+        progress_dict['total_progress'] = self.calculate_total_progress(progress_dict)
+        progress_dict['completed_count'] = self.count_completed_levels(progress_dict)
+        progress_dict['current_level'] = self.get_current_level(progress_dict)
+        
+        snapshot = freeze(progress_dict)
+        self._cache.set(user_id, snapshot)
+        return snapshot
+    
     # Creacion - Crear Registro de Progreso
     def create_user_progress(self, user_id: int) -> bool:
         """Crear registro de progreso inicial para nuevo usuario"""
@@ -72,7 +124,7 @@ class ProgressTracker:
                     VALUES (?, ?)
                 """, (user_id, datetime.now().isoformat()))
                 conn.commit()
-            self._invalidate_cache(user_id)
+                self._refresh_cache(conn, user_id)
             return True
         except Exception as e:
             logger.error(f"Error creating user progress: {e}")
@@ -112,8 +164,8 @@ class ProgressTracker:
             with db_manager.get_connection() as conn:
                 conn.execute(query, values)
                 conn.commit()
+                self._refresh_cache(conn, user_id)
             
-            self._invalidate_cache(user_id)
             return True
             
         except Exception as e:
@@ -206,16 +258,23 @@ class ProgressTracker:
     
     # Actualizacion - Actualizar Tiempo de Estudio
     def update_time_spent(self, user_id: int, minutes: int) -> bool:
-        """Actualizar tiempo total de aprendizaje"""
+        """Actualizar tiempo total de aprendizaje (escritura diferida, incrementos sumados por usuario)"""
         try:
-            # Consulta - Obtener tiempo actual gastado
-            current_progress = self.get_user_progress(user_id)
-            current_time = current_progress.get('total_time_spent', 0)
+            # Consulta - Asegurar que el registro de progreso existe (normalmente desde caché)
+            self.get_user_progress(user_id)
             
-            # Calculo - Agregar nuevo tiempo
-            new_time = current_time + minutes
+            # Cola - Encolar incremento; los pendientes del mismo usuario se suman
+            write_behind_queue.submit(("time_spent", user_id), """
+                UPDATE user_progress 
+                SET total_time_spent = total_time_spent + ?, last_updated = ?
+                WHERE user_id = ?
+            """, (minutes, datetime.now().isoformat(), user_id), merge=merge_increment)
             
-            return self.update_user_progress(user_id, total_time_spent=new_time)
+            self._recent_writes.set(user_id, True)
+            # Cache - Reflejar el incremento sin esperar al vaciado de la cola
+            self._cache.update(user_id, lambda cached: freeze(
+                {**cached, 'total_time_spent': (cached.get('total_time_spent') or 0) + minutes}))
+            return True
             
         except Exception as e:
             logger.error(f"Error updating time spent: {e}")
@@ -0,0 +1,285 @@
+# Nombre del Archivo: query_stats.py
+# Descripción: Instrumentación de consultas - Latencia, filas y puntos de llamada por sentencia normalizada, histogramas agregados y registro de consultas lentas
+# Autor: Fernando Bavera Villalba
+# Fecha: 25/10/2025
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuracion - Valores por Defecto
+SLOW_QUERY_MS = 200.0  # Umbral del registro de consultas lentas
+SLOW_QUERY_LOG_SIZE = 200  # Entradas retenidas en memoria
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+MAX_CALL_SITES = 10  # Puntos de llamada distintos guardados por sentencia
+
+# Archivos cuyo marco se salta al buscar el punto de llamada
+_INTERNAL_FILES = (
+    os.path.join("core", "database.py"),
+    os.path.join("core", "query_stats.py"),
+    "contextlib.py",
+)
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_VALUES_ROWS = re.compile(r"(\((?:\s*\?\s*,)*\s*\?\s*\))(?:\s*,\s*\((?:\s*\?\s*,)*\s*\?\s*\))+")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,)+\s*\?\s*\)", re.IGNORECASE)
+
+
+# Normalizacion - Normalizar Sentencia SQL
+@lru_cache(maxsize=1024)
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and replace literals so equivalent statements aggregate together"""
+    normalized = _WHITESPACE.sub(" ", sql).strip()
+    normalized = _STRING_LITERAL.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = normalized.replace("%s", "?")
+    # IN (?, ?, ?) e INSERT multi-fila de longitud variable se agrupan en una sola entrada
+    normalized = _VALUES_ROWS.sub(r"\1, ...", normalized)
+    return _IN_LIST.sub("IN (?, ...)", normalized)
+
+
+# Diagnostico - Obtener Punto de Llamada
+def _call_site() -> str:
+    """file:line of the first frame outside the database layer"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.endswith(_INTERNAL_FILES):
+            return f"{os.path.basename(filename)}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+    return "unknown"
+
+
+# Clase - Estadisticas de una Sentencia
+class _StatementStats:
+    __slots__ = ("calls", "total_ms", "min_ms", "max_ms", "rows", "errors", "buckets", "call_sites")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.min_ms = float("inf")
+        self.max_ms = 0.0
+        self.rows = 0
+        self.errors = 0
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.call_sites: Counter = Counter()
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound (ms) of the histogram bucket holding the given fraction of calls"""
+        target = fraction * self.calls
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target and count:
+                return float(HISTOGRAM_BUCKETS_MS[index]) if index < len(HISTOGRAM_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+
+# Clase - Registro de Estadisticas de Consultas
+class QueryStats:
+    """Agrega latencia, filas y puntos de llamada por sentencia normalizada"""
+
+    def __init__(self, enabled: bool = True, slow_query_ms: float = SLOW_QUERY_MS,
+                 slow_log_size: int = SLOW_QUERY_LOG_SIZE):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.started_at = datetime.now()
+        self._stats: Dict[str, _StatementStats] = {}
+        self._slow_log: Deque[Dict[str, Any]] = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+
+    # Registro - Registrar Ejecucion
+    def record(self, sql: str, elapsed_ms: float, rows: int = 0, error: bool = False) -> str:
+        """Record one execution; returns the normalized key (used to add fetched rows later)"""
+        key = normalize_sql(sql)
+        call_site = _call_site()
+        bucket = len(HISTOGRAM_BUCKETS_MS)
+        for index, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                bucket = index
+                break
+
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _StatementStats()
+            stats.calls += 1
+            stats.total_ms += elapsed_ms
+            stats.min_ms = min(stats.min_ms, elapsed_ms)
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.rows += max(rows, 0)
+            stats.errors += int(error)
+            stats.buckets[bucket] += 1
+            if call_site in stats.call_sites or len(stats.call_sites) < MAX_CALL_SITES:
+                stats.call_sites[call_site] += 1
+
+        if elapsed_ms >= self.slow_query_ms:
+            self._slow_log.append({
+                "at": datetime.now().isoformat(timespec="seconds"),
+                "ms": round(elapsed_ms, 2),
+                "rows": rows if rows >= 0 else None,  # SELECT en SQLite: se conoce al leer
+                "sql": key,
+                "call_site": call_site,
+            })
+            logger.warning(f"Slow query ({elapsed_ms:.0f} ms) at {call_site}: {key[:200]}")
+        return key
+
+    # Registro - Sumar Filas Leidas
+    def add_rows(self, key: str, rows: int):
+        """Add rows fetched after execute() returned (SELECT row counts are only known on fetch)"""
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is not None:
+                stats.rows += rows
+
+    # Consulta - Resumen por Sentencia
+    def summary(self, order_by: str = "total_ms", limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Aggregated stats per normalized statement, heaviest first"""
+        with self._lock:
+            items = [(key, stats) for key, stats in self._stats.items()]
+            rows = [{
+                "sql": key,
+                "calls": stats.calls,
+                "total_ms": round(stats.total_ms, 2),
+                "mean_ms": round(stats.total_ms / stats.calls, 3) if stats.calls else 0.0,
+                "min_ms": round(stats.min_ms, 3) if stats.calls else 0.0,
+                "max_ms": round(stats.max_ms, 3),
+                "p50_ms": stats.percentile(0.50),
+                "p95_ms": stats.percentile(0.95),
+                "p99_ms": stats.percentile(0.99),
+                "rows": stats.rows,
+                "errors": stats.errors,
+                "histogram": dict(zip([f"<={b}ms" for b in HISTOGRAM_BUCKETS_MS] + ["slower"], stats.buckets)),
+                "call_sites": dict(stats.call_sites.most_common()),
+            } for key, stats in items]
+        rows.sort(key=lambda row: row.get(order_by, 0), reverse=True)
+        return rows[:limit] if limit else rows
+
+    # Consulta - Consultas Lentas
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        """Most recent slow queries, newest first"""
+        return list(reversed(self._slow_log))
+
+    # Exportacion - Volcar a JSON
+    def to_json(self, path: Optional[str] = None) -> str:
+        """Serialize summary and slow log; also writes them to ``path`` when given"""
+        payload = json.dumps({
+            "collected_since": self.started_at.isoformat(timespec="seconds"),
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "slow_query_ms": self.slow_query_ms,
+            "statements": self.summary(),
+            "slow_queries": self.slow_queries(),
+        }, indent=2, ensure_ascii=False)
+        if path:
+            with open(path, "w", encoding="utf-8") as handle:
+                handle.write(payload)
+        return payload
+
+    # Mantenimiento - Reiniciar Estadisticas
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow_log.clear()
+            self.started_at = datetime.now()
+
+
+# Wrapper - Cursor SQLite Instrumentado
+class InstrumentedSQLiteCursor:
+    """sqlite3.Cursor proxy that times execute/executemany and counts fetched rows"""
+
+    def __init__(self, cursor: sqlite3.Cursor, stats: QueryStats):
+        self._cursor = cursor
+        self._stats = stats
+        self._key: Optional[str] = None
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            self._cursor.execute(sql, parameters)
+        except Exception:
+            self._stats.record(sql, (time.perf_counter() - start) * 1000, error=True)
+            raise
+        self._key = self._stats.record(sql, (time.perf_counter() - start) * 1000, self._cursor.rowcount)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            self._cursor.executemany(sql, seq_of_parameters)
+        except Exception:
+            self._stats.record(sql, (time.perf_counter() - start) * 1000, error=True)
+            raise
+        self._key = self._stats.record(sql, (time.perf_counter() - start) * 1000, self._cursor.rowcount)
+        return self
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None and self._key:
+            self._stats.add_rows(self._key, 1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        if self._key:
+            self._stats.add_rows(self._key, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        if self._key:
+            self._stats.add_rows(self._key, len(rows))
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            if self._key:
+                self._stats.add_rows(self._key, 1)
+            yield row
+
+    def __getattr__(self, item):
+        return getattr(self._cursor, item)
+
+
+# Wrapper - Conexion SQLite Instrumentada
+class InstrumentedSQLiteConnection:
+    """sqlite3.Connection proxy whose execute/executemany/cursor go through InstrumentedSQLiteCursor"""
+
+    def __init__(self, connection: sqlite3.Connection, stats: QueryStats):
+        self._connection = connection
+        self._stats = stats
+
+    def cursor(self):
+        return InstrumentedSQLiteCursor(self._connection.cursor(), self._stats)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def __enter__(self):
+        self._connection.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self._connection.__exit__(exc_type, exc_val, exc_tb)
+
+    def __getattr__(self, item):
+        return getattr(self._connection, item)
+
+
+# Instancia global de estadísticas de consultas (configurada por core.database)
+query_stats = QueryStats()
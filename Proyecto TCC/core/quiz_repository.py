@@ -0,0 +1,277 @@
+# Nombre del Archivo: quiz_repository.py
+# Descripción: Persistencia de intentos de quiz - Intento y respuestas en una sola transacción, inserción por lotes y cola asíncrona para absorber picos de envíos
+# Autor: Fernando Bavera Villalba
+# Fecha: 25/10/2025
+
+import atexit
+import logging
+import queue
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from core.analytics import record_quiz_attempts
+from core.database import db_manager, get_database_setting
+
+logger = logging.getLogger(__name__)
+
+# Configuracion - Valores por Defecto
+QUIZ_ASYNC_WRITES = True  # Encolar los intentos y guardarlos en segundo plano
+QUIZ_WRITE_INTERVAL = 0.5  # Segundos que el trabajador espera nuevos intentos
+QUIZ_WRITE_MAX_BATCH = 100  # Intentos por transacción
+QUIZ_WRITE_QUEUE_SIZE = 1000  # Con la cola llena, el intento se guarda en el hilo que lo envía
+QUIZ_WRITE_MAX_ATTEMPTS = 5  # Escrituras en segundo plano de un intento antes de darlo por no guardado
+ANSWER_ROWS_PER_INSERT = 100  # Filas por INSERT multi-fila (600 parámetros, por debajo del límite de SQLite)
+
+_ANSWER_COLUMNS = "(quiz_attempt_id, question_text, selected_answer, correct_answer, is_correct, explanation)"
+
+
+# Clase - Intento de Quiz
+@dataclass
+class QuizAttempt:
+    """Intento de quiz con sus respuestas, listo para guardarse"""
+    username: str
+    level: str
+    score: int
+    total_questions: int
+    percentage: float
+    passed: bool
+    answers: List[Dict[str, Any]] = field(default_factory=list)
+    user_id: Optional[int] = None  # Se resuelve por username al guardar si no viene de la sesión
+    # Formato de CURRENT_TIMESTAMP: el momento del envío, no el de la escritura diferida
+    completed_at: str = field(default_factory=lambda: datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"))
+    write_attempts: int = 0  # Escrituras fallidas hasta ahora
+
+
+# Base de Datos - Resolver IDs de Usuario
+def _resolve_user_ids(conn, attempts: List[QuizAttempt]):
+    """Fill missing user ids with a single lookup for the whole batch"""
+    usernames = sorted({attempt.username for attempt in attempts if not attempt.user_id})
+    if not usernames:
+        return
+    placeholders = ", ".join("?" * len(usernames))
+    rows = conn.execute(f"SELECT id, username FROM users WHERE username IN ({placeholders})", usernames).fetchall()
+    ids = {row['username']: row['id'] for row in rows}
+    for attempt in attempts:
+        if not attempt.user_id:
+            attempt.user_id = ids.get(attempt.username)
+
+
+# Base de Datos - Guardar Intentos
+def insert_quiz_attempts(attempts: List[QuizAttempt], conn=None) -> int:
+    """Insert attempts and all their answers in one transaction; returns the attempts written"""
+    saved = []
+    with db_manager.transaction(conn) as conn:
+        _resolve_user_ids(conn, attempts)
+
+        answer_rows = []
+        for attempt in attempts:
+            if not attempt.user_id:
+                logger.error(f"User not found for username: {attempt.username}")
+                continue
+            attempt_id = db_manager.execute_insert(conn, """
+                INSERT INTO quiz_attempts (user_id, level, score, total_questions, percentage, passed, completed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (attempt.user_id, attempt.level, attempt.score, attempt.total_questions,
+                  attempt.percentage, bool(attempt.passed), attempt.completed_at))
+            answer_rows.extend(
+                (attempt_id, answer['question'], answer['selected'], answer['correct'],
+                 bool(answer['is_correct']), answer.get('explanation', ''))
+                for answer in attempt.answers
+            )
+            saved.append(attempt)
+
+        # Respuestas de todo el lote: INSERT multi-fila (mismo SQL en SQLite y PostgreSQL)
+        for start in range(0, len(answer_rows), ANSWER_ROWS_PER_INSERT):
+            chunk = answer_rows[start:start + ANSWER_ROWS_PER_INSERT]
+            values = ", ".join(["(?, ?, ?, ?, ?, ?)"] * len(chunk))
+            conn.execute(f"INSERT INTO quiz_answers {_ANSWER_COLUMNS} VALUES {values}",
+                         tuple(value for row in chunk for value in row))
+
+        # Analiticas - Agregados por nivel, día y pregunta en la misma transacción
+        record_quiz_attempts(conn, saved)
+    return len(saved)
+
+
+# Clase - Escritor Asincrono de Intentos
+class QuizAttemptWriter:
+    """
+    Cola acotada de intentos de quiz guardados por un hilo en segundo plano.
+
+    Los envíos simultáneos (fin de una clase) se acumulan mientras se confirma la
+    transacción anterior y se guardan juntos, hasta ``max_batch`` por transacción.
+    Nada se descarta: si un lote falla se reintenta intento por intento, y con
+    la cola llena el intento se guarda directamente en el hilo que lo envía. Un
+    intento encolado que falla vuelve a intentarse en la siguiente vuelta del
+    trabajador, hasta ``max_attempts`` veces; después queda en ``unsaved`` para
+    avisar al estudiante (ver take_unsaved).
+    """
+
+    def __init__(self, interval: float = QUIZ_WRITE_INTERVAL, max_batch: int = QUIZ_WRITE_MAX_BATCH,
+                 max_queue: int = QUIZ_WRITE_QUEUE_SIZE, enabled: bool = QUIZ_ASYNC_WRITES,
+                 max_attempts: int = QUIZ_WRITE_MAX_ATTEMPTS):
+        self.interval = interval
+        self.max_batch = max_batch
+        self.enabled = enabled
+        self.max_attempts = max_attempts
+        self._queue: "queue.Queue[QuizAttempt]" = queue.Queue(maxsize=max_queue)
+        self._retries: List[QuizAttempt] = []  # Intentos encolados que fallaron y esperan la próxima vuelta
+        self.unsaved: List[QuizAttempt] = []  # Intentos que agotaron los reintentos, pendientes de avisar
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._worker: Optional[threading.Thread] = None
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+
+    # Cola - Enviar Intento
+    def submit(self, attempt: QuizAttempt) -> bool:
+        """Queue an attempt (or write it now when async writes are off or the queue is full)"""
+        if not self.enabled or self._stopped:
+            return self.write([attempt]) == 1
+        try:
+            self._queue.put_nowait(attempt)
+        except queue.Full:
+            return self.write([attempt]) == 1
+        self._ensure_worker()
+        return True
+
+    # Cola - Vaciar Cola
+    def flush(self) -> int:
+        """Write everything queued so far (and pending retries), including batches the worker is writing; returns attempts drained here"""
+        drained = 0
+        while True:
+            batch = self._drain(self.max_batch)
+            if batch:
+                self.write(batch, requeue=True)
+                for _ in batch:
+                    self._queue.task_done()
+                drained += len(batch)
+                continue
+            self._queue.join()
+            # Reintentos: cada vuelta consume un intento de los que siguen fallando, así que termina
+            retries = self._take_retries()
+            if not retries:
+                return drained
+            self.write(retries, requeue=True)
+
+    # Cola - Detener y Vaciar
+    def shutdown(self):
+        """Stop the worker and write everything still queued"""
+        self._stopped = True
+        worker = self._worker
+        if worker is not None and worker.is_alive() and worker is not threading.current_thread():
+            worker.join(timeout=self.interval + 5)
+        self.flush()
+
+    # Consulta - Estadisticas
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "retrying": len(self._retries),
+            "failures": self.failures,
+            "unsaved": len(self.unsaved),
+        }
+
+    # Consulta - Intentos No Guardados de un Usuario
+    def take_unsaved(self, username: str, level: Optional[str] = None) -> List[QuizAttempt]:
+        """Remove and return the user's attempts (of ``level``, if given) that could not be saved after max_attempts"""
+        def matches(attempt):
+            return attempt.username == username and (level is None or attempt.level == level)
+        with self._lock:
+            taken = [attempt for attempt in self.unsaved if matches(attempt)]
+            if taken:
+                self.unsaved = [attempt for attempt in self.unsaved if not matches(attempt)]
+        return taken
+
+    def _take_retries(self) -> List[QuizAttempt]:
+        with self._lock:
+            retries, self._retries = self._retries, []
+        return retries
+
+    def _drain(self, limit: int, first: Optional[QuizAttempt] = None) -> List[QuizAttempt]:
+        """Take up to ``limit`` queued attempts without waiting"""
+        batch = [first] if first is not None else []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    # Hilo - Iniciar Trabajador
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name="quiz-writer", daemon=True)
+            self._worker.start()
+
+    # Hilo - Bucle del Trabajador
+    def _run(self):
+        while not self._stopped:
+            try:
+                first = self._queue.get(timeout=self.interval)
+            except queue.Empty:
+                # Cola en calma: reintentar los intentos que fallaron en la vuelta anterior
+                retries = self._take_retries()
+                if retries:
+                    self.write(retries, requeue=True)
+                continue
+            batch = self._drain(self.max_batch, first)
+            try:
+                self.write(batch, requeue=True)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    # Base de Datos - Guardar Lote
+    def write(self, batch: List[QuizAttempt], requeue: bool = False) -> int:
+        """
+        Write a batch in one transaction; on failure fall back to one transaction per attempt.
+
+        With ``requeue`` (background writes, nobody waits for the result) a failed
+        attempt is retried on a later pass instead of returning 0 to the caller.
+        """
+        try:
+            written = insert_quiz_attempts(batch)
+            self.written += written
+            self.batches += 1
+            return written
+        except Exception as e:
+            if len(batch) > 1:
+                logger.warning(f"Quiz batch of {len(batch)} attempts failed ({e}); retrying one by one")
+                return sum(self.write([attempt], requeue) for attempt in batch)
+            attempt = batch[0]
+            attempt.write_attempts += 1
+            description = (f"({attempt.username}, {attempt.level}, "
+                           f"{attempt.score}/{attempt.total_questions})")
+            if requeue and attempt.write_attempts < self.max_attempts:
+                logger.warning(f"Quiz attempt {description} failed ({e}); "
+                               f"retry {attempt.write_attempts}/{self.max_attempts - 1} queued")
+                with self._lock:
+                    self._retries.append(attempt)
+                return 0
+            self.failures += 1
+            logger.error(f"Error saving quiz attempt {description}: {e}")
+            if requeue:
+                # Nadie esperaba el resultado: se conserva para avisar al estudiante
+                with self._lock:
+                    self.unsaved.append(attempt)
+            return 0
+
+
+# Instancia global del escritor de intentos de quiz
+quiz_attempt_writer = QuizAttemptWriter(
+    interval=float(get_database_setting("quiz_write_interval", QUIZ_WRITE_INTERVAL)),
+    max_batch=int(get_database_setting("quiz_write_max_batch", QUIZ_WRITE_MAX_BATCH)),
+    max_queue=int(get_database_setting("quiz_write_queue_size", QUIZ_WRITE_QUEUE_SIZE)),
+    enabled=bool(get_database_setting("quiz_async_writes", QUIZ_ASYNC_WRITES)),
+    max_attempts=int(get_database_setting("quiz_write_max_attempts", QUIZ_WRITE_MAX_ATTEMPTS)),
+)
+atexit.register(quiz_attempt_writer.shutdown)
@@ -7,7 +7,7 @@ import streamlit as st
 import random
 from datetime import datetime
 from core.auth_config import update_user_progress, check_achievement
-from core.database import db_manager
+from core.quiz_repository import QuizAttempt, quiz_attempt_writer
 
 from utils.ui.icon_system import get_icon, replace_emojis
 
@@ -462,6 +462,11 @@ def create_quiz(level, username):
     skipped_key = f'{prefix}_skipped'
     selected_questions_key = f'{prefix}_selected_questions'
 
+    # Base de Datos - Avisar Intentos Guardados en Segundo Plano que Fallaron
+    for attempt in quiz_attempt_writer.take_unsaved(username, level):
+        st.warning(f"⚠️ No se pudo guardar tu intento del {attempt.completed_at} UTC "
+                   f"({attempt.score}/{attempt.total_questions}). Por favor, realiza el quiz nuevamente.")
+
     if st.session_state.get(skipped_key):
         st.info("Has pospuesto este quiz. Puedes retomarlo cuando quieras. Recuerda que necesitas aprobarlo para completar el nivel.")
 
@@ -707,7 +712,10 @@ def show_quiz_results(level, username, questions, expander_key):
 
     # Base de Datos - Guardar Intento de Quiz Solo una Vez
     if not st.session_state.get(f'{prefix}_saved', False):
-        save_quiz_attempt(level, username, score, total_questions, percentage, passed, answers)
+        if not save_quiz_attempt(level, username, score, total_questions, percentage, passed, answers):
+            # No se marca como guardado: el próximo rerun vuelve a intentarlo
+            st.error("No se pudo guardar tu intento. Se volverá a intentar al actualizar la página.")
+            return
         st.session_state[f'{prefix}_saved'] = True
         
         if passed:
@@ -720,68 +728,39 @@ def show_quiz_results(level, username, questions, expander_key):
                 if new_achievements:
                     st.markdown(replace_emojis("🏆 ¡Logro desbloqueado: Primer Nivel Completado!"), unsafe_allow_html=True)
 
-# Base de Datos - Guardar Intento de Quiz
-def save_quiz_attempt(level, username, score, total_questions, percentage, passed, answers_list):
-    """Guarda el intento del quiz y las respuestas en la base de datos"""
+# Sesion - Obtener ID del Usuario en Sesion
+def _session_user_id(username):
+    """Id of the logged-in user when it matches username (avoids a lookup by username)"""
     try:
-        # Base de Datos - Obtener user_id desde username - consultar base de datos directamente
-        with db_manager.get_connection() as conn:
-            if db_manager.db_type == "sqlite":
-                cursor = conn.execute("SELECT id FROM users WHERE username = ?", (username,))
-            else:
-                cursor = conn.cursor()
-                cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
-            
-            user_result = cursor.fetchone()
-            
-            if not user_result:
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.error(f"User not found for username: {username}")
-                return False
-            
-            user_id = user_result[0] if isinstance(user_result, tuple) else user_result['id']
-        
-        # Base de Datos - Insertar intento de quiz con el user_id
-        with db_manager.get_connection() as conn:
-            # Base de Datos - Insertar intento de quiz
-            if db_manager.db_type == "sqlite":
-                cursor = conn.execute("""
-                    INSERT INTO quiz_attempts (user_id, level, score, total_questions, percentage, passed, completed_at)
-                    VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-                """, (user_id, level, score, total_questions, percentage, passed))
-                quiz_attempt_id = cursor.lastrowid
-            else:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO quiz_attempts (user_id, level, score, total_questions, percentage, passed, completed_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
-                    RETURNING id
-                """, (user_id, level, score, total_questions, percentage, passed))
-                quiz_attempt_id = cursor.fetchone()[0]
-            
-            # Base de Datos - Insertar cada respuesta
-            for answer in answers_list:
-                if db_manager.db_type == "sqlite":
-                    conn.execute("""
-                        INSERT INTO quiz_answers (quiz_attempt_id, question_text, selected_answer, correct_answer, is_correct, explanation)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """, (quiz_attempt_id, answer['question'], answer['selected'], answer['correct'], answer['is_correct'], answer.get('explanation', '')))
-                else:
-                    cursor.execute("""
-                        INSERT INTO quiz_answers (quiz_attempt_id, question_text, selected_answer, correct_answer, is_correct, explanation)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                    """, (quiz_attempt_id, answer['question'], answer['selected'], answer['correct'], answer['is_correct'], answer.get('explanation', '')))
-            
-            conn.commit()
-            return True
-            
-    except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Error saving quiz attempt: {e}")
-        # Manejo de Errores - No mostrar error al usuario, solo registrarlo
-        return False
+        user = st.session_state.get('user')
+    except Exception:
+        return None
+    if isinstance(user, dict) and user.get('username') == username:
+        return user.get('id')
+    return None
+
+# Base de Datos - Guardar Intento de Quiz
+def save_quiz_attempt(level, username, score, total_questions, percentage, passed, answers_list,
+                      user_id=None, wait=False):
+    """Guarda el intento del quiz y sus respuestas en una sola transacción.
+
+    El intento se encola y se guarda en segundo plano (agrupado con otros envíos
+    simultáneos) salvo que ``wait`` sea True o la escritura asíncrona esté
+    desactivada. El user_id se toma de la sesión; solo si falta se busca por username.
+    """
+    attempt = QuizAttempt(
+        username=username,
+        level=level,
+        score=score,
+        total_questions=total_questions,
+        percentage=percentage,
+        passed=passed,
+        answers=list(answers_list),
+        user_id=user_id or _session_user_id(username),
+    )
+    if wait:
+        return quiz_attempt_writer.write([attempt]) == 1
+    return quiz_attempt_writer.submit(attempt)
 
 # UI - Mostrar Logros de Usuario
 def show_achievements(username):
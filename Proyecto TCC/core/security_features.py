@@ -7,17 +7,36 @@ import streamlit as st
 import logging
 import re
 import html
+import threading
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Tuple
-from core.database import db_manager, ensure_database_initialized
+from typing import Deque, Dict, Optional, Tuple
+from core.database import db_manager, parse_timestamp
+from core.write_behind import write_behind_queue
 
 logger = logging.getLogger(__name__)
 
-# Inicializacion - Asegurar Inicializacion de Base de Datos al Importar Modulo
-try:
-    ensure_database_initialized()
-except Exception as e:
-    logger.warning(f"Could not ensure database initialization in security_features: {e}")
+# Configuracion - Rate Limiting en Memoria
+RATE_LIMIT_MAX_ENTRIES = 10000  # Identificadores retenidos en memoria como máximo
+
+_RATE_LIMIT_UPSERT = """
+    INSERT INTO rate_limiting (identifier, attempts, last_attempt, locked_until)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (identifier) DO UPDATE SET
+        attempts = excluded.attempts,
+        last_attempt = excluded.last_attempt,
+        locked_until = excluded.locked_until
+"""
+
+
+# Clase - Estado de Rate Limit de un Identificador
+class _RateLimitState:
+    """Intentos fallidos dentro de la ventana deslizante y bloqueo vigente"""
+    __slots__ = ("attempts", "locked_until")
+    
+    def __init__(self):
+        self.attempts: Deque[datetime] = deque()
+        self.locked_until: Optional[datetime] = None
 
 # Clase - Características de Seguridad
 class SecurityFeatures:
@@ -27,94 +46,138 @@ class SecurityFeatures:
         self.max_attempts = 5
         self.lockout_duration = 15  # Configuracion - minutos
         self.rate_limit_window = 15  # Configuracion - minutos
+        # Rate Limiting - Contadores en memoria (se cargan de la base de datos la primera vez)
+        self._rate_states: Dict[str, _RateLimitState] = {}
+        self._rate_lock = threading.Lock()
     
     # Validacion - Verificar Rate Limit
-    def check_rate_limit(self, identifier: str) -> Tuple[bool, str]:
-        """Rate limiting basado en base de datos"""
+    def check_rate_limit(self, identifier: str, conn=None) -> Tuple[bool, str]:
+        """
+        Rate limiting con ventana deslizante en memoria.
+        
+        La comprobación es O(1) sobre contadores en memoria; la base de datos solo se lee
+        la primera vez que se ve un identificador (para respetar bloqueos tras reiniciar).
+        El bloqueo se persiste en el momento; los demás cambios, en segundo plano.
+        """
         try:
             current_time = datetime.now()
-            
-            with db_manager.get_connection() as conn:
-                # Limpieza - Limpiar Registros Antiguos de Rate Limiting
-                conn.execute("""
-                    DELETE FROM rate_limiting 
-                    WHERE last_attempt < ?
-                """, ((current_time - timedelta(minutes=self.rate_limit_window)).isoformat(),))
-                
-                # Validacion - Verificar Rate Limit Actual
-                cursor = conn.execute("""
-                    SELECT attempts, last_attempt, locked_until 
-                    FROM rate_limiting 
-                    WHERE identifier = ?
-                """, (identifier,))
-                
-                result = cursor.fetchone()
+            state = self._get_rate_state(identifier, current_time, conn)
+            lockout_params = None
+            with self._rate_lock:
+                self._trim_window(state, current_time)
                 
-                if result:
-                    attempts, last_attempt, locked_until = result
-                    
-                    # Validacion - Verificar si Aun Esta Bloqueado
-                    if locked_until and datetime.fromisoformat(locked_until) > current_time:
-                        remaining_time = int((datetime.fromisoformat(locked_until) - current_time).total_seconds())
-                        return False, f"Too many attempts. Try again in {remaining_time} seconds"
-                    
-                    # Validacion - Verificar si Maximo de Intentos Excedido
-                    if attempts >= self.max_attempts:
-                        # Seguridad - Bloquear por Duracion Especificada
-                        lock_until = (current_time + timedelta(minutes=self.lockout_duration)).isoformat()
-                        conn.execute("""
-                            UPDATE rate_limiting 
-                            SET locked_until = ? 
-                            WHERE identifier = ?
-                        """, (lock_until, identifier))
-                        conn.commit()
-                        return False, f"Too many attempts. Try again in {self.lockout_duration} minutes"
+                # Validacion - Verificar si Aun Esta Bloqueado
+                if state.locked_until and state.locked_until > current_time:
+                    remaining_time = int((state.locked_until - current_time).total_seconds())
+                    return False, f"Too many attempts. Try again in {remaining_time} seconds"
                 
-                conn.commit()
-                return True, "Rate limit check passed"
+                # Validacion - Verificar si Maximo de Intentos Excedido
+                if len(state.attempts) >= self.max_attempts:
+                    # Seguridad - Bloquear por Duracion Especificada
+                    state.locked_until = current_time + timedelta(minutes=self.lockout_duration)
+                    lockout_params = self._rate_state_params(identifier, state)
+            
+            if lockout_params is not None:
+                self._persist_rate_state_now(identifier, lockout_params, conn)
+                return False, f"Too many attempts. Try again in {self.lockout_duration} minutes"
+            return True, "Rate limit check passed"
                 
         except Exception as e:
             logger.error(f"Rate limit check error: {e}")
             return True, "Rate limit check passed"  # Fail open for now
     
     # Registro - Registrar Intento
-    def record_attempt(self, identifier: str, success: bool):
-        """Registrar intento de login en la base de datos"""
+    def record_attempt(self, identifier: str, success: bool, conn=None):
+        """Registrar intento de login (en memoria; persistencia diferida en rate_limiting)"""
         try:
             current_time = datetime.now()
             
-            with db_manager.get_connection() as conn:
-                if success:
-                    # Seguridad - Reiniciar Intentos en Login Exitoso
-                    conn.execute("""
-                        DELETE FROM rate_limiting WHERE identifier = ?
-                    """, (identifier,))
-                else:
-                    # Consulta - Verificar si Registro Existe
-                    cursor = conn.execute("""
-                        SELECT attempts FROM rate_limiting WHERE identifier = ?
-                    """, (identifier,))
-                    
-                    result = cursor.fetchone()
-                    
-                    if result:
-                        attempts = result[0] + 1
-                        conn.execute("""
-                            UPDATE rate_limiting 
-                            SET attempts = ?, last_attempt = ?
-                            WHERE identifier = ?
-                        """, (attempts, current_time.isoformat(), identifier))
-                    else:
-                        conn.execute("""
-                            INSERT INTO rate_limiting (identifier, attempts, last_attempt)
-                            VALUES (?, 1, ?)
-                        """, (identifier, current_time.isoformat()))
-                
-                conn.commit()
+            if success:
+                # Seguridad - Reiniciar Intentos en Login Exitoso
+                with self._rate_lock:
+                    self._rate_states.pop(identifier, None)
+                write_behind_queue.submit(("rate_limit", identifier), """
+                    DELETE FROM rate_limiting WHERE identifier = ?
+                """, (identifier,))
+                return
+            
+            state = self._get_rate_state(identifier, current_time, conn)
+            with self._rate_lock:
+                self._trim_window(state, current_time)
+                state.attempts.append(current_time)
+                params = self._rate_state_params(identifier, state)
+                reached_limit = len(state.attempts) >= self.max_attempts
+            if reached_limit:
+                # El intento que alcanza el máximo debe sobrevivir a un reinicio (el siguiente intento bloquea)
+                self._persist_rate_state_now(identifier, params, conn)
+            else:
+                write_behind_queue.submit(("rate_limit", identifier), _RATE_LIMIT_UPSERT, params)
                 
         except Exception as e:
             logger.error(f"Record attempt error: {e}")
     
+    # Rate Limiting - Obtener Estado de Identificador
+    def _get_rate_state(self, identifier: str, current_time: datetime, conn=None) -> _RateLimitState:
+        """Return the in-memory state, loading it from rate_limiting on first sight"""
+        with self._rate_lock:
+            state = self._rate_states.get(identifier)
+        if state is not None:
+            return state
+        
+        state = _RateLimitState()
+        with db_manager.transaction(conn) as conn:
+            cursor = db_manager.execute_statement(conn, "rate_limit.by_identifier", (identifier,))
+            result = cursor.fetchone()
+        if result:
+            last_attempt = parse_timestamp(result['last_attempt'])
+            # Solo se guarda el último intento: los anteriores se aproximan con esa marca
+            if last_attempt and last_attempt >= current_time - timedelta(minutes=self.rate_limit_window):
+                state.attempts.extend([last_attempt] * (result['attempts'] or 0))
+            state.locked_until = parse_timestamp(result['locked_until'])
+        
+        with self._rate_lock:
+            if len(self._rate_states) >= RATE_LIMIT_MAX_ENTRIES:
+                self._prune_rate_states(current_time)
+            return self._rate_states.setdefault(identifier, state)
+    
+    # Rate Limiting - Recortar Ventana Deslizante
+    def _trim_window(self, state: _RateLimitState, current_time: datetime):
+        """Drop attempts that fell out of the window (caller holds _rate_lock)"""
+        window_start = current_time - timedelta(minutes=self.rate_limit_window)
+        while state.attempts and state.attempts[0] < window_start:
+            state.attempts.popleft()
+    
+    # Rate Limiting - Parametros del Estado
+    def _rate_state_params(self, identifier: str, state: _RateLimitState) -> Tuple:
+        """Upsert parameters for the identifier's row (caller holds _rate_lock)"""
+        last_attempt = state.attempts[-1] if state.attempts else datetime.now()
+        locked_until = state.locked_until.isoformat() if state.locked_until else None
+        return (identifier, len(state.attempts), last_attempt.isoformat(), locked_until)
+    
+    # Rate Limiting - Persistir Estado de Inmediato
+    def _persist_rate_state_now(self, identifier: str, params: Tuple, conn=None):
+        """Write the row now, in the caller's transaction when given (lockouts must survive a restart); falls back to the retrying queue"""
+        # La escritura pendiente es más antigua: no debe sobrescribir este estado al vaciarse la cola
+        write_behind_queue.discard(("rate_limit", identifier))
+        try:
+            with db_manager.transaction(conn) as conn:
+                conn.execute(_RATE_LIMIT_UPSERT, params)
+        except Exception as e:
+            logger.warning(f"Rate limit state for {identifier} could not be written now, queued for retry: {e}")
+            write_behind_queue.submit(("rate_limit", identifier), _RATE_LIMIT_UPSERT, params)
+    
+    # Rate Limiting - Podar Estados Inactivos
+    def _prune_rate_states(self, current_time: datetime):
+        """Forget identifiers with no attempts in the window and no active lock (caller holds _rate_lock)"""
+        for identifier in list(self._rate_states):
+            state = self._rate_states[identifier]
+            self._trim_window(state, current_time)
+            if not state.attempts and not (state.locked_until and state.locked_until > current_time):
+                del self._rate_states[identifier]
+        # Si todos siguen activos, descartar los más antiguos (orden de inserción)
+        while len(self._rate_states) >= RATE_LIMIT_MAX_ENTRIES:
+            self._rate_states.pop(next(iter(self._rate_states)))
+    
     # Seguridad - Sanitizar Entrada
     def sanitize_input(self, input_string: str) -> str:
         """Sanitizar entrada del usuario para prevenir ataques XSS e inyección"""
@@ -0,0 +1,199 @@
+# Nombre del Archivo: session_tokens.py
+# Descripción: Tokens de sesión firmados con HMAC - Verificación sin consultar user_sessions y conjunto compacto de revocaciones sincronizado desde la base de datos
+# Autor: Fernando Bavera Villalba
+# Fecha: 25/10/2025
+
+import base64
+import hashlib
+import hmac
+import logging
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from core.database import db_manager, parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Configuracion - Formato del Token
+TOKEN_PREFIX = "s1"  # s1.<user_id>.<emitido_ms>.<expira_s>.<id_token>.<firma>
+REVOCATION_SYNC_INTERVAL = 10.0  # Segundos entre sincronizaciones del conjunto de revocaciones
+REVOCATION_SYNC_OVERLAP = 60  # Segundos que se vuelven a leer en cada sincronización (commits desordenados, relojes)
+
+
+# Clase - Datos de un Token Firmado
+@dataclass(frozen=True)
+class SessionClaims:
+    """Datos contenidos en un token de sesión firmado"""
+    user_id: int
+    issued_at: datetime
+    expires_at: datetime
+    token_id: str
+
+
+# Funcion - Detectar Token Firmado
+def is_signed_token(token: Optional[str]) -> bool:
+    """Signed tokens carry a prefix; database-backed tokens are plain random strings"""
+    return bool(token) and token.startswith(TOKEN_PREFIX + ".")
+
+
+# Clase - Firmador de Tokens de Sesion
+class SessionTokenSigner:
+    """Emite y verifica tokens de sesión firmados con HMAC-SHA256"""
+
+    def __init__(self, secret: str):
+        self._key = secret.encode('utf-8')
+
+    def _sign(self, payload: str) -> str:
+        digest = hmac.new(self._key, payload.encode('utf-8'), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).decode('ascii').rstrip('=')
+
+    # Token - Emitir Token
+    def issue(self, user_id: int, lifetime_seconds: int) -> str:
+        """Create a token for user_id valid for lifetime_seconds"""
+        now = time.time()
+        payload = ".".join([
+            TOKEN_PREFIX,
+            str(int(user_id)),
+            str(int(now * 1000)),
+            str(int(now + lifetime_seconds)),
+            secrets.token_urlsafe(16),
+        ])
+        return f"{payload}.{self._sign(payload)}"
+
+    # Token - Leer Token
+    def decode(self, token: str) -> Optional[SessionClaims]:
+        """Return the claims of a correctly signed token (expired or not), else None"""
+        try:
+            payload, signature = token.rsplit(".", 1)
+            if not hmac.compare_digest(signature, self._sign(payload)):
+                return None
+            prefix, user_id, issued_ms, expires_s, token_id = payload.split(".")
+            if prefix != TOKEN_PREFIX:
+                return None
+            return SessionClaims(
+                user_id=int(user_id),
+                issued_at=datetime.fromtimestamp(int(issued_ms) / 1000),
+                expires_at=datetime.fromtimestamp(int(expires_s)),
+                token_id=token_id,
+            )
+        except (ValueError, AttributeError):
+            return None
+
+    # Token - Verificar Token
+    def verify(self, token: str) -> Optional[SessionClaims]:
+        """Return the claims of a correctly signed, unexpired token, else None"""
+        claims = self.decode(token)
+        if claims is None or claims.expires_at <= datetime.now():
+            return None
+        return claims
+
+
+# Clase - Conjunto de Revocaciones
+class RevocationSet:
+    """
+    Revocaciones de tokens firmados, en memoria y sincronizadas desde session_revocations.
+
+    Hay dos tipos de fila: token_id revoca un token concreto (logout); token_id NULL
+    revoca todos los tokens de user_id emitidos antes de revoked_at (cambio de
+    contraseña, desactivación). Las filas caducan con el token más largo posible,
+    así que el conjunto se mantiene pequeño.
+    """
+
+    def __init__(self, sync_interval: float = REVOCATION_SYNC_INTERVAL):
+        self.sync_interval = sync_interval
+        self._tokens: Dict[str, datetime] = {}  # token_id -> expira
+        self._user_cutoffs: Dict[int, datetime] = {}  # user_id -> revocar emitidos antes de
+        self._cutoff_expiry: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        self._last_sync: Optional[float] = None
+        self._synced_until: Optional[datetime] = None
+
+    # Consulta - Verificar Revocacion
+    def is_revoked(self, claims: SessionClaims) -> bool:
+        """Check a token against the set (syncs from the database at most every sync_interval)"""
+        self._maybe_sync()
+        with self._lock:
+            if claims.token_id in self._tokens:
+                return True
+            cutoff = self._user_cutoffs.get(claims.user_id)
+            return cutoff is not None and claims.issued_at <= cutoff
+
+    # Revocacion - Revocar Token
+    def revoke_token(self, claims: SessionClaims, conn=None):
+        """Revoke a single token (logout)"""
+        with db_manager.transaction(conn) as conn:
+            conn.execute("""
+                INSERT INTO session_revocations (token_id, user_id, revoked_at, expires_at)
+                VALUES (?, ?, ?, ?)
+            """, (claims.token_id, claims.user_id, datetime.now().isoformat(), claims.expires_at.isoformat()))
+        with self._lock:
+            self._tokens[claims.token_id] = claims.expires_at
+
+    # Revocacion - Revocar Tokens de Usuario
+    def revoke_user(self, user_id: int, lifetime_seconds: int, conn=None):
+        """Revoke every token of a user issued until now (password change, deactivation)"""
+        now = datetime.now()
+        expires_at = now + timedelta(seconds=lifetime_seconds)
+        with db_manager.transaction(conn) as conn:
+            conn.execute("""
+                INSERT INTO session_revocations (token_id, user_id, revoked_at, expires_at)
+                VALUES (NULL, ?, ?, ?)
+            """, (user_id, now.isoformat(), expires_at.isoformat()))
+        with self._lock:
+            self._add_cutoff(user_id, now, expires_at)
+
+    def _add_cutoff(self, user_id: int, revoked_at: datetime, expires_at: datetime):
+        """Record a per-user cutoff (caller holds _lock)"""
+        if revoked_at > self._user_cutoffs.get(user_id, datetime.min):
+            self._user_cutoffs[user_id] = revoked_at
+        if expires_at > self._cutoff_expiry.get(user_id, datetime.min):
+            self._cutoff_expiry[user_id] = expires_at
+
+    # Sincronizacion - Sincronizar si Corresponde
+    def _maybe_sync(self):
+        now = time.monotonic()
+        if self._last_sync is not None and now - self._last_sync < self.sync_interval:
+            return
+        self._last_sync = now
+        try:
+            self.sync()
+        except Exception as e:
+            # Mantener el conjunto actual; se reintenta en el siguiente intervalo
+            logger.warning(f"Could not sync session revocations: {e}")
+
+    # Sincronizacion - Sincronizar desde Base de Datos
+    def sync(self):
+        """Load revocations added since the last sync (all unexpired ones the first time)"""
+        now = datetime.now()
+        since = (self._synced_until - timedelta(seconds=REVOCATION_SYNC_OVERLAP)) if self._synced_until else datetime.min
+        with db_manager.get_connection() as conn:
+            rows = conn.execute("""
+                SELECT token_id, user_id, revoked_at, expires_at
+                FROM session_revocations
+                WHERE revoked_at >= ? AND expires_at > ?
+            """, (since.isoformat(), now.isoformat())).fetchall()
+
+        with self._lock:
+            for row in rows:
+                expires_at = parse_timestamp(row['expires_at'])
+                if row['token_id']:
+                    self._tokens[row['token_id']] = expires_at
+                else:
+                    self._add_cutoff(row['user_id'], parse_timestamp(row['revoked_at']), expires_at)
+
+            # Compactar - Descartar revocaciones de tokens que ya expiraron
+            for token_id in [t for t, expires_at in self._tokens.items() if expires_at <= now]:
+                del self._tokens[token_id]
+            for user_id in [u for u, expires_at in self._cutoff_expiry.items() if expires_at <= now]:
+                del self._cutoff_expiry[user_id]
+                self._user_cutoffs.pop(user_id, None)
+            self._synced_until = now
+
+    # Consulta - Estadisticas
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"revoked_tokens": len(self._tokens), "revoked_users": len(self._user_cutoffs)}
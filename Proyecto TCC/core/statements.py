@@ -0,0 +1,88 @@
+# Nombre del Archivo: statements.py
+# Descripción: Registro central de sentencias SQL - Traducción por dialecto cacheada y sentencias frecuentes con nombre
+# Autor: Fernando Bavera Villalba
+# Fecha: 25/10/2025
+
+import re
+from functools import lru_cache
+from typing import Tuple
+
+# Configuracion - Dialectos Soportados
+SQLITE = "sqlite"
+POSTGRES = "supabase"
+
+# Registro - Sentencias con Nombre
+# Las sentencias se escriben una sola vez en estilo SQLite (placeholders "?") y con
+# {true}/{false} para literales booleanos; translate() genera la versión de cada dialecto.
+STATEMENTS = {
+    # Sesiones - Verificación de sesión (consulta más frecuente, una por rerun)
+    "session.verify": """
+        SELECT us.*, u.username, u.email, u.first_name, u.last_name, u.is_active
+        FROM user_sessions us
+        JOIN users u ON us.user_id = u.id
+        WHERE us.session_token = ? AND us.expires_at > ? AND u.is_active = {true}
+    """,
+    # Progreso - Progreso del usuario
+    "progress.by_user": "SELECT * FROM user_progress WHERE user_id = ?",
+    # Seguridad - Estado de rate limiting de un identificador
+    "rate_limit.by_identifier": """
+        SELECT attempts, last_attempt, locked_until
+        FROM rate_limiting
+        WHERE identifier = ?
+    """,
+    # Usuarios - Búsquedas puntuales
+    "user.id_by_username": "SELECT id FROM users WHERE username = ?",
+    "user.profile_by_id": """
+        SELECT id, username, email, first_name, last_name, is_active
+        FROM users
+        WHERE id = ? AND is_active = {true}
+    """,
+    "user.onboarding_status": "SELECT onboarding_completed FROM users WHERE id = ?",
+    "user.mark_onboarding_complete": "UPDATE users SET onboarding_completed = {true} WHERE id = ?",
+}
+
+# Sentencias que pueden ejecutarse como prepared statements del servidor en PostgreSQL
+PREPARED_STATEMENTS = frozenset({
+    "session.verify",
+    "progress.by_user",
+    "rate_limit.by_identifier",
+})
+
+_BOOLEAN_LITERALS = {
+    SQLITE: {"true": "1", "false": "0"},
+    POSTGRES: {"true": "TRUE", "false": "FALSE"},
+}
+
+
+# Traduccion - Traducir Sentencia a Dialecto
+@lru_cache(maxsize=512)
+def translate(sql: str, dialect: str) -> str:
+    """Traducir una sentencia SQL al dialecto indicado (resultado cacheado por sentencia y dialecto)"""
+    if "{true}" in sql or "{false}" in sql:
+        literals = _BOOLEAN_LITERALS.get(dialect, _BOOLEAN_LITERALS[SQLITE])
+        sql = sql.replace("{true}", literals["true"]).replace("{false}", literals["false"])
+    if dialect == POSTGRES and "?" in sql:
+        sql = sql.replace("?", "%s")
+    return sql
+
+
+# Traduccion - Obtener Sentencia con Nombre
+def get_statement(name: str, dialect: str) -> str:
+    """Obtener la sentencia registrada con ese nombre ya traducida al dialecto"""
+    return translate(STATEMENTS[name], dialect)
+
+
+# Traduccion - Preparar Sentencia para el Servidor PostgreSQL
+@lru_cache(maxsize=64)
+def prepared_definition(name: str) -> Tuple[str, str, int]:
+    """
+    Construir la definición PREPARE de una sentencia con nombre.
+
+    Returns:
+        Tupla (nombre del prepared statement, sentencia PREPARE, número de parámetros)
+    """
+    sql = translate(STATEMENTS[name], POSTGRES)
+    counter = iter(range(1, sql.count("%s") + 1))
+    body = re.sub(r"%s", lambda _match: f"${next(counter)}", sql)
+    prepared_name = "stmt_" + name.replace(".", "_")
+    return prepared_name, f"PREPARE {prepared_name} AS {body}", sql.count("%s")
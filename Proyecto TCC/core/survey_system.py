@@ -6,18 +6,34 @@
 import streamlit as st
 import json
 import logging
-from datetime import datetime
-from typing import Dict, Any, Optional
-from core.database import db_manager
+from typing import Dict, Any, Iterable, Mapping, Optional
+from core.analytics import record_survey_response
+from core.cache import TTLCache, freeze
+from core.database import db_manager, get_database_setting
 
 logger = logging.getLogger(__name__)
 
-# Utilidad - Adaptar Consulta según Backend
-def _adapt_query(query: str) -> str:
-    """Ajustar estilo de placeholders según el backend de base de datos."""
-    if db_manager.db_type == "supabase":
-        return query.replace("?", "%s")
-    return query
+# Configuracion - Valores por Defecto
+SURVEY_CACHE_SIZE = 1024  # Usuarios con encuestas en caché por proceso
+SURVEY_CACHE_TTL = 300.0  # Segundos antes de volver a leer las encuestas de un usuario
+NO_LEVEL = "__NO_LEVEL__"  # Clave de las encuestas sin nivel (level IS NULL)
+
+
+# Clase - Respuesta de Encuesta
+class SurveyRecord:
+    """Fila de survey_responses en caché; el JSON se decodifica en el primer acceso"""
+    __slots__ = ("id", "raw", "_decoded")
+
+    def __init__(self, record_id: Optional[int], raw: Any):
+        self.id = record_id
+        self.raw = raw
+        self._decoded = None
+
+    @property
+    def responses(self) -> Dict[str, Any]:
+        if self._decoded is None:
+            self._decoded = json.loads(self.raw) if isinstance(self.raw, str) else self.raw
+        return self._decoded
 
 
 # Clase - Sistema de Encuestas
@@ -30,122 +46,109 @@ class SurveySystem:
             'level': 'Level Survey',
             'final': 'Final Survey'
         }
-        self._completion_cache: Dict[tuple, bool] = {}
-        self._response_cache: Dict[tuple, Dict[str, Any]] = {}
+        # Cache - user_id -> {(survey_type, level): SurveyRecord} con todas las encuestas del usuario
+        self._cache = TTLCache(
+            max_size=int(get_database_setting("survey_cache_size", SURVEY_CACHE_SIZE)),
+            ttl=float(get_database_setting("survey_cache_ttl", SURVEY_CACHE_TTL)),
+        )
+        self._schema_checked = False
     
     @staticmethod
-    def _cache_key(user_id: int, survey_type: str, level: Optional[str]) -> tuple:
-        """Crear una clave de caché hashable para búsquedas de encuestas."""
-        return (user_id, survey_type, level or "__NO_LEVEL__")
+    def _cache_key(survey_type: str, level: Optional[str]) -> tuple:
+        """Crear una clave hashable para una encuesta dentro de las del usuario."""
+        return (survey_type, level or NO_LEVEL)
     
     # Cache - Invalidar Caché
-    def _invalidate_cache(self, user_id: int, survey_type: str, level: Optional[str]):
-        """Invalidar datos en caché para una combinación específica de encuesta."""
-        key = self._cache_key(user_id, survey_type, level)
-        self._completion_cache.pop(key, None)
-        self._response_cache.pop(key, None)
+    def _invalidate_cache(self, user_id: int):
+        """Invalidar las encuestas en caché de un usuario."""
+        self._cache.invalidate(user_id)
+    
+    # Conversion - Construir Encuestas de Usuario
+    def _build_user_surveys(self, rows: Iterable[Mapping[str, Any]]) -> Mapping[tuple, SurveyRecord]:
+        return freeze({
+            self._cache_key(row['survey_type'], row['level']): SurveyRecord(row['id'], row['responses'])
+            for row in rows
+        })
+    
+    # Base de Datos - Leer Encuestas de Usuario
+    def _fetch_user_surveys(self, conn, user_id: int) -> Mapping[tuple, SurveyRecord]:
+        """Every survey row of a user in one query (same SQL on both backends, NULL levels included)"""
+        rows = conn.execute("""
+            SELECT id, survey_type, level, responses
+            FROM survey_responses
+            WHERE user_id = ?
+        """, (user_id,)).fetchall()
+        return self._build_user_surveys(rows)
+    
+    # Consulta - Obtener Encuestas de Usuario
+    def _get_user_surveys(self, user_id: int) -> Mapping[tuple, SurveyRecord]:
+        """All surveys of a user, loaded with a single query on the first miss"""
+        surveys = self._cache.get(user_id)
+        if surveys is None:
+            with db_manager.get_connection(readonly=True) as conn:
+                surveys = self._fetch_user_surveys(conn, user_id)
+            self._cache.set(user_id, surveys)
+        return surveys
+    
+    # Cache - Sembrar Encuestas de Usuario
+    def prime_user_surveys(self, user_id: int, rows: Iterable[Mapping[str, Any]]):
+        """Cache every survey row of a user fetched elsewhere (e.g. the login context)"""
+        self._cache.set(user_id, self._build_user_surveys(rows))
     
     # Base de Datos - Asegurar que Tabla Existe
     def _ensure_table_exists(self):
-        """Asegurar que la tabla survey_responses existe"""
+        """Asegurar que la tabla survey_responses existe (una lectura de versión de esquema por instancia)"""
+        if self._schema_checked:
+            return
         try:
-            db_manager.create_survey_responses_table()
+            db_manager.ensure_database_initialized()
+            self._schema_checked = True
         except Exception as e:
-            logger.warning(f"Could not create survey_responses table (may already exist): {e}")
+            logger.warning(f"Could not verify survey_responses table: {e}")
     
     # Base de Datos - Guardar Respuesta de Encuesta
     def save_survey_response(self, user_id: int, survey_type: str, responses: Dict[str, Any], level: Optional[str] = None) -> bool:
         """Guardar respuesta de encuesta en la base de datos"""
-        cache_payload = None
         try:
             # Inicializacion - Asegurar que Tabla de Respuestas Existe
             self._ensure_table_exists()
-            key = self._cache_key(user_id, survey_type, level)
+            key = self._cache_key(survey_type, level)
+            
+            # Conversion - Convertir Respuestas a String JSON
+            responses_json = json.dumps(responses, ensure_ascii=False)
             
             with db_manager.get_connection() as conn:
-                # Conversion - Convertir Respuestas a String JSON
-                responses_json = json.dumps(responses, ensure_ascii=False)
-                
-                # Consulta - Verificar si Encuesta ya Existe para Usuario/Tipo/Nivel
-                if db_manager.db_type == "sqlite":
-                    if level:
-                        cursor = conn.execute("""
-                            SELECT id FROM survey_responses 
-                            WHERE user_id = ? AND survey_type = ? AND level = ?
-                        """, (user_id, survey_type, level))
-                    else:
-                        cursor = conn.execute("""
-                            SELECT id FROM survey_responses 
-                            WHERE user_id = ? AND survey_type = ? AND level IS NULL
-                        """, (user_id, survey_type,))
-                    existing = cursor.fetchone()
-                else:
-                    cursor = conn.cursor()
-                    if level:
-                        cursor.execute(_adapt_query("""
-                            SELECT id FROM survey_responses 
-                            WHERE user_id = ? AND survey_type = ? AND level = ?
-                        """), (user_id, survey_type, level))
-                    else:
-                        cursor.execute(_adapt_query("""
-                            SELECT id FROM survey_responses 
-                            WHERE user_id = ? AND survey_type = ? AND level IS NULL
-                        """), (user_id, survey_type,))
-                    existing = cursor.fetchone()
+                # Consulta - Encuestas actuales del usuario (también refresca la caché)
+                surveys = dict(self._fetch_user_surveys(conn, user_id))
+                existing = surveys.get(key)
                 
                 if existing:
                     # Actualizacion - Actualizar Respuesta Existente
-                    if db_manager.db_type == "sqlite":
-                        if level:
-                            conn.execute("""
-                                UPDATE survey_responses 
-                                SET responses = ?, completed_at = CURRENT_TIMESTAMP
-                                WHERE user_id = ? AND survey_type = ? AND level = ?
-                            """, (responses_json, user_id, survey_type, level))
-                        else:
-                            conn.execute("""
-                                UPDATE survey_responses 
-                                SET responses = ?, completed_at = CURRENT_TIMESTAMP
-                                WHERE user_id = ? AND survey_type = ? AND level IS NULL
-                            """, (responses_json, user_id, survey_type,))
-                    else:
-                        if level:
-                            cursor.execute(_adapt_query("""
-                                UPDATE survey_responses 
-                                SET responses = ?, completed_at = CURRENT_TIMESTAMP
-                                WHERE user_id = ? AND survey_type = ? AND level = ?
-                            """), (responses_json, user_id, survey_type, level))
-                        else:
-                            cursor.execute(_adapt_query("""
-                                UPDATE survey_responses 
-                                SET responses = ?, completed_at = CURRENT_TIMESTAMP
-                                WHERE user_id = ? AND survey_type = ? AND level IS NULL
-                            """), (responses_json, user_id, survey_type,))
+                    conn.execute("""
+                        UPDATE survey_responses 
+                        SET responses = ?, completed_at = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                    """, (responses_json, existing.id))
+                    record_id = existing.id
                 else:
                     # Insercion - Insertar Nueva Respuesta
-                    if db_manager.db_type == "sqlite":
-                        conn.execute("""
-                            INSERT INTO survey_responses (user_id, survey_type, level, responses)
-                            VALUES (?, ?, ?, ?)
-                        """, (user_id, survey_type, level, responses_json))
-                    else:
-                        cursor.execute(_adapt_query("""
-                            INSERT INTO survey_responses (user_id, survey_type, level, responses)
-                            VALUES (?, ?, ?, ?)
-                        """), (user_id, survey_type, level, responses_json))
+                    record_id = db_manager.execute_insert(conn, """
+                        INSERT INTO survey_responses (user_id, survey_type, level, responses)
+                        VALUES (?, ?, ?, ?)
+                    """, (user_id, survey_type, level, responses_json))
+                
+                # Analiticas - Actualizar conteos Likert en la misma transacción
+                record_survey_response(conn, survey_type, level, responses, existing.raw if existing else None)
                 conn.commit()
-                cache_payload = responses_json
                 
         except Exception as e:
             logger.error(f"Error saving survey response: {e}")
+            self._invalidate_cache(user_id)
             return False
         else:
-            # Cache - Actualizar Caches en Exito
-            self._completion_cache[key] = True
-            try:
-                self._response_cache[key] = json.loads(cache_payload) if cache_payload is not None else responses
-            except Exception:
-                self._response_cache.pop(key, None)
+            # Cache - Actualizar Cache en Exito
+            surveys[key] = SurveyRecord(record_id, responses_json)
+            self._cache.set(user_id, freeze(surveys))
             return True
     
     # Validacion - Verificar Completación de Encuesta
@@ -154,42 +157,7 @@ class SurveySystem:
         try:
             # Inicializacion - Asegurar que Tabla de Respuestas Existe
             self._ensure_table_exists()
-            key = self._cache_key(user_id, survey_type, level)
-            
-            if key in self._completion_cache:
-                return self._completion_cache[key]
-            
-            with db_manager.get_connection() as conn:
-                # Base de Datos - Usar conn.execute para Compatibilidad SQLite
-                if db_manager.db_type == "sqlite":
-                    if level:
-                        cursor = conn.execute("""
-                            SELECT id FROM survey_responses 
-                            WHERE user_id = ? AND survey_type = ? AND level = ?
-                        """, (user_id, survey_type, level))
-                    else:
-                        cursor = conn.execute("""
-                            SELECT id FROM survey_responses 
-                            WHERE user_id = ? AND survey_type = ? AND level IS NULL
-                        """, (user_id, survey_type,))
-                else:
-                    cursor = conn.cursor()
-                    if level:
-                        cursor.execute(_adapt_query("""
-                            SELECT id FROM survey_responses 
-                            WHERE user_id = ? AND survey_type = ? AND level = ?
-                        """), (user_id, survey_type, level))
-                    else:
-                        cursor.execute(_adapt_query("""
-                            SELECT id FROM survey_responses 
-                            WHERE user_id = ? AND survey_type = ? AND level IS NULL
-                        """), (user_id, survey_type,))
-                
-                exists = cursor.fetchone() is not None
-                self._completion_cache[key] = exists
-                if not exists:
-                    self._response_cache.pop(key, None)
-                return exists
+            return self._cache_key(survey_type, level) in self._get_user_surveys(user_id)
                 
         except Exception as e:
             logger.error(f"Error checking survey completion: {e}")
@@ -201,35 +169,8 @@ class SurveySystem:
     def get_survey_response(self, user_id: int, survey_type: str, level: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """Obtener respuesta de encuesta del usuario"""
         try:
-            key = self._cache_key(user_id, survey_type, level)
-            if key in self._response_cache:
-                return self._response_cache[key]
-            
-            with db_manager.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                if level:
-                    cursor.execute(_adapt_query("""
-                        SELECT responses FROM survey_responses 
-                        WHERE user_id = ? AND survey_type = ? AND level = ?
-                    """), (user_id, survey_type, level))
-                else:
-                    cursor.execute(_adapt_query("""
-                        SELECT responses FROM survey_responses 
-                        WHERE user_id = ? AND survey_type = ? AND level IS NULL
-                    """), (user_id, survey_type,))
-                
-                result = cursor.fetchone()
-                
-                if result:
-                    parsed = json.loads(result[0] if isinstance(result[0], str) else result['responses'])
-                    self._completion_cache[key] = True
-                    self._response_cache[key] = parsed
-                    return parsed
-                
-                self._completion_cache[key] = False
-                self._response_cache.pop(key, None)
-                return None
+            record = self._get_user_surveys(user_id).get(self._cache_key(survey_type, level))
+            return record.responses if record else None
                 
         except Exception as e:
             logger.error(f"Error getting survey response: {e}")
@@ -243,16 +184,16 @@ class SurveySystem:
                 cursor = conn.cursor()
                 
                 if survey_type:
-                    cursor.execute(_adapt_query("""
+                    cursor.execute("""
                         SELECT * FROM survey_responses 
                         WHERE survey_type = ?
                         ORDER BY completed_at DESC
-                    """), (survey_type,))
+                    """, (survey_type,))
                 else:
-                    cursor.execute(_adapt_query("""
+                    cursor.execute("""
                         SELECT * FROM survey_responses 
                         ORDER BY completed_at DESC
-                    """))
+                    """)
                 
                 results = cursor.fetchall()
                 responses = []
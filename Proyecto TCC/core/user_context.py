@@ -0,0 +1,170 @@
+# Nombre del Archivo: user_context.py
+# Descripción: Contexto de usuario precargado - Una sola consulta al iniciar sesión trae usuario, sesión, progreso, onboarding, encuestas y dashboards, y siembra la caché de cada módulo
+# Autor: Fernando Bavera Villalba
+# Fecha: 25/10/2025
+
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from core.cache import TTLCache, freeze
+from core.database import db_manager, get_database_setting, parse_timestamp
+from core.progress_tracker import progress_tracker
+from core.survey_system import survey_system
+
+logger = logging.getLogger(__name__)
+
+# Configuracion - Valores por Defecto
+USER_CONTEXT_SIZE = 1024  # Contextos retenidos por proceso
+USER_CONTEXT_TTL = 60.0  # Segundos que onboarding y dashboards se sirven desde el contexto
+
+# Columnas de user_progress (mismas claves que SELECT * en ProgressTracker.get_user_progress)
+PROGRESS_COLUMNS = (
+    "nivel0_completed", "nivel1_completed", "nivel2_completed", "nivel3_completed", "nivel4_completed",
+    "total_time_spent", "data_analyses_created", "last_updated",
+)
+DASHBOARD_COLUMNS = ("id", "dashboard_name", "dashboard_config", "created_at", "updated_at", "last_accessed", "is_public")
+_DASHBOARD_TIMESTAMPS = ("created_at", "updated_at", "last_accessed")
+
+_PROGRESS_SELECT = ", ".join(f"p.{column}" for column in PROGRESS_COLUMNS)
+_DASHBOARD_FIELDS = ", ".join(f"'{column}', d.{column}" for column in DASHBOARD_COLUMNS)
+
+# Consulta - Contexto Completo en una Fila (encuestas y dashboards agregados como JSON)
+_CONTEXT_QUERY = {
+    "sqlite": f"""
+        SELECT u.id, u.username, u.email, u.first_name, u.last_name, u.is_active, u.onboarding_completed,
+               (SELECT us.expires_at FROM user_sessions us
+                WHERE us.session_token = ? AND us.user_id = u.id AND us.expires_at > ?) AS session_expires_at,
+               p.id AS progress_id, {_PROGRESS_SELECT},
+               (SELECT json_group_array(json_object('id', s.id, 'survey_type', s.survey_type, 'level', s.level, 'responses', s.responses))
+                FROM survey_responses s WHERE s.user_id = u.id) AS surveys,
+               (SELECT json_group_array(json_object({_DASHBOARD_FIELDS}))
+                FROM dashboards d WHERE d.user_id = u.id) AS dashboards
+        FROM users u
+        LEFT JOIN user_progress p ON p.user_id = u.id
+        WHERE u.id = ? AND u.is_active = 1
+    """,
+    "supabase": f"""
+        SELECT u.id, u.username, u.email, u.first_name, u.last_name, u.is_active, u.onboarding_completed,
+               (SELECT us.expires_at FROM user_sessions us
+                WHERE us.session_token = ? AND us.user_id = u.id AND us.expires_at > ?) AS session_expires_at,
+               p.id AS progress_id, {_PROGRESS_SELECT},
+               (SELECT COALESCE(json_agg(json_build_object('id', s.id, 'survey_type', s.survey_type, 'level', s.level, 'responses', s.responses)), '[]'::json)
+                FROM survey_responses s WHERE s.user_id = u.id) AS surveys,
+               (SELECT COALESCE(json_agg(json_build_object({_DASHBOARD_FIELDS})), '[]'::json)
+                FROM dashboards d WHERE d.user_id = u.id) AS dashboards
+        FROM users u
+        LEFT JOIN user_progress p ON p.user_id = u.id
+        WHERE u.id = ? AND u.is_active = TRUE
+    """,
+}
+
+
+# Clase - Contexto de Usuario
+@dataclass(frozen=True)
+class UserContext:
+    """Datos de un usuario cargados de una vez al iniciar sesión"""
+    user: Mapping[str, Any]
+    onboarding_completed: bool
+    progress: Optional[Mapping[str, Any]] = None
+    surveys: Tuple[Mapping[str, Any], ...] = ()  # Filas de survey_responses (JSON sin decodificar)
+    dashboards: Tuple[Mapping[str, Any], ...] = ()
+    session_expires_at: Optional[datetime] = None
+    loaded_at: datetime = field(default_factory=datetime.now)
+
+
+_contexts = TTLCache(
+    max_size=int(get_database_setting("user_context_size", USER_CONTEXT_SIZE)),
+    ttl=float(get_database_setting("user_context_ttl", USER_CONTEXT_TTL)),
+)
+
+
+def _json_list(value: Any) -> List[Dict[str, Any]]:
+    """Aggregates come back as JSON text from SQLite and already decoded from psycopg2"""
+    if value is None:
+        return []
+    return json.loads(value) if isinstance(value, str) else list(value)
+
+
+# Conversion - Construir Contexto desde la Fila
+def _build_context(row) -> UserContext:
+    user = {
+        'id': row['id'],
+        'username': row['username'],
+        'email': row['email'],
+        'first_name': row['first_name'],
+        'last_name': row['last_name'],
+        'is_active': row['is_active'],
+    }
+
+    progress = None
+    if row['progress_id'] is not None:
+        progress = {'id': row['progress_id'], 'user_id': row['id']}
+        progress.update((column, row[column]) for column in PROGRESS_COLUMNS)
+
+    dashboards = _json_list(row['dashboards'])
+    if db_manager.db_type == "supabase":
+        # json_build_object serializa TIMESTAMP como texto; la consulta directa devuelve datetime
+        for dashboard in dashboards:
+            for column in _DASHBOARD_TIMESTAMPS:
+                dashboard[column] = parse_timestamp(dashboard.get(column))
+    # Mismo orden que list_user_dashboards: ORDER BY updated_at DESC, created_at DESC
+    dashboards.sort(key=lambda d: (str(d.get('updated_at') or ''), str(d.get('created_at') or '')), reverse=True)
+
+    return UserContext(
+        user=freeze(user),
+        onboarding_completed=bool(row['onboarding_completed']),
+        progress=progress,
+        surveys=tuple(freeze(survey) for survey in _json_list(row['surveys'])),
+        dashboards=tuple(freeze(dashboard) for dashboard in dashboards),
+        session_expires_at=parse_timestamp(row['session_expires_at']),
+    )
+
+
+# Consulta - Cargar Contexto de Usuario
+def load_user_context(user_id: int, session_token: Optional[str] = None) -> Optional[UserContext]:
+    """Fetch everything the first pages need in one query and seed the progress and survey caches.
+
+    Returns None (and the modules fall back to their own queries) when the user
+    is missing or inactive, or when the query fails.
+    """
+    try:
+        # Conexión principal: la sesión recién creada puede no haber llegado aún a una réplica
+        with db_manager.get_connection() as conn:
+            row = conn.execute(
+                _CONTEXT_QUERY["supabase" if db_manager.db_type == "supabase" else "sqlite"],
+                (session_token, datetime.now().isoformat(), user_id),
+            ).fetchone()
+    except Exception as e:
+        logger.warning(f"Could not load user context for user {user_id}: {e}")
+        return None
+
+    if row is None:
+        _contexts.invalidate(user_id)
+        return None
+
+    context = _build_context(row)
+    _contexts.set(user_id, context)
+
+    # Cache - Sembrar las cachés de cada módulo
+    if context.progress is not None:
+        progress_tracker.prime_user_progress(user_id, context.progress)
+    survey_system.prime_user_surveys(user_id, context.surveys)
+    return context
+
+
+# Consulta - Obtener Contexto en Cache
+def get_user_context(user_id: Optional[int]) -> Optional[UserContext]:
+    """The context loaded at login, while fresh; None means 'query it yourself'"""
+    if not user_id:
+        return None
+    return _contexts.get(user_id)
+
+
+# Cache - Invalidar Contexto
+def invalidate_user_context(user_id: Optional[int]):
+    """Drop the context after a write to data it holds (onboarding, dashboards)"""
+    if user_id:
+        _contexts.invalidate(user_id)
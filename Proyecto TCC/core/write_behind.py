@@ -0,0 +1,226 @@
+# Nombre del Archivo: write_behind.py
+# Descripción: Cola de escritura diferida - Agrupa actualizaciones frecuentes y de bajo valor (actividad de sesión, último login, tiempo de estudio) y las escribe por lotes en segundo plano
+# Autor: Fernando Bavera Villalba
+# Fecha: 25/10/2025
+
+import atexit
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from core.database import db_manager, get_database_setting
+
+logger = logging.getLogger(__name__)
+
+# Configuracion - Valores por Defecto
+WRITE_BEHIND_INTERVAL = 2.0  # Segundos máximos que una escritura espera en la cola
+WRITE_BEHIND_MAX_BATCH = 200  # Claves pendientes que fuerzan un vaciado inmediato
+WRITE_BEHIND_MAX_ATTEMPTS = 5  # Intentos por escritura antes de descartarla (errores transitorios: SQLITE_BUSY, conexión)
+
+# Tipo - Función para combinar dos parámetros pendientes de la misma clave
+MergeFunction = Callable[[Tuple, Tuple], Tuple]
+# Tipo - Escritura en un lote: (clave, sentencia, parámetros, merge, intentos fallidos)
+BatchEntry = Tuple[Optional[Hashable], str, Tuple, Optional[MergeFunction], int]
+
+
+# Clase - Cola de Escritura Diferida
+class WriteBehindQueue:
+    """
+    Cola de escrituras diferidas con coalescencia por clave.
+
+    Cada escritura se registra con una clave (p. ej. ("session_activity", token));
+    una escritura nueva para la misma clave reemplaza a la pendiente, o se combina
+    con ella si se indica ``merge``. Un hilo en segundo plano vacía la cola en una
+    transacción por sentencia (executemany) cuando pasa ``interval`` segundos o
+    cuando hay ``max_batch`` claves pendientes. Si una sentencia falla, solo sus
+    claves vuelven a la cola (salvo que ya haya un valor más nuevo, con el que se
+    combinan si hay ``merge``) y se reintentan en el siguiente vaciado; tras
+    ``max_attempts`` intentos se descartan y se cuentan en ``failures``. Al terminar
+    el proceso la cola se vacía por completo.
+    """
+
+    def __init__(self, interval: float = WRITE_BEHIND_INTERVAL, max_batch: int = WRITE_BEHIND_MAX_BATCH,
+                 enabled: bool = True, max_attempts: int = WRITE_BEHIND_MAX_ATTEMPTS):
+        self.interval = interval
+        self.max_batch = max_batch
+        self.enabled = enabled
+        self.max_attempts = max_attempts
+        self._pending: Dict[Hashable, Tuple[str, Tuple, Optional[MergeFunction], int]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._worker: Optional[threading.Thread] = None
+        self.flushed = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.failures = 0  # Escrituras descartadas tras agotar los intentos
+
+    # Cola - Registrar Escritura
+    def submit(self, key: Hashable, query: str, params: Tuple, merge: Optional[MergeFunction] = None):
+        """Queue a write; it replaces (or merges with) the pending write for the same key"""
+        if not self.enabled or self._stopped:
+            # Sin trabajador: reintentar en el mismo hilo
+            entries = [(key, query, params, merge, 0)]
+            for _ in range(self.max_attempts):
+                entries = self._execute_batch(entries)
+                if not entries:
+                    return
+            self.failures += len(entries)
+            logger.error(f"Write-behind dropped {len(entries)} updates after {self.max_attempts} attempts")
+            return
+
+        with self._lock:
+            pending = self._pending.get(key)
+            attempts = 0
+            if pending is not None:
+                self.coalesced += 1
+                if merge is not None and pending[0] == query:
+                    params = merge(pending[1], params)
+                    attempts = pending[3]
+            self._pending[key] = (query, params, merge, attempts)
+            size = len(self._pending)
+
+        self._ensure_worker()
+        if size >= self.max_batch:
+            self._wakeup.set()
+
+    # Cola - Vaciar Escrituras Pendientes
+    def flush(self, keys: Optional[List[Hashable]] = None) -> int:
+        """Write pending updates now (all of them, or only ``keys``); returns how many were written"""
+        with self._flush_lock:
+            with self._lock:
+                if keys is None:
+                    pending, self._pending = self._pending, {}
+                else:
+                    pending = {key: self._pending.pop(key) for key in keys if key in self._pending}
+            batch = [(key,) + entry for key, entry in pending.items()]
+            if not batch:
+                return 0
+            failed = self._execute_batch(batch)
+            if failed:
+                self._requeue(failed)
+            return len(batch) - len(failed)
+
+    # Cola - Reencolar Escrituras Fallidas
+    def _requeue(self, failed: List[BatchEntry]):
+        """Put failed writes back unless a newer value replaced them; drop them after max_attempts"""
+        dropped = 0
+        with self._lock:
+            for key, query, params, merge, attempts in failed:
+                if attempts + 1 >= self.max_attempts:
+                    dropped += 1
+                    continue
+                newer = self._pending.get(key)
+                if newer is None:
+                    self._pending[key] = (query, params, merge, attempts + 1)
+                elif merge is not None and newer[0] == query:
+                    # Incrementos: el valor fallido se suma al encolado después
+                    self._pending[key] = (query, merge(params, newer[1]), merge, attempts + 1)
+                # Sin merge, el valor más nuevo reemplaza al fallido
+            self.retries += len(failed) - dropped
+            self.failures += dropped
+        if dropped:
+            logger.error(f"Write-behind dropped {dropped} updates after {self.max_attempts} attempts")
+
+    # Cola - Descartar Escrituras Pendientes
+    def discard(self, key: Hashable):
+        """Drop a pending write that no longer makes sense (e.g. the row was deleted)"""
+        with self._lock:
+            self._pending.pop(key, None)
+
+    # Cola - Detener y Vaciar
+    def shutdown(self):
+        """Stop the worker and drain everything still pending"""
+        self._stopped = True
+        self._wakeup.set()
+        worker = self._worker
+        if worker is not None and worker.is_alive() and worker is not threading.current_thread():
+            worker.join(timeout=self.interval + 5)
+        # Vaciar hasta que no quede nada: cada ronda escribe o consume un intento de lo que falla
+        while self.flush() or self._pending:
+            pass
+
+    # Consulta - Estadisticas de la Cola
+    def stats(self) -> Dict[str, Any]:
+        """Counters for the admin view"""
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "flushed": self.flushed,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "failures": self.failures,
+            "interval": self.interval,
+            "max_batch": self.max_batch,
+        }
+
+    # Hilo - Iniciar Trabajador
+    def _ensure_worker(self):
+        """Start the background flusher on first use"""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._worker.start()
+
+    # Hilo - Bucle del Trabajador
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush error: {e}")
+
+    # Base de Datos - Ejecutar Lote
+    def _execute_batch(self, batch: List[BatchEntry]) -> List[BatchEntry]:
+        """Run each statement (executemany over its keys) in its own transaction; returns the entries that failed"""
+        grouped: Dict[str, List[BatchEntry]] = {}
+        for entry in batch:
+            grouped.setdefault(entry[1], []).append(entry)
+
+        failed: List[BatchEntry] = []
+        remaining = list(grouped.items())
+        try:
+            with db_manager.get_connection() as conn:
+                while remaining:
+                    query, entries = remaining.pop(0)
+                    params_list = [entry[2] for entry in entries]
+                    try:
+                        if len(params_list) == 1:
+                            conn.execute(query, params_list[0])
+                        else:
+                            conn.executemany(query, params_list)
+                        conn.commit()
+                        self.flushed += len(entries)
+                    except Exception as e:
+                        # Solo esta sentencia vuelve a la cola; las demás siguen en sus propias transacciones
+                        failed.extend(entries)
+                        conn.rollback()
+                        logger.warning(f"Write-behind statement with {len(entries)} updates failed: {e}")
+        except Exception as e:
+            # Sin conexión: todo lo que no llegó a confirmarse se reintenta
+            for _, entries in remaining:
+                failed.extend(entries)
+            logger.warning(f"Write-behind batch could not connect: {e}")
+        return failed
+
+
+# Combinacion - Sumar Incrementos
+def merge_increment(pending: Tuple, new: Tuple) -> Tuple:
+    """Merge two (increment, *rest) parameter tuples by adding the increments"""
+    return (pending[0] + new[0],) + tuple(new[1:])
+
+
+# Instancia global de la cola de escritura diferida
+write_behind_queue = WriteBehindQueue(
+    interval=float(get_database_setting("write_behind_interval", WRITE_BEHIND_INTERVAL)),
+    max_batch=int(get_database_setting("write_behind_max_batch", WRITE_BEHIND_MAX_BATCH)),
+    enabled=bool(get_database_setting("write_behind", True)),
+)
+atexit.register(write_behind_queue.shutdown)
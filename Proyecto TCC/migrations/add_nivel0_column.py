@@ -2,6 +2,9 @@ from utils.ui.icon_system import get_icon, replace_emojis
 #!/usr/bin/env python3
 """
 Migration script to add nivel0_completed column to user_progress table
+
+Note: DatabaseManager.init_database now applies this change automatically as
+schema version 2; this script is kept for manual use on old database files.
 """
 
 import sqlite3
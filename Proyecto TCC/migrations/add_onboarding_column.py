@@ -1,6 +1,9 @@
 """
 Migration Script: Add onboarding_completed column to users table
 Run this script to add the onboarding_completed column needed for the onboarding tour system
+
+Note: DatabaseManager.init_database now applies this change automatically as
+schema version 3; this script is kept for manual use.
 """
 
 from core.database import DatabaseManager
@@ -15,6 +15,7 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from core.database import db_manager, init_database
 from core.auth_service import auth_service
+from core.analytics import rebuild_aggregates
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -262,6 +263,10 @@ def main():
     logger.info(replace_emojis("📝 Migrating quiz attempts..."))
     attempts_migrated = migrate_quiz_attempts_to_supabase(data.get('quiz_attempts', []))
     
+    # Rows inserted directly bypass the analytics hooks: recompute the aggregates
+    logger.info("Rebuilding analytics aggregates...")
+    rebuild_aggregates()
+    
     logger.info(replace_emojis("🎉 Migration completed!"))
     logger.info(f"   - Users: {users_migrated}")
     logger.info(f"   - Progress records: {progress_migrated}")
@@ -21,6 +21,8 @@ def reset_sqlite_database():
     """Delete SQLite database file to start fresh"""
     try:
         if os.path.exists(DB_PATH):
+            # Cerrar conexiones reutilizables antes de borrar el archivo
+            db_manager.close_connections()
             os.remove(DB_PATH)
             logger.info(f"{get_icon("✅", 20)} Deleted SQLite database: {DB_PATH}")
             return True
@@ -56,7 +58,10 @@ def reset_supabase_database():
                 'dashboards',
                 'dashboard_components',
                 'user_activity_log',
-                'rate_limiting'
+                'rate_limiting',
+                'survey_responses',
+                'session_revocations',
+                'schema_version'
             ]
             
             for table in tables_to_drop:
@@ -0,0 +1,46 @@
+"""
+Run database maintenance from the command line
+Purges expired sessions, stale rate-limit rows and expired session revocations
+in batches, then runs ANALYZE (plus WAL checkpoint and incremental VACUUM on
+SQLite) and prints a report of what was reclaimed.
+
+The same job runs in-process every `maintenance_interval` seconds (see
+core/maintenance.py); use this script from cron or when the app is stopped.
+"""
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import core modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+import utils  # noqa: F401  (carga los módulos de utilidades antes que core.auth_service)
+from core.maintenance import MAINTENANCE_BATCH_SIZE, run_maintenance
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def main():
+    """Main maintenance function"""
+    parser = argparse.ArgumentParser(description="Purge expired rows and compact the database")
+    parser.add_argument("--batch-size", type=int, default=MAINTENANCE_BATCH_SIZE,
+                        help="rows deleted per transaction")
+    parser.add_argument("--no-vacuum", action="store_true",
+                        help="skip VACUUM (SQLite); ANALYZE and the WAL checkpoint still run")
+    args = parser.parse_args()
+    
+    try:
+        report = run_maintenance(batch_size=args.batch_size, vacuum=not args.no_vacuum)
+    except Exception as e:
+        logger.error(f"Maintenance failed: {e}")
+        return False
+    
+    print(json.dumps(report, indent=2, default=str))
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
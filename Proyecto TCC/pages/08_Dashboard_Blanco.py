@@ -13,6 +13,7 @@ from utils.ui.icon_system import get_icon, replace_emojis
 from core.config import setup_page_config, apply_custom_css
 from core.auth_service import get_current_user, require_auth
 from data.sample_datasets import get_sample_datasets
+from utils.data import release_ingested_csv
 from core.dashboard_repository import list_user_dashboards, delete_dashboard
 from utils.analysis import (
     calculate_metrics, 
@@ -186,6 +187,7 @@ def select_dashboard_data():
                 df = load_uploaded_dataframe(uploaded_file)
                 st.session_state.cleaned_data = df
                 st.session_state.uploaded_data = df
+                release_ingested_csv(keep=df)
                 st.session_state.sample_data = None
                 st.session_state.dashboard_data_label = uploaded_file.name
                 st.success(f"Archivo `{uploaded_file.name}` cargado correctamente.")
@@ -226,6 +228,7 @@ def select_dashboard_data():
                 st.session_state.sample_data = dataset_df
                 st.session_state.cleaned_data = dataset_df
                 st.session_state.uploaded_data = dataset_df
+                release_ingested_csv()
                 st.session_state.dashboard_data_label = f"Ejemplo: {selected_sample}"
                 st.session_state.dashboard_selected_sample = selected_sample
                 st.success(f"Ahora estás usando `{selected_sample}`.")
@@ -730,6 +733,7 @@ def render_template_gallery(df, *, show_header=True):
                     st.session_state.sample_data = dataset_df
                     st.session_state.cleaned_data = dataset_df
                     st.session_state.uploaded_data = dataset_df
+                    release_ingested_csv()
                     st.session_state.dashboard_data_label = f"Ejemplo: {recommended_dataset}"
                     apply_dashboard_template(template, dataset_df, data_label=st.session_state.dashboard_data_label, force_rerun=True)
             else:
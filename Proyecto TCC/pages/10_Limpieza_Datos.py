@@ -5,7 +5,7 @@
 
 import streamlit as st
 import pandas as pd
-from utils.data import create_data_cleaning_interface, show_upload_section, show_examples_section
+from utils.data import create_data_cleaning_interface, show_upload_section, show_examples_section, release_ingested_csv
 from utils.ui import auth_ui
 from utils.ui.icon_system import get_icon, replace_emojis
 init_sidebar = auth_ui.init_sidebar
@@ -72,6 +72,7 @@ def main():
                 if st.button("✅ Sí, Subir Nuevo", type="primary"):
                     # Clear current data and show upload section
                     st.session_state.uploaded_data = None
+                    release_ingested_csv()
                     if 'global_replacements' in st.session_state:
                         del st.session_state.global_replacements
                     if 'current_data_name' in st.session_state:
@@ -0,0 +1,42 @@
+# Nombre del Archivo: 11_Admin_Analiticas.py
+# Descripción: Página de analíticas para instructores - Puntajes por nivel, aprobación en el tiempo, dificultad por pregunta, encuestas y rendimiento de consultas
+# Autor: Fernando Bavera Villalba
+# Fecha: 25/10/2025
+
+import streamlit as st
+from utils.admin_utils import render_analytics_admin, render_query_stats_admin, require_admin
+from utils.ui import auth_ui
+from utils.ui.icon_system import get_icon
+init_sidebar = auth_ui.init_sidebar
+from core.config import setup_page_config, apply_custom_css
+from core.streamlit_error_handler import safe_main, configure_streamlit_error_handling
+
+# Configuracion - Configurar manejo de errores
+configure_streamlit_error_handling()
+
+# Principal - Analiticas de Aprendizaje
+@safe_main
+def main():
+    """Página de analíticas de quizzes, encuestas y consultas (solo administradores)"""
+    # Configurar página
+    setup_page_config()
+    apply_custom_css()
+    
+    # UI - Inicializar Sidebar con Info de Usuario
+    init_sidebar()
+    
+    # Título principal
+    st.markdown(f'<h1 class="main-header">{get_icon("📊", 28)} Analíticas de Aprendizaje</h1>', unsafe_allow_html=True)
+    
+    if not require_admin():
+        st.error("Access denied. Admin privileges required.")
+        st.stop()
+    
+    tab_learning, tab_queries = st.tabs(["Aprendizaje", "Rendimiento de Consultas"])
+    with tab_learning:
+        render_analytics_admin()
+    with tab_queries:
+        render_query_stats_admin()
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 """
 Admin utilities for TCC Data Analysis Platform
-Provides admin access control and helper functions
+Provides admin access control, helper functions, the query performance view
+and the quiz/survey analytics view
 """
 
-from typing import Tuple, Optional
+from typing import Any, Dict, Tuple, Optional
+from core.query_stats import query_stats
 from utils.ui import auth_ui
 
 # Admin users list - only these users can access admin features
@@ -73,3 +75,145 @@ def get_current_admin_username() -> Optional[str]:
     current_user = auth_ui.get_current_user()
     return current_user.get('username') if current_user else None
 
+
+def get_query_stats_report(limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Get aggregated per-query timings and the slow-query log
+    
+    Args:
+        limit: Maximum number of statements to return (heaviest first)
+        
+    Returns:
+        Dictionary with statements, slow_queries and the slow threshold
+    """
+    return {
+        'collected_since': query_stats.started_at.isoformat(timespec='seconds'),
+        'slow_query_ms': query_stats.slow_query_ms,
+        'statements': query_stats.summary(limit=limit),
+        'slow_queries': query_stats.slow_queries(),
+    }
+
+def dump_query_stats_json(path: Optional[str] = None) -> str:
+    """
+    Serialize query stats as JSON, optionally writing them to a file
+    
+    Args:
+        path: File to write the dump to (optional)
+        
+    Returns:
+        JSON string with the aggregated stats and the slow-query log
+    """
+    return query_stats.to_json(path)
+
+def render_query_stats_admin():
+    """
+    Render the query performance view (admin only)
+    
+    Usage in Streamlit pages:
+        render_query_stats_admin()
+    """
+    import streamlit as st
+    import pandas as pd
+    
+    if not require_admin():
+        st.error("Access denied. Admin privileges required.")
+        return
+    
+    report = get_query_stats_report()
+    statements = report['statements']
+    
+    st.subheader("Rendimiento de Consultas")
+    if not query_stats.enabled:
+        st.info("La instrumentación está desactivada (query_stats = false en secrets).")
+        return
+    st.caption(f"Datos desde {report['collected_since']} · umbral de consulta lenta: {report['slow_query_ms']:.0f} ms")
+    
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Sentencias distintas", len(statements))
+    col2.metric("Ejecuciones", sum(row['calls'] for row in statements))
+    col3.metric("Consultas lentas", len(report['slow_queries']))
+    
+    if statements:
+        columns = ['sql', 'calls', 'total_ms', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'rows', 'errors']
+        st.dataframe(pd.DataFrame(statements)[columns], use_container_width=True, hide_index=True)
+        
+        selected = st.selectbox("Detalle de sentencia", range(len(statements)),
+                                format_func=lambda i: statements[i]['sql'][:120])
+        detail = statements[selected]
+        st.bar_chart(pd.Series(detail['histogram'], name='ejecuciones'))
+        st.write("Puntos de llamada:", detail['call_sites'])
+    
+    if report['slow_queries']:
+        st.markdown("**Consultas lentas recientes**")
+        st.dataframe(pd.DataFrame(report['slow_queries']), use_container_width=True, hide_index=True)
+    
+    col_download, col_reset = st.columns(2)
+    col_download.download_button("Descargar JSON", dump_query_stats_json(),
+                                 file_name="query_stats.json", mime="application/json")
+    if col_reset.button("Reiniciar estadísticas"):
+        query_stats.reset()
+        st.rerun()
+
+def render_analytics_admin():
+    """
+    Render quiz and survey analytics for instructors (admin only)
+    
+    Reads the aggregate tables maintained by core.analytics, so it costs the
+    same whatever the number of attempts and responses.
+    
+    Usage in Streamlit pages:
+        render_analytics_admin()
+    """
+    import streamlit as st
+    import pandas as pd
+    from core import analytics
+    
+    if not require_admin():
+        st.error("Access denied. Admin privileges required.")
+        return
+    
+    summary = analytics.get_level_summary()
+    levels = [row['level'] for row in summary]
+    
+    st.subheader("Resultados por Nivel")
+    col1, col2, col3 = st.columns(3)
+    total_attempts = sum(row['attempts'] for row in summary)
+    total_passed = sum(row['passed'] for row in summary)
+    col1.metric("Intentos de quiz", total_attempts)
+    col2.metric("Aprobados", total_passed)
+    col3.metric("Tasa de aprobación", f"{100.0 * total_passed / total_attempts:.1f}%" if total_attempts else "-")
+    if not summary:
+        st.info("Aún no hay intentos de quiz registrados.")
+    else:
+        st.dataframe(pd.DataFrame(summary), use_container_width=True, hide_index=True)
+        
+        level = st.selectbox("Nivel", [None] + levels, format_func=lambda value: value or "Todos los niveles")
+        
+        st.markdown("**Distribución de puntajes (%)**")
+        distribution = pd.DataFrame(analytics.get_score_distribution(level))
+        st.bar_chart(distribution.set_index('bucket')['attempts'])
+        
+        st.markdown("**Tasa de aprobación por día**")
+        pass_rates = pd.DataFrame(analytics.get_pass_rates(level))
+        if not pass_rates.empty:
+            st.line_chart(pass_rates.set_index('day')[['pass_rate', 'mean_percentage']])
+        
+        st.markdown("**Preguntas más difíciles**")
+        questions = analytics.get_question_difficulty(level, limit=20)
+        if questions:
+            st.dataframe(pd.DataFrame(questions), use_container_width=True, hide_index=True)
+    
+    st.subheader("Encuestas (escala 1-5)")
+    likert = analytics.get_likert_summary()
+    if not likert:
+        st.info("Aún no hay respuestas de encuestas con escala Likert.")
+    else:
+        likert_df = pd.DataFrame(likert)
+        survey_type = st.selectbox("Encuesta", sorted(likert_df['survey_type'].unique()))
+        likert_df = likert_df[likert_df['survey_type'] == survey_type]
+        st.dataframe(likert_df, use_container_width=True, hide_index=True)
+        st.bar_chart(likert_df.groupby('question')['mean'].mean())
+    
+    if st.button("Recalcular agregados"):
+        analytics.rebuild_aggregates()
+        st.rerun()
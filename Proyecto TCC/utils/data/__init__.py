@@ -13,6 +13,7 @@ __all__ = [
     'DataCleaningOperations',
     'DataValidation',
     'show_upload_section',
+    'release_ingested_csv',
     'show_examples_section',
     'get_current_data'
 ]
@@ -0,0 +1,195 @@
+# Nombre del Archivo: csv_dialect.py
+# Descripción: Detección del formato de archivos CSV - Codificación, delimitador, comillas, separador decimal y encabezado a partir de una sola muestra acotada
+# Autor: Fernando Bavera Villalba
+# Fecha: 25/10/2025
+
+import codecs
+import csv
+import re
+from collections import Counter
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional
+
+# Configuracion - Valores por Defecto
+SNIFF_SAMPLE_SIZE = 64 * 1024  # Bytes leídos para detectar el formato (una sola lectura)
+SNIFF_MAX_LINES = 200  # Líneas completas de la muestra analizadas
+DELIMITERS = ',;\t|'
+FALLBACK_ENCODING = 'cp1252'  # Exportaciones de Excel en Windows (Latinoamérica / Europa occidental)
+
+# Bytes sin carácter asignado en cp1252: si aparecen, el archivo es latin-1
+_CP1252_UNDEFINED = (b'\x81', b'\x8d', b'\x8f', b'\x90', b'\x9d')
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# Numeros con coma decimal (1.234,56 / 3,5) frente a punto decimal (1,234.56 / 3.5)
+_COMMA_DECIMAL = re.compile(r'^[-+]?\d{1,3}(\.\d{3})*,\d+$|^[-+]?\d+,\d+$')
+_POINT_DECIMAL = re.compile(r'^[-+]?\d{1,3}(,\d{3})*\.\d+$|^[-+]?\d+\.\d+$')
+_DOT_THOUSANDS = re.compile(r'^[-+]?\d{1,3}(\.\d{3})+(,\d+)?$')
+_NUMBER = re.compile(r'^[-+]?(\d+([.,]\d+)*|[.,]\d+)$')
+
+
+# Clase - Formato de CSV
+@dataclass(frozen=True)
+class CsvDialect:
+    """Formato detectado de un CSV, listo para pasarlo a pandas.read_csv"""
+    encoding: str = 'utf-8'
+    delimiter: str = ','
+    quotechar: str = '"'
+    decimal: str = '.'
+    thousands: Optional[str] = None
+    has_header: bool = True
+    detected: bool = True  # False cuando no se pudo detectar el delimitador y se usan los valores por defecto
+
+    # Conversion - Argumentos de read_csv
+    def read_csv_kwargs(self) -> Dict[str, Any]:
+        return {
+            'encoding': self.encoding,
+            'sep': self.delimiter,
+            'quotechar': self.quotechar,
+            'decimal': self.decimal,
+            'thousands': self.thousands,
+            'header': 0 if self.has_header else None,
+        }
+
+    # Conversion - Cambiar Delimitador
+    def with_delimiter(self, delimiter: str) -> "CsvDialect":
+        """Same dialect with another delimiter (decimal comma is dropped when the delimiter is a comma)"""
+        if delimiter == self.delimiter:
+            return self
+        decimal = '.' if delimiter == ',' else self.decimal
+        thousands = None if self.thousands in (delimiter, decimal) else self.thousands
+        return replace(self, delimiter=delimiter, decimal=decimal, thousands=thousands)
+
+    # UI - Descripcion Legible
+    def describe(self) -> str:
+        delimiter_names = {',': 'coma', ';': 'punto y coma', '\t': 'tabulador', '|': 'pipe', ' ': 'espacio'}
+        parts = [
+            f"codificación **{self.encoding}**",
+            f"delimitador **{delimiter_names.get(self.delimiter, repr(self.delimiter))}**",
+            f"decimal **{'coma' if self.decimal == ',' else 'punto'}**",
+            f"comillas `{self.quotechar}`",
+            "con encabezado" if self.has_header else "sin encabezado",
+        ]
+        return ", ".join(parts)
+
+
+# Deteccion - Codificacion
+def detect_encoding(sample: bytes) -> str:
+    """BOM, then strict UTF-8 (tolerating a character cut at the end of the sample), then cp1252/latin-1"""
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return single_byte_encoding(sample)
+
+
+# Deteccion - Codificacion de un Byte
+def single_byte_encoding(data: bytes) -> str:
+    """cp1252 unless the data uses bytes cp1252 leaves undefined (then latin-1, which decodes anything)"""
+    return 'latin-1' if any(byte in data for byte in _CP1252_UNDEFINED) else FALLBACK_ENCODING
+
+
+def _decode_lines(sample: bytes, encoding: str, complete: bool) -> List[str]:
+    text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(sample, final=complete)
+    lines = text.splitlines()
+    if not complete and len(lines) > 1:
+        lines = lines[:-1]  # La última línea puede estar cortada por el límite de la muestra
+    return [line for line in lines[:SNIFF_MAX_LINES] if line.strip()]
+
+
+# Deteccion - Delimitador por Consistencia
+def _consistent_delimiter(lines: List[str]) -> Optional[str]:
+    """Delimiter whose per-line count is non-zero and most often the same (fallback when csv.Sniffer fails)"""
+    best, best_score = None, 0
+    for delimiter in DELIMITERS:
+        counts = [line.count(delimiter) for line in lines]
+        if not counts or not any(counts):
+            continue
+        count, frequency = Counter(counts).most_common(1)[0]
+        score = frequency * (count > 0)
+        if score > best_score:
+            best, best_score = delimiter, score
+    return best
+
+
+def _same_count_per_line(lines: List[str], delimiter: str) -> bool:
+    counts = {line.count(delimiter) for line in lines}
+    return len(counts) == 1 and counts != {0}
+
+
+def _fields(lines: List[str], delimiter: str, quotechar: str) -> List[List[str]]:
+    try:
+        return [row for row in csv.reader(lines, delimiter=delimiter, quotechar=quotechar) if row]
+    except csv.Error:
+        return [line.split(delimiter) for line in lines]
+
+
+# Deteccion - Separador Decimal
+def _detect_decimal(rows: List[List[str]], delimiter: str):
+    """(decimal, thousands) from the numeric values of the data rows"""
+    if delimiter == ',':
+        return '.', None
+    values = [value.strip() for row in rows for value in row]
+    comma = sum(1 for value in values if _COMMA_DECIMAL.match(value))
+    point = sum(1 for value in values if _POINT_DECIMAL.match(value))
+    if comma > point:
+        thousands = '.' if any(_DOT_THOUSANDS.match(value) for value in values) else None
+        return ',', thousands
+    return '.', None
+
+
+# Deteccion - Encabezado
+def _detect_header(rows: List[List[str]]) -> bool:
+    """Conservative: only a first row made entirely of numbers is treated as data"""
+    if len(rows) < 2:
+        return True
+    first = [value.strip() for value in rows[0] if value.strip()]
+    return not first or not all(_NUMBER.match(value) for value in first)
+
+
+# Deteccion - Formato Completo
+def sniff_csv_dialect(sample: bytes, complete: bool = False) -> CsvDialect:
+    """
+    Detectar el formato de un CSV a partir de una muestra de bytes.
+
+    Args:
+        sample: Primeros bytes del archivo (ver SNIFF_SAMPLE_SIZE)
+        complete: True si la muestra es el archivo completo (la última línea no está cortada)
+
+    Returns:
+        CsvDialect con codificación, delimitador, comillas, decimal y encabezado
+    """
+    encoding = detect_encoding(sample)
+    lines = _decode_lines(sample, encoding, complete)
+    if not lines:
+        return CsvDialect(encoding=encoding, detected=False)
+
+    try:
+        sniffed = csv.Sniffer().sniff("\n".join(lines), delimiters=DELIMITERS)
+        delimiter, quotechar = sniffed.delimiter, sniffed.quotechar or '"'
+    except csv.Error:
+        delimiter, quotechar = _consistent_delimiter(lines), '"'
+    if delimiter == ',' and _same_count_per_line(lines, ';'):
+        # Con coma decimal (1;2,5;3) ambas aparecen en cada línea: el punto y coma es el delimitador
+        delimiter = ';'
+    if delimiter is None:
+        # Una sola columna: cualquier delimitador da el mismo resultado
+        return CsvDialect(encoding=encoding, detected=False)
+
+    rows = _fields(lines, delimiter, quotechar)
+
+    decimal, thousands = _detect_decimal(rows[1:] or rows, delimiter)
+    return CsvDialect(
+        encoding=encoding,
+        delimiter=delimiter,
+        quotechar=quotechar,
+        decimal=decimal,
+        thousands=thousands,
+        has_header=_detect_header(rows),
+    )
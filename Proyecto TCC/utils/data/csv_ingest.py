@@ -0,0 +1,161 @@
+# Nombre del Archivo: csv_ingest.py
+# Descripción: Ingesta por bloques de CSV grandes - Tipos compactos por bloque, progreso, presupuesto de memoria por sesión y respaldo a muestra aleatoria
+# Autor: Fernando Bavera Villalba
+# Fecha: 25/10/2025
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from core.database import get_database_setting
+from .csv_dialect import CsvDialect
+
+logger = logging.getLogger(__name__)
+
+# Configuracion - Valores por Defecto
+STREAMING_THRESHOLD_MB = 50  # Archivos desde este tamaño se leen por bloques
+SESSION_BUDGET_MB = 512  # Memoria máxima del DataFrame cargado por una sesión
+CHUNK_ROWS = 100_000  # Filas por bloque
+CATEGORY_MAX_RATIO = 0.5  # Columnas de texto con menos valores distintos que esta fracción pasan a category
+SAMPLE_HEADROOM = 0.8  # Fracción del presupuesto que ocupa la muestra (margen para lo que falta leer)
+
+
+# Clase - Resumen de Ingesta
+@dataclass(frozen=True)
+class IngestSummary:
+    """Resultado de una ingesta por bloques (sin el DataFrame)"""
+    rows_read: int
+    rows_kept: int
+    memory_bytes: int
+    budget_bytes: int
+    sampled: bool = False
+
+
+# Configuracion - Leer Ajustes
+def streaming_threshold_bytes() -> int:
+    return int(float(get_database_setting("upload_streaming_threshold_mb", STREAMING_THRESHOLD_MB)) * 2**20)
+
+
+def session_budget_bytes() -> int:
+    return int(float(get_database_setting("upload_session_budget_mb", SESSION_BUDGET_MB)) * 2**20)
+
+
+# Conversion - Elegir Columnas Categoricas
+def _category_columns(chunk: pd.DataFrame) -> List[str]:
+    """Text columns of the first chunk with few distinct values (read as text in every chunk, see ingest_csv)"""
+    columns = []
+    for column in chunk.columns:
+        series = chunk[column]
+        if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            if series.nunique(dropna=True) <= CATEGORY_MAX_RATIO * len(series):
+                columns.append(column)
+    return columns
+
+
+# Conversion - Tipos Compactos por Bloque
+def compact_dtypes(chunk: pd.DataFrame, category_columns: List[str]) -> pd.DataFrame:
+    """Downcast integers and store repetitive text as category (floats keep float64 precision)"""
+    for column in chunk.columns:
+        series = chunk[column]
+        if pd.api.types.is_integer_dtype(series):
+            chunk[column] = pd.to_numeric(series, downcast="integer")
+        elif column in category_columns:
+            chunk[column] = series.astype("category")
+    return chunk
+
+
+def _memory(chunk: pd.DataFrame) -> int:
+    return int(chunk.memory_usage(index=True, deep=True).sum())
+
+
+# Conversion - Unir Bloques
+def _concat_chunks(chunks: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate chunks keeping categoricals categorical (their categories differ per chunk)"""
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0].reset_index(drop=True)
+    columns = {}
+    for column in chunks[0].columns:
+        parts = [chunk[column] for chunk in chunks]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            try:
+                columns[column] = pd.Series(union_categoricals(parts, ignore_order=True), name=column)
+            except TypeError:
+                # Categorías de distinto tipo entre bloques: unir como texto y volver a categorizar
+                columns[column] = pd.concat([part.astype(object) for part in parts], ignore_index=True).astype("category")
+        else:
+            columns[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+# Ingesta - Leer CSV por Bloques
+def ingest_csv(source: Any, dialect: CsvDialect, total_bytes: int, budget_bytes: Optional[int] = None,
+               progress: Optional[Callable[[float, str], None]] = None, chunk_rows: int = CHUNK_ROWS):
+    """
+    Leer un CSV por bloques sin superar el presupuesto de memoria.
+
+    Mientras los bloques compactados caben en ``budget_bytes`` se conservan todas
+    las filas. Al superarlo se pasa a una muestra aleatoria proporcional al tamaño
+    proyectado del archivo.
+
+    Args:
+        source: Archivo binario posicionado al inicio (BytesIO del archivo subido)
+        dialect: Formato detectado del CSV
+        total_bytes: Tamaño del archivo, para el progreso y la proyección
+        budget_bytes: Memoria máxima del DataFrame resultante (por defecto upload_session_budget_mb)
+        progress: Función (fracción 0-1, mensaje) llamada tras cada bloque
+        chunk_rows: Filas por bloque
+
+    Returns:
+        (DataFrame, IngestSummary)
+    """
+    budget_bytes = budget_bytes or session_budget_bytes()
+    chunks: List[pd.DataFrame] = []
+    kept_bytes = 0
+    rows_read = 0
+    fraction = 1.0
+
+    # Las columnas categóricas se eligen con el primer bloque y se leen como texto en todos:
+    # un bloque posterior vacío o numérico daría categorías de otro tipo y no se podrían unir
+    start = source.tell()
+    category_columns = _category_columns(pd.read_csv(source, nrows=chunk_rows, **dialect.read_csv_kwargs()))
+    source.seek(start)
+
+    reader = pd.read_csv(source, chunksize=chunk_rows, dtype={column: object for column in category_columns},
+                         **dialect.read_csv_kwargs())
+    for index, chunk in enumerate(reader):
+        rows_read += len(chunk)
+        chunk = compact_dtypes(chunk, category_columns)
+        if fraction < 1.0:
+            chunk = chunk.sample(frac=fraction, random_state=index)
+        chunks.append(chunk)
+        kept_bytes += _memory(chunk)
+
+        consumed = min(source.tell() / total_bytes, 1.0) if total_bytes else 0.0
+        if kept_bytes > budget_bytes:
+            # Presupuesto superado: proyectar el tamaño total y reducir lo acumulado a la misma fracción
+            projected = kept_bytes / max(consumed, 1e-6)
+            ratio = min(SAMPLE_HEADROOM * budget_bytes / projected, 1.0) if projected else 1.0
+            chunks = [previous.sample(frac=ratio, random_state=position) for position, previous in enumerate(chunks)]
+            kept_bytes = sum(_memory(previous) for previous in chunks)
+            fraction *= ratio
+            logger.info(f"Upload exceeds the {budget_bytes / 2**20:.0f} MB budget; sampling {fraction:.1%} of rows")
+
+        if progress is not None:
+            progress(consumed, f"{rows_read:,} filas leídas ({kept_bytes / 2**20:.0f} MB en memoria)")
+
+    df = _concat_chunks(chunks)
+    summary = IngestSummary(
+        rows_read=rows_read,
+        rows_kept=len(df),
+        memory_bytes=_memory(df),
+        budget_bytes=budget_bytes,
+        sampled=fraction < 1.0,
+    )
+    if progress is not None:
+        progress(1.0, f"{rows_read:,} filas leídas")
+    return df, summary
@@ -5,10 +5,13 @@
 
 import streamlit as st
 import pandas as pd
-import csv
 import io
+from dataclasses import replace
 from data.sample_datasets import get_sample_datasets
 from .data_cleaner import create_data_cleaning_interface
+from .csv_dialect import CsvDialect, SNIFF_SAMPLE_SIZE, single_byte_encoding, sniff_csv_dialect
+from .csv_ingest import ingest_csv, session_budget_bytes, streaming_threshold_bytes
+from .parse_cache import cached_parse, file_digest, read_uploaded_bytes
 
 from utils.ui.icon_system import get_icon, replace_emojis
 
@@ -28,8 +31,9 @@ def get_excel_sheet_names(uploaded_file):
         else:
             engine = None  # Dejar que pandas lo detecte automáticamente
         
-        excel_file = pd.ExcelFile(uploaded_file, engine=engine)
-        return excel_file.sheet_names
+        # Cache - Abrir el libro solo la primera vez por contenido y motor
+        return cached_parse(uploaded_file, "excel_sheets", (engine,),
+                            lambda data: list(pd.ExcelFile(io.BytesIO(data), engine=engine).sheet_names))
     except Exception as e:
         error_msg = str(e)
         # Error - Verificar si es error relacionado con .xls y xlrd
@@ -80,11 +84,11 @@ def load_excel_with_sheet_selection(uploaded_file, key_prefix="excel_sheet"):
                 key=f"{key_prefix}_{uploaded_file.name}",
                 help="Por defecto se carga la primera hoja, pero puedes seleccionar cualquier otra."
             )
-            df = pd.read_excel(uploaded_file, sheet_name=selected_sheet, engine=engine)
+            df = _read_excel_cached(uploaded_file, selected_sheet, engine)
             st.success(f"✅ Hoja '{selected_sheet}' cargada exitosamente")
         else:
             # Archivo - Solo una hoja, cargar directamente
-            df = pd.read_excel(uploaded_file, sheet_name=sheet_names[0], engine=engine)
+            df = _read_excel_cached(uploaded_file, sheet_names[0], engine)
         
         return df
     except Exception as e:
@@ -99,8 +103,98 @@ def load_excel_with_sheet_selection(uploaded_file, key_prefix="excel_sheet"):
             st.error(f"Error al cargar el archivo Excel: {error_msg}")
         return None
 
+# Archivo - Leer Hoja Excel con Cache
+def _read_excel_cached(uploaded_file, sheet_name, engine):
+    """Leer una hoja una sola vez por contenido del archivo; los reruns reutilizan el DataFrame."""
+    return cached_parse(uploaded_file, "excel", (sheet_name, engine),
+                        lambda data: pd.read_excel(io.BytesIO(data), sheet_name=sheet_name, engine=engine))
+
+# Archivo - Leer CSV con Cache
+def _read_csv_cached(uploaded_file, dialect):
+    """Leer el CSV una sola vez por contenido y formato; devuelve (DataFrame, formato usado, resumen de ingesta o None)."""
+    data = read_uploaded_bytes(uploaded_file)
+    if len(data) >= streaming_threshold_bytes():
+        return _ingest_csv_for_session(uploaded_file, data, dialect)
+    
+    def parse(data):
+        try:
+            df = pd.read_csv(io.BytesIO(data), **dialect.read_csv_kwargs())
+            used = dialect
+        except UnicodeDecodeError:
+            # Caracteres no UTF-8 después de la muestra: un único reintento con codificación de un byte
+            used = replace(dialect, encoding=single_byte_encoding(data))
+            df = pd.read_csv(io.BytesIO(data), **used.read_csv_kwargs())
+        _name_headerless_columns(df, used)
+        return df, used, None
+    
+    return cached_parse(uploaded_file, "csv", (dialect,), parse)
+
+# Archivo - Ingesta por Bloques de CSV Grandes
+def _ingest_csv_for_session(uploaded_file, data, dialect):
+    """
+    Leer un CSV grande por bloques con tipos compactos y el presupuesto de memoria de la sesión.
+    
+    El resultado se guarda en la sesión (no en la caché compartida, que no admite
+    entradas de este tamaño) para que los reruns no vuelvan a leer el archivo. Se
+    devuelve el mismo DataFrame, sin copia: así la sesión retiene una sola vez el
+    presupuesto aunque también quede en uploaded_data (quien lo modifique debe
+    copiarlo, como hace DataCleaner). Ver release_ingested_csv.
+    """
+    budget = session_budget_bytes()
+    key = (file_digest(uploaded_file, data), dialect, budget)
+    stored = st.session_state.get("csv_ingest_cache")
+    if stored is not None and stored[0] == key:
+        return stored[1]
+    
+    # UI - Progreso de lectura
+    progress_bar = st.progress(0.0, text="Leyendo archivo por bloques...")
+    report = lambda fraction, message: progress_bar.progress(fraction, text=message)
+    try:
+        try:
+            used = dialect
+            df, summary = ingest_csv(io.BytesIO(data), used, len(data), budget, report)
+        except UnicodeDecodeError:
+            # Caracteres no UTF-8 después de la muestra: un único reintento con codificación de un byte
+            used = replace(dialect, encoding=single_byte_encoding(data))
+            df, summary = ingest_csv(io.BytesIO(data), used, len(data), budget, report)
+    finally:
+        progress_bar.empty()
+    _name_headerless_columns(df, used)
+    
+    st.session_state.csv_ingest_cache = (key, (df, used, summary))
+    return df, used, summary
+
+# Estado - Liberar CSV Grande de la Sesion
+def release_ingested_csv(keep=None):
+    """Drop the session's streamed CSV (unless it is ``keep``); call whenever uploaded_data is replaced or cleared."""
+    stored = st.session_state.get("csv_ingest_cache")
+    if stored is not None and stored[1][0] is not keep:
+        del st.session_state["csv_ingest_cache"]
+
+def _name_headerless_columns(df, dialect):
+    if not dialect.has_header:
+        df.columns = [f"Columna {i + 1}" for i in range(df.shape[1])]
+
+# Archivo - Detectar Formato CSV
+def detect_csv_dialect(uploaded_file, sample_size=SNIFF_SAMPLE_SIZE):
+    """
+    Detectar codificación, delimitador, comillas, separador decimal y encabezado de un CSV.
+    
+    Args:
+        uploaded_file: Archivo subido por el usuario
+        sample_size: Tamaño de la muestra en bytes para analizar (una sola lectura)
+    
+    Returns:
+        CsvDialect detectado o None si no se puede leer la muestra
+    """
+    try:
+        return cached_parse(uploaded_file, "csv_dialect", (sample_size,),
+                            lambda data: sniff_csv_dialect(data[:sample_size], complete=len(data) <= sample_size))
+    except Exception:
+        return None
+
 # Archivo - Detectar Delimitador CSV
-def detect_csv_delimiter(uploaded_file, sample_size=1024):
+def detect_csv_delimiter(uploaded_file, sample_size=SNIFF_SAMPLE_SIZE):
     """
     Detectar automáticamente el delimitador de un archivo CSV.
     
@@ -111,49 +205,15 @@ def detect_csv_delimiter(uploaded_file, sample_size=1024):
     Returns:
         Delimitador detectado (str) o None si no se puede detectar
     """
-    try:
-        # Archivo - Guardar posición actual
-        current_pos = uploaded_file.tell()
-        
-        # Archivo - Leer muestra del archivo
-        uploaded_file.seek(0)
-        sample_bytes = uploaded_file.read(sample_size)
-        
-        # Archivo - Intentar decodificar con diferentes codificaciones
-        sample = None
-        encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-        
-        for encoding in encodings:
-            try:
-                sample = sample_bytes.decode(encoding)
-                break
-            except UnicodeDecodeError:
-                continue
-        
-        if sample is None:
-            uploaded_file.seek(current_pos)
-            return None
-        
-        # Archivo - Resetear posición del archivo
-        uploaded_file.seek(0)
-        
-        # Datos - Usar csv.Sniffer para detectar delimitador
-        sniffer = csv.Sniffer()
-        delimiter = sniffer.sniff(sample, delimiters=',;\t|').delimiter
-        return delimiter
-    except Exception as e:
-        # Error - Si falla la detección, intentar resetear y retornar None
-        try:
-            uploaded_file.seek(0)
-        except:
-            pass
-        return None
+    dialect = detect_csv_dialect(uploaded_file, sample_size)
+    return dialect.delimiter if dialect is not None and dialect.detected else None
 
 # Archivo - Cargar CSV con Seleccion de Delimitador
 def load_csv_with_delimiter_selection(uploaded_file, key_prefix="csv_delimiter"):
     """
     Cargar archivo CSV con soporte para selección de delimitador.
-    Detecta automáticamente el delimitador y permite cambiarlo si es necesario.
+    Detecta automáticamente el formato (codificación, delimitador, comillas, decimal
+    y encabezado) y permite cambiar el delimitador y el encabezado si es necesario.
     
     Args:
         uploaded_file: Archivo subido por el usuario
@@ -172,22 +232,13 @@ def load_csv_with_delimiter_selection(uploaded_file, key_prefix="csv_delimiter")
             'Espacio': ' '
         }
         
-        # Archivo - Detectar delimitador automáticamente
-        detected_delimiter = detect_csv_delimiter(uploaded_file)
+        # Archivo - Detectar formato automáticamente (una sola muestra del archivo)
+        detected = detect_csv_dialect(uploaded_file)
+        detected_delimiter = detected.delimiter if detected is not None and detected.detected else None
         
-        # UI - Mostrar información sobre delimitador detectado
+        # UI - Mostrar información sobre el formato detectado
         if detected_delimiter:
-            # Datos - Encontrar nombre del delimitador detectado
-            detected_name = None
-            for name, delim in delimiter_options.items():
-                if delim == detected_delimiter:
-                    detected_name = name
-                    break
-            
-            if detected_name:
-                st.info(f"🔍 Delimitador detectado automáticamente: **{detected_name}** (`{repr(detected_delimiter)}`)")
-            else:
-                st.info(f"🔍 Delimitador detectado automáticamente: `{repr(detected_delimiter)}`")
+            st.info(f"🔍 Formato detectado automáticamente: {detected.describe()}")
         else:
             st.warning("⚠️ No se pudo detectar automáticamente el delimitador. Por favor, selecciona uno manualmente.")
         
@@ -211,26 +262,28 @@ def load_csv_with_delimiter_selection(uploaded_file, key_prefix="csv_delimiter")
         )
         
         selected_delimiter = delimiter_options[selected_delimiter_label]
+        dialect = (detected or CsvDialect()).with_delimiter(selected_delimiter)
         
-        # Archivo - Cargar CSV con delimitador seleccionado
-        uploaded_file.seek(0)  # Asegurar que el archivo esté al inicio
-        
-        # Archivo - Intentar cargar con diferentes codificaciones
-        encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-        df = None
-        encoding_used = None
+        # UI - Permitir corregir la detección de encabezado
+        has_header = st.checkbox(
+            "La primera fila contiene los nombres de las columnas",
+            value=dialect.has_header,
+            key=f"{key_prefix}_header_{uploaded_file.name}",
+        )
+        dialect = replace(dialect, has_header=has_header)
         
-        for encoding in encodings:
-            try:
-                uploaded_file.seek(0)
-                df = pd.read_csv(uploaded_file, delimiter=selected_delimiter, encoding=encoding)
-                encoding_used = encoding
-                break
-            except (UnicodeDecodeError, pd.errors.ParserError):
-                continue
+        # Archivo - Cargar CSV con el formato detectado (un solo parseo)
+        df, dialect_used, ingest = _read_csv_cached(uploaded_file, dialect)
+        if dialect_used.encoding != dialect.encoding:
+            st.caption(f"Codificación ajustada a {dialect_used.encoding} al leer el archivo completo.")
         
-        if df is None:
-            raise Exception("No se pudo cargar el archivo CSV. Verifica la codificación y el delimitador.")
+        # UI - Informar lectura por bloques y muestreo por presupuesto de memoria
+        if ingest is not None:
+            st.caption(f"Archivo grande leído por bloques: {ingest.rows_read:,} filas, "
+                       f"{ingest.memory_bytes / 2**20:.0f} MB en memoria con tipos compactos.")
+            if ingest.sampled:
+                st.warning(f"⚠️ El archivo supera el límite de memoria por sesión ({ingest.budget_bytes / 2**20:.0f} MB). "
+                           f"Se cargó una muestra aleatoria de {ingest.rows_kept:,} de {ingest.rows_read:,} filas.")
         
         if detected_delimiter and selected_delimiter != detected_delimiter:
             st.success(f"✅ Archivo CSV cargado con delimitador: **{selected_delimiter_label}**")
@@ -290,6 +343,7 @@ def show_upload_section():
             with col1:
                 if st.button("🧹 Analizar Calidad de Datos", type="primary", use_container_width=True):
                     st.session_state.uploaded_data = df
+                    release_ingested_csv(keep=df)
                     st.session_state.current_data_name = uploaded_file.name
                     st.session_state.current_data_type = "uploaded_file"
                     st.session_state.show_data_quality = True
@@ -298,6 +352,7 @@ def show_upload_section():
             with col2:
                 if st.button("🧽 Limpieza Automática", use_container_width=True):
                     st.session_state.uploaded_data = df
+                    release_ingested_csv(keep=df)
                     st.session_state.current_data_name = uploaded_file.name
                     st.session_state.current_data_type = "uploaded_file"
                     st.session_state.show_data_cleaning = True
@@ -351,6 +406,7 @@ def show_examples_section():
                     st.session_state.sample_data = dataset_df
                     # Estado - También establecer como uploaded_data para compatibilidad con página de limpieza
                     st.session_state.uploaded_data = dataset_df
+                    release_ingested_csv()
                     # Estado - Almacenar nombre y tipo del dataset
                     st.session_state.current_data_name = name
                     st.session_state.current_data_type = "sample_dataset"
@@ -0,0 +1,168 @@
+# Nombre del Archivo: parse_cache.py
+# Descripción: Caché de archivos subidos ya parseados - Clave por hash del contenido y opciones de lectura, LRU acotada por memoria y compartida por todas las páginas
+# Autor: Fernando Bavera Villalba
+# Fecha: 25/10/2025
+
+import hashlib
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import pandas as pd
+
+from core.cache import TTLCache
+from core.database import get_database_setting
+
+logger = logging.getLogger(__name__)
+
+# Configuracion - Valores por Defecto
+PARSE_CACHE_MAX_MB = 256  # Memoria máxima de DataFrames parseados retenidos por proceso
+DIGEST_CACHE_SIZE = 256  # Hashes de archivos subidos recordados (evita re-hashear en cada rerun)
+DIGEST_CACHE_TTL = 3600.0
+
+
+# Clase - Cache LRU Acotada por Memoria
+class ParseCache:
+    """
+    Caché LRU de resultados de parseo acotada a ``max_bytes``.
+
+    La clave incluye el hash del contenido del archivo, así que dos usuarios que
+    suben el mismo archivo (o el mismo usuario desde otra página) comparten la
+    entrada. Los DataFrames se entregan como copia: quien los recibe puede
+    modificarlos sin alterar la entrada en caché.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # clave -> (bytes, valor)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Consulta - Obtener o Parsear
+    def get_or_parse(self, key: Hashable, parse: Callable[[], Any]) -> Any:
+        """Return a copy of the cached result, parsing (outside the lock) and storing it on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _copy(entry[1])
+            self.misses += 1
+
+        value = parse()
+        self._store(key, value)
+        return _copy(value)
+
+    # Cache - Guardar Resultado
+    def _store(self, key: Hashable, value: Any):
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            logger.info(f"Parsed file of {size / 2**20:.1f} MB exceeds the parse cache budget; not cached")
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[0]
+            self._entries[key] = (size, value)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (evicted_size, _) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    # Cache - Vaciar
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # Consulta - Estadisticas
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def _copy(value: Any) -> Any:
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, tuple):
+        return tuple(_copy(item) for item in value)
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+
+def _estimate_size(value: Any) -> int:
+    """Approximate memory of a parse result (deep size for DataFrames)"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(_estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+parse_cache = ParseCache(int(float(get_database_setting("parse_cache_max_mb", PARSE_CACHE_MAX_MB)) * 2**20))
+_digests = TTLCache(max_size=DIGEST_CACHE_SIZE, ttl=DIGEST_CACHE_TTL)
+
+
+# Archivo - Leer Contenido del Archivo Subido
+def read_uploaded_bytes(uploaded_file) -> bytes:
+    """Full content of an UploadedFile (or any binary file object) without moving its position"""
+    if hasattr(uploaded_file, "getvalue"):
+        return uploaded_file.getvalue()
+    position = uploaded_file.tell()
+    try:
+        uploaded_file.seek(0)
+        return uploaded_file.read()
+    finally:
+        uploaded_file.seek(position)
+
+
+# Archivo - Hash del Contenido
+def file_digest(uploaded_file, data: Optional[bytes] = None) -> str:
+    """BLAKE2b of the file content, remembered per upload (Streamlit file_id) across reruns"""
+    upload_id = getattr(uploaded_file, "file_id", None)
+    memo_key = (upload_id, getattr(uploaded_file, "size", None)) if upload_id else None
+    if memo_key is not None:
+        digest = _digests.get(memo_key)
+        if digest is not None:
+            return digest
+    if data is None:
+        data = read_uploaded_bytes(uploaded_file)
+    digest = hashlib.blake2b(data, digest_size=20).hexdigest()
+    if memo_key is not None:
+        _digests.set(memo_key, digest)
+    return digest
+
+
+# Archivo - Parsear con Cache
+def cached_parse(uploaded_file, kind: str, options: Tuple, parse: Callable[[bytes], Any]) -> Any:
+    """
+    Parse an uploaded file once per (content, kind, options).
+
+    Args:
+        uploaded_file: Archivo subido por el usuario
+        kind: Tipo de lectura ("csv", "excel", "excel_sheets", ...)
+        options: Opciones que cambian el resultado (delimitador, codificaciones, hoja, motor)
+        parse: Función que recibe los bytes del archivo y devuelve el resultado
+
+    Returns:
+        El resultado de ``parse`` (los DataFrames se devuelven como copia)
+    """
+    key = (file_digest(uploaded_file), kind, options)
+    return parse_cache.get_or_parse(key, lambda: parse(read_uploaded_bytes(uploaded_file)))
@@ -8,12 +8,11 @@ from core.progress_tracker import progress_tracker
 from utils.ui.icon_system import get_icon, replace_emojis
 
 # Progreso - Obtener Progreso de Niveles
-@st.cache_data(show_spinner=False, ttl=60)
 def get_level_progress(user_id):
     """Obtener progreso actual a través de todos los niveles desde la base de datos
     
-    Cacheado por 60 segundos para reducir consultas a la base de datos mientras permite
-    actualizaciones en tiempo real cuando el progreso cambia.
+    Sin caché propia: progress_tracker ya mantiene una instantánea por usuario que
+    se invalida en cada escritura, también desde otros procesos.
     """
     try:
         progress = progress_tracker.get_user_progress(user_id)
@@ -364,9 +363,6 @@ def save_level_progress(user_id, level_name, completed=True):
         elif level_name == 'nivel4':
             progress_tracker.update_user_progress(user_id, nivel4_completed=completed)
         
-        # Invalidate cache to ensure fresh data on next call
-        get_level_progress.clear()
-        
         # Also update session state for immediate UI feedback
         st.session_state[f'{level_name}_completed'] = completed
         return True
@@ -387,9 +383,6 @@ def reset_all_progress(user_id):
             nivel4_completed=False
         )
         
-        # Invalidate cache to ensure fresh data on next call
-        get_level_progress.clear()
-        
         # Clear session state
         for level in ['nivel0', 'nivel1', 'nivel2', 'nivel3', 'nivel4']:
             if f'{level}_completed' in st.session_state:
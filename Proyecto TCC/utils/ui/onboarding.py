@@ -20,25 +20,18 @@ def check_onboarding_status(user_id: int, _db_manager) -> bool:
     Nota: _db_manager tiene guión bajo inicial para indicarle a Streamlit que no lo hashee
     (los objetos DatabaseManager no son hasheables).
     """
+    from core.user_context import get_user_context
+    
+    # Cache - Usar el contexto precargado al iniciar sesión si sigue vigente
+    context = get_user_context(user_id)
+    if context is not None:
+        return context.onboarding_completed
+    
     try:
-        with _db_manager.get_connection() as conn:
-            cursor = conn.cursor()
-            if _db_manager.db_type == "supabase":
-                cursor.execute(
-                    "SELECT onboarding_completed FROM users WHERE id = %s",
-                    (user_id,)
-                )
-            else:
-                cursor.execute(
-                    "SELECT onboarding_completed FROM users WHERE id = ?",
-                    (user_id,)
-                )
+        with _db_manager.get_connection(readonly=True) as conn:
+            cursor = _db_manager.execute_statement(conn, "user.onboarding_status", (user_id,))
             result = cursor.fetchone()
-            if result:
-                if isinstance(result, dict):
-                    return result.get('onboarding_completed', False)
-                return bool(result[0] if result else False)
-            return False
+            return bool(result['onboarding_completed']) if result else False
     except Exception:
         # If column doesn't exist yet, return False
         return False
@@ -48,20 +41,12 @@ def mark_onboarding_complete(user_id: int, db_manager):
     """Marcar onboarding como completado en la base de datos"""
     try:
         with db_manager.get_connection() as conn:
-            cursor = conn.cursor()
-            if db_manager.db_type == "supabase":
-                cursor.execute(
-                    "UPDATE users SET onboarding_completed = TRUE WHERE id = %s",
-                    (user_id,)
-                )
-            else:
-                cursor.execute(
-                    "UPDATE users SET onboarding_completed = 1 WHERE id = ?",
-                    (user_id,)
-                )
+            db_manager.execute_statement(conn, "user.mark_onboarding_complete", (user_id,))
             conn.commit()
         
         # Invalidate cache to ensure fresh data on next call
+        from core.user_context import invalidate_user_context
+        invalidate_user_context(user_id)
         check_onboarding_status.clear()
     except Exception as e:
         # If column doesn't exist, that's okay - we'll handle it gracefully